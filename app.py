@@ -1,23 +1,446 @@
 # app.py 顶部
-from test_core import find_scenes_optimized, frames_to_timecode_premiere, export_video_clips
+# 启动时只导入界面和轻量的选项表；test_core (scenedetect / cv2 / numpy) 和 PIL 在导入视频、分析、
+# 导出时才在各方法里导入，窗口先出来，重型依赖在后台线程里预热 (见 preload_backend)
+from core_options import (frames_to_timecode_premiere, DECODE_BACKENDS, ANALYSIS_ENGINES, EXPORT_MODES,
+                          FUSED_DETECTORS)
+from job_queue import (JobQueue, split_cpu_budget, JOB_KINDS, JOB_STATUS_LABELS, JOB_RUNNING, JOB_DONE,
+                       JOB_FAILED, JOB_CANCELLED)
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import threading
-import cv2
-from PIL import Image
+import multiprocessing
 import os
-import subprocess
-
-
-# 引入后端
-from test_core import find_scenes_optimized, frames_to_timecode_premiere
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# 滑块的全部取值；分析后对这些组合一次算出切点数 (test_core.sweep_cut_counts)，拖动时只查表
+THRESHOLD_STEPS = [round(1.0 + i * 0.1, 1) for i in range(91)]
+MIN_LEN_STEPS = list(range(5, 61))
+
+class VirtualCutList(ctk.CTkFrame):
+    """虚拟化切点列表：只创建能看见的那几行控件，滚动时把数据重新绑定到同一批行上
+
+    几万个切点也只有一屏的控件；单项修改只重绑受影响的可见行。
+    """
+
+    ROW_HEIGHT = 32
+    WHEEL_ROWS = 3  # 滚轮每格滚动的行数
+
+    def __init__(self, master, on_toggle, on_preview, on_delete, on_scroll=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self._on_toggle = on_toggle
+        self._on_preview = on_preview
+        self._on_delete = on_delete
+        self._on_scroll = on_scroll
+
+        self.cuts = []  # 分析前为空列表，之后是 test_core.CutList
+        self.thumb_atlas = None
+        self.fps = 24.0
+        self.frame_index = None  # test_core.FrameIndex，有时按真实时间戳显示时间码
+        self.row_height = self.ROW_HEIGHT
+        self.top = 0  # 第一个可见行对应的数据下标
+        self._rows = []
+        self._rows_in_use = 0
+        self._visible_rows = 1
+        self._thumb_images = {}
+        self._blank_thumb = None
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.body.bind("<Configure>", lambda e: self._layout())
+        # 行控件会被反复重绑，滚轮统一在全局监听，只处理指针落在本列表上的事件
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_all(sequence, self._on_wheel, add="+")
+
+    # ---------- 数据 ----------
+    def set_data(self, cuts, thumb_atlas=None, fps=24.0, frame_index=None):
+        self.cuts = cuts
+        self.thumb_atlas = thumb_atlas
+        self.fps = fps
+        self.frame_index = frame_index
+        self._thumb_images.clear()
+        self._blank_thumb = None
+        if thumb_atlas:
+            from PIL import Image
+            # CTkLabel 不能把图片清空，没有缩略图的行 (手动切点) 显示同尺寸的空白图
+            blank = Image.new("RGB", (thumb_atlas.shape[1], thumb_atlas.shape[0]), (30, 30, 30))
+            self._blank_thumb = ctk.CTkImage(light_image=blank, dark_image=blank, size=blank.size)
+        else:
+            # 换成没有图集的视频：旧缩略图同样清不掉，重建缩略图控件
+            for row in self._rows:
+                row.thumb.destroy()
+                row.thumb = ctk.CTkLabel(row.frame, text="")
+                row.thumb.grid(row=0, column=1)
+        row_height = max(self.ROW_HEIGHT, thumb_atlas.shape[0] + 7) if thumb_atlas else self.ROW_HEIGHT
+        if row_height != self.row_height:
+            self.row_height = row_height
+            self._layout()
+        else:
+            self.refresh()
+
+    def visible_range(self):
+        return self.top, min(self.top + self._visible_rows, len(self.cuts))
+
+    def refresh(self, from_index=0):
+        """重绑数据下标 >= from_index 的可见行 (删除 / 插入只影响其后的行)"""
+        top = max(0, min(self.top, self._max_top()))
+        if top != self.top:
+            # 在列表末尾删除时 top 被夹回来，整屏的行都错了位，全部重绑
+            self.top = top
+            from_index = 0
+        for k in range(self._rows_in_use):
+            index = self.top + k
+            if index >= from_index:
+                self._bind_row(self._rows[k], k, index)
+        self._update_scrollbar()
+
+    # ---------- 滚动 ----------
+    def _max_top(self):
+        return max(0, len(self.cuts) - self._visible_rows)
+
+    def scroll_to(self, index):
+        """滚动到第 index 行 (不在可见范围内时才滚动)"""
+        first, last = self.visible_range()
+        if first <= index < last:
+            return
+        self._set_top(index - self._visible_rows // 2)
+
+    def scroll_pages(self, delta):
+        self._set_top(self.top + delta * self._visible_rows)
+
+    def _set_top(self, top):
+        top = max(0, min(int(top), self._max_top()))
+        if top == self.top:
+            return
+        self.top = top
+        self.refresh()
+        if self._on_scroll:
+            self._on_scroll()
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self._set_top(round(float(args[0]) * len(self.cuts)))
+        elif action == "scroll":
+            step = self._visible_rows if args[1] == "pages" else 1
+            self._set_top(self.top + int(args[0]) * step)
+
+    def _on_wheel(self, event):
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self.body)):
+            return
+        if getattr(event, "num", None) == 4:
+            direction = -1
+        elif getattr(event, "num", None) == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self._set_top(self.top + direction * self.WHEEL_ROWS)
+
+    def _update_scrollbar(self):
+        total = len(self.cuts)
+        if total == 0:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            first, last = self.visible_range()
+            self.scrollbar.set(first / total, last / total)
+
+    # ---------- 行控件池 ----------
+    def _layout(self):
+        # winfo_height 是实际像素，行高是未缩放的逻辑尺寸
+        height = self.body.winfo_height() / self._get_widget_scaling()
+        if height <= 1:
+            return
+        self._visible_rows = max(1, int(height // self.row_height))
+        # 多建一行，放下最底部露出一半的那行
+        pool_size = self._visible_rows + 1
+        while len(self._rows) < pool_size:
+            self._rows.append(self._create_row())
+        for row in self._rows:
+            row.frame.place_forget()
+            row.frame.configure(height=self.row_height)
+            row.index = None
+        self._rows_in_use = pool_size
+        self.refresh()
+
+    def _create_row(self):
+        row = _CutRow()
+        # 行高固定 (CTk 的 place 不接受 height)，不随内容伸缩
+        row.frame = ctk.CTkFrame(self.body, fg_color="transparent", height=self.row_height)
+        row.frame.grid_propagate(False)
+        # Col 0: 复选框 / Col 1: 缩略图 (弹簧) / Col 2: 眼睛 / Col 3: 删除
+        row.frame.grid_columnconfigure(1, weight=1)
+        row.var = ctk.BooleanVar(value=False)
+        row.chk = ctk.CTkCheckBox(row.frame, text="", font=("Consolas", 12), width=100, variable=row.var,
+                                  command=lambda r=row: self._on_toggle(r.index, r.var.get()))
+        row.chk.grid(row=0, column=0, sticky="w", padx=5)
+        row.thumb = ctk.CTkLabel(row.frame, text="")
+        row.thumb.grid(row=0, column=1)
+        row.btn_eye = ctk.CTkButton(row.frame, text="👁", width=30, height=24, fg_color="#444",
+                                    command=lambda r=row: self._on_preview(self.cuts.frame(r.index)))
+        row.btn_eye.grid(row=0, column=2, padx=2)
+        row.btn_del = ctk.CTkButton(row.frame, text="×", width=30, height=24, fg_color="#AA0000",
+                                    hover_color="#FF0000", command=lambda r=row: self._on_delete(r.index))
+        row.btn_del.grid(row=0, column=3, padx=5)
+        row.frame.grid_rowconfigure(0, weight=1)
+        return row
+
+    def _bind_row(self, row, k, index):
+        if index >= len(self.cuts):
+            # 数据不够一屏：多出来的行隐藏
+            if row.index is not None:
+                row.frame.place_forget()
+                row.index = None
+            return
+        if row.index is None:
+            row.frame.place(x=0, y=k * self.row_height, relwidth=1.0)
+        row.index = index
+        start_frame = self.cuts.frame(index)
+        time_str = frames_to_timecode_premiere(start_frame, self.fps, self.frame_index)
+        row.chk.configure(text=f"[{index+1}] {time_str}")
+        row.var.set(self.cuts.is_selected(index))
+        image = self._thumb_image(start_frame)
+        if image is not None:
+            row.thumb.configure(image=image)
+
+    def _thumb_image(self, frame_num):
+        if self.thumb_atlas is None:
+            return None
+        image = self._thumb_images.get(frame_num)
+        if image is None:
+            thumb = self.thumb_atlas.get(frame_num)
+            if thumb is None:
+                return self._blank_thumb
+            if len(self._thumb_images) > 1024:
+                self._thumb_images.clear()
+            from PIL import Image
+            pil_thumb = Image.fromarray(thumb)
+            image = ctk.CTkImage(light_image=pil_thumb, dark_image=pil_thumb, size=pil_thumb.size)
+            self._thumb_images[frame_num] = image
+        return image
+
+
+class _CutRow:
+    """一行的控件和它当前绑定的数据下标"""
+    __slots__ = ("frame", "var", "chk", "thumb", "btn_eye", "btn_del", "index")
+
+    def __init__(self):
+        self.index = None
+
+
+class ScoreTimeline(ctk.CTkFrame):
+    """预览区下方的时间轴：逐帧自适应分数的包络、切点位置和当前帧；点击跳转，滚轮缩放，Shift+滚轮平移
+
+    分数来自 test_core.ScorePyramid，每次重绘只按屏幕宽度取一次包络，20 万帧的长片任意缩放都不卡。
+    """
+
+    HEIGHT = 64
+    ZOOM_STEP = 1.5
+    MIN_VIEW_FRAMES = 48  # 放大的极限 (可见帧数)
+    SCORE_COLOR = "#3B8ED0"
+    CUT_COLOR = "#D35400"
+    CURSOR_COLOR = "#FFFFFF"
+
+    def __init__(self, master, on_seek, **kwargs):
+        super().__init__(master, height=self.HEIGHT, **kwargs)
+        self._on_seek = on_seek
+        self.pyramid = None  # test_core.ScorePyramid，没有完整分数时为 None (只画切点)
+        self.cuts = None
+        self.frame_count = 0
+        self.threshold = None
+        self.current = 0
+        self.view = (0, 0)  # 可见帧区间 [start, end)
+
+        self.canvas = ctk.CTkCanvas(self, height=self.HEIGHT, bg="#1a1a1a", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<B1-Motion>", self._on_click)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind(sequence, self._on_wheel)
+
+    # ---------- 数据 ----------
+    def set_scores(self, pyramid, frame_count):
+        """换视频 / 新的分析结果：缩放复位到整片"""
+        self.pyramid = pyramid
+        self.frame_count = max(len(pyramid) if pyramid is not None else 0, int(frame_count or 0))
+        self.view = (0, self.frame_count)
+        self.redraw()
+
+    def set_cuts(self, cuts):
+        self.cuts = cuts
+        self.redraw()
+
+    def set_threshold(self, threshold):
+        if threshold != self.threshold:
+            self.threshold = threshold
+            self.redraw()
+
+    def set_cursor(self, frame_num):
+        """移动当前帧标记；跳到可见区间之外时平移视图，只移动标记时不重绘分数"""
+        self.current = frame_num
+        start, end = self.view
+        if not start <= frame_num < end and self.frame_count:
+            span = end - start
+            self._set_view(frame_num - span // 2, span)
+        else:
+            self._draw_cursor()
+
+    # ---------- 绘制 ----------
+    def _frame_to_x(self, frame_num, width):
+        start, end = self.view
+        return (frame_num - start) * width / max(1, end - start)
+
+    def redraw(self):
+        canvas = self.canvas
+        canvas.delete("all")
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        start, end = self.view
+        if width <= 1 or end <= start:
+            return
+        import numpy as np
+        # 纵轴上限取阈值的两倍，阈值线落在正中；更高的尖峰画到顶为止
+        top = max(2.0 * self.threshold, 1.0) if self.threshold else 10.0
+        scale = (height - 4) / top
+
+        if self.pyramid is not None:
+            mins, maxs = self.pyramid.envelope(start, end, width)
+            n = len(mins)
+            if n:
+                # 上沿从左到右、下沿从右到左，整条包络是一个多边形
+                xs = (np.arange(n) + 0.5) * (width / n)
+                upper = height - 2 - np.minimum(maxs, top) * scale
+                lower = height - 1 - np.minimum(mins, top) * scale
+                points = np.concatenate([np.column_stack([xs, upper]), np.column_stack([xs[::-1], lower[::-1]])])
+                canvas.create_polygon(points.ravel().tolist(), fill=self.SCORE_COLOR, outline=self.SCORE_COLOR)
+            if self.threshold:
+                y = height - 2 - self.threshold * scale
+                canvas.create_line(0, y, width, y, fill="gray", dash=(3, 3))
+
+        if self.cuts is not None and len(self.cuts):
+            frames = self.cuts.frames
+            lo, hi = np.searchsorted(frames, [start, end])
+            # 同一像素列上的多个切点只画一条
+            columns = np.unique(((frames[lo:hi] - start) * width // (end - start)).astype(np.int64))
+            for x in columns.tolist():
+                canvas.create_line(x, 0, x, 8, fill=self.CUT_COLOR, width=2)
+        self._draw_cursor()
+
+    def _draw_cursor(self):
+        self.canvas.delete("cursor")
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        start, end = self.view
+        if width <= 1 or not start <= self.current < end:
+            return
+        x = self._frame_to_x(self.current, width)
+        self.canvas.create_line(x, 0, x, height, fill=self.CURSOR_COLOR, tags="cursor")
+
+    # ---------- 交互 ----------
+    def _set_view(self, start, span):
+        span = int(min(max(span, self.MIN_VIEW_FRAMES), self.frame_count))
+        start = int(min(max(start, 0), self.frame_count - span))
+        if (start, start + span) != self.view:
+            self.view = (start, start + span)
+            self.redraw()
+        else:
+            self._draw_cursor()
+
+    def _on_click(self, event):
+        width = self.canvas.winfo_width()
+        start, end = self.view
+        if width <= 1 or end <= start:
+            return
+        frame_num = start + int(min(max(event.x, 0), width - 1) * (end - start) / width)
+        if frame_num != self.current:
+            self._on_seek(min(frame_num, self.frame_count - 1))
+
+    def _on_wheel(self, event):
+        width = self.canvas.winfo_width()
+        start, end = self.view
+        if width <= 1 or end <= start:
+            return
+        if getattr(event, "num", None) == 4:
+            direction = -1
+        elif getattr(event, "num", None) == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        span = end - start
+        if event.state & 0x1:
+            # Shift+滚轮：平移十分之一屏
+            self._set_view(start + direction * max(1, span // 10), span)
+            return
+        # 以指针所在的帧为中心缩放
+        anchor = start + event.x * span / width
+        new_span = span * self.ZOOM_STEP if direction > 0 else span / self.ZOOM_STEP
+        self._set_view(anchor - event.x * new_span / width, new_span)
+
+
+class JobPanel(ctk.CTkFrame):
+    """任务队列面板：每个任务一行 (文件名 / 状态 / 进度条 / 取消或打开)，只在状态变化时改对应那一行"""
+
+    HEIGHT = 120
+
+    def __init__(self, master, on_add, on_clear, on_cancel, on_open, **kwargs):
+        super().__init__(master, **kwargs)
+        self._on_cancel = on_cancel
+        self._on_open = on_open
+        self._rows = {}  # job.id -> (行框架, 状态标签, 进度条, 按钮)
+
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.pack(fill="x")
+        ctk.CTkLabel(header, text="任务队列", font=ctk.CTkFont(weight="bold")).pack(side="left", padx=5)
+        ctk.CTkButton(header, text="清除已完成", width=80, height=22, font=("Arial", 11),
+                      command=on_clear).pack(side="right", padx=5)
+        ctk.CTkButton(header, text="＋ 添加视频", width=80, height=22, font=("Arial", 11),
+                      command=on_add).pack(side="right", padx=5)
+
+        self._body = ctk.CTkScrollableFrame(self, height=self.HEIGHT, fg_color="transparent")
+        self._body.pack(fill="x", expand=True)
+
+    def update_job(self, job):
+        if job.id not in self._rows:
+            row = ctk.CTkFrame(self._body, fg_color="transparent")
+            row.pack(fill="x", pady=1)
+            text = f"{JOB_KINDS[job.kind]} · {job.name}" + (f" ({job.description})" if job.description else "")
+            ctk.CTkLabel(row, text=text, font=("Arial", 11), anchor="w", width=260).pack(side="left", padx=5)
+            button = ctk.CTkButton(row, text="✕", width=44, height=20, font=("Arial", 11))
+            button.pack(side="right", padx=5)
+            bar = ctk.CTkProgressBar(row, width=120, height=8)
+            bar.pack(side="right", padx=5)
+            status = ctk.CTkLabel(row, text="", font=("Arial", 11), width=70)
+            status.pack(side="right")
+            self._rows[job.id] = (row, status, bar, button)
+        row, status, bar, button = self._rows[job.id]
+        label = JOB_STATUS_LABELS[job.status]
+        if job.status == JOB_RUNNING:
+            label = f"{int(job.progress * 100)}%"
+        status.configure(text=label)
+        bar.set(1.0 if job.status == JOB_DONE else job.progress)
+        if not job.finished:
+            button.configure(text="✕", state="normal", command=lambda: self._on_cancel(job))
+        elif job.kind == "analysis" and job.result is not None:
+            # 分析完 (或停止后保留了部分结果) 的视频可以直接打开审阅
+            button.configure(text="打开", state="normal", command=lambda: self._on_open(job.video_path))
+        else:
+            button.configure(text="—", state="disabled")
+
+    def remove_jobs(self, jobs):
+        for job in jobs:
+            widgets = self._rows.pop(job.id, None)
+            if widgets:
+                widgets[0].destroy()
+
+
 class AutoCutApp(ctk.CTk):
     # app.py 中的 run_analysis 方法
     def run_analysis(self):
+        from test_core import find_scenes_optimized, CutList
         try:
             curr_th = round(self.slider_threshold.get(), 1)
             curr_min = int(self.slider_min_len.get())
@@ -40,9 +463,8 @@ class AutoCutApp(ctk.CTk):
                 print("分析已停止 (UI层检测)")
                 # 你可以选择是否显示部分结果，这里我们选择显示
             
-            self.scene_list = scenes
+            self.cuts = CutList.from_scenes(scenes)
             self.fps = fps
-            self.selected_indices = set(range(len(self.scene_list)))
             self.after(0, self.update_ui_after_analysis)
                 
         except Exception as e:
@@ -63,18 +485,29 @@ class AutoCutApp(ctk.CTk):
 
         # --- 数据存储 ---
         self.video_path = ""
-        self.scene_list = [] 
-        self.selected_indices = set() 
+        self.cuts = []  # 切点帧号 + 勾选位图 (test_core.CutList，导入视频后创建)
         self.fps = 24.0
-        self.cap = None 
+        self.frame_cache = None  # 预览帧 LRU 缓存 (后台预取)
+        self.thumb_atlas = None  # 分析时截取的切点缩略图 (内存映射图集)
+        self.fused = None  # 多检测器融合的逐帧指标 (test_core.FusedAnalysis)，切换检测器不用再解码
+        self.score_overview = None  # 时间轴用的逐帧分数金字塔 (test_core.ScorePyramid)
+        self.cut_sweep = None  # 滑块各取值下的切点数 (test_core.CutCountSweep)
+        self.analysis_source = ""  # 分析实际读取的文件 (原片或预览代理)，缩略图图集按它查找
+        self.proxy_group = None  # 正在生成预览代理的 ffmpeg (test_core.FFmpegProcessGroup)，切换视频时取消
         self.current_frame_idx = 0 
         
+        # 后台任务队列：分析 / 导出各一条通道，每个任务有自己的 stop_event 和进度
+        # CPU 按 split_cpu_budget 分给两条通道，同时跑时互不抢占
+        self.jobs = JobQueue(on_change=lambda job: self.after(0, lambda: self.on_job_change(job)))
+        self.cpu_budget = split_cpu_budget()
+        self._finished_jobs = set()  # 已处理过结束事件的任务 id (进度事件可能晚于结束事件到达)
+        # 切换视频时保存各视频的切点 / 帧率 / 融合结果 (含编辑)，后台分析完的结果也放在这里
+        self.sessions = {}
+
+        # 局部重新分析用的停止标志 (分析 / 导出任务各自带 stop_event)
         self.stop_event = threading.Event()
-        self.is_analyzing = False
-        self.is_exporting = False
+        self.is_analyzing = False  # 当前视频正在分析或局部重新分析
         
-        self.current_page = 0
-        self.items_per_page = 20
 
         # --- 布局配置 (关键修复点) ---
         # 1. 强制右侧列表 (Column 2) 至少有 320px 宽，防止被挤压
@@ -100,9 +533,18 @@ class AutoCutApp(ctk.CTk):
         self.list_frame.grid_propagate(False) # 再次加锁
         self.setup_result_list()
 
+        # 窗口显示后再在后台导入重型依赖，第一次导入视频时就不用等了
+        self.after(100, self.preload_backend)
+
+    def preload_backend(self):
+        def load():
+            import test_core  # noqa: F401
+            from PIL import Image  # noqa: F401
+        threading.Thread(target=load, daemon=True).start()
+
     def setup_sidebar(self):
         # 让底部区域自动填充，把按钮顶上去
-        self.sidebar_frame.grid_rowconfigure(10, weight=1)
+        self.sidebar_frame.grid_rowconfigure(11, weight=1)
 
         # 1. Logo
         ctk.CTkLabel(self.sidebar_frame, text="AutoCut\nUltimate", font=ctk.CTkFont(size=22, weight="bold")).grid(row=0, column=0, padx=20, pady=(30, 20))
@@ -116,41 +558,98 @@ class AutoCutApp(ctk.CTk):
 
         # 3. 参数调节
         ctk.CTkLabel(self.sidebar_frame, text="灵敏度 (Threshold)", anchor="w").grid(row=3, column=0, padx=20, pady=(5,0), sticky="w")
-        self.slider_threshold = ctk.CTkSlider(self.sidebar_frame, from_=1.0, to=10.0, number_of_steps=90, command=self.update_labels)
+        self.slider_threshold = ctk.CTkSlider(self.sidebar_frame, from_=THRESHOLD_STEPS[0], to=THRESHOLD_STEPS[-1],
+                                              number_of_steps=len(THRESHOLD_STEPS) - 1, command=self.update_labels)
         self.slider_threshold.set(5.0)
         self.slider_threshold.grid(row=4, column=0, padx=20, pady=(0, 10))
         self.lbl_threshold_val = ctk.CTkLabel(self.sidebar_frame, text="5.0", font=("Consolas", 12))
         self.lbl_threshold_val.grid(row=5, column=0)
 
         ctk.CTkLabel(self.sidebar_frame, text="最小镜头 (帧数)", anchor="w").grid(row=6, column=0, padx=20, pady=(5,0), sticky="w")
-        self.slider_min_len = ctk.CTkSlider(self.sidebar_frame, from_=5, to=60, number_of_steps=55, command=self.update_labels)
+        self.slider_min_len = ctk.CTkSlider(self.sidebar_frame, from_=MIN_LEN_STEPS[0], to=MIN_LEN_STEPS[-1],
+                                            number_of_steps=len(MIN_LEN_STEPS) - 1, command=self.update_labels)
         self.slider_min_len.set(12)
         self.slider_min_len.grid(row=7, column=0, padx=20, pady=(0, 10))
-        self.lbl_min_len_val = ctk.CTkLabel(self.sidebar_frame, text="12", font=("Consolas", 12))
-        self.lbl_min_len_val.grid(row=8, column=0)
+        # 数值下面是预计的切点数和 "各灵敏度下的切点数" 小直方图 (当前灵敏度高亮)，拖动时实时更新
+        min_len_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        min_len_frame.grid(row=8, column=0, padx=20, sticky="ew")
+        self.lbl_min_len_val = ctk.CTkLabel(min_len_frame, text="12", font=("Consolas", 12))
+        self.lbl_min_len_val.pack()
+        self.lbl_sweep = ctk.CTkLabel(min_len_frame, text="", font=("Arial", 11), text_color="gray")
+        self.lbl_sweep.pack()
+        self.sweep_hist = ctk.CTkCanvas(min_len_frame, width=180, height=32, bg="#2b2b2b", highlightthickness=0)
+        self.sweep_hist.pack(fill="x")
+
+        # 4. 分析选项 (统一放在一个子框架里，新增选项不用再调整下面的行号)
+        self.options_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.options_frame.grid(row=9, column=0, padx=20, pady=(5, 0), sticky="ew")
+
+        self.var_parallel = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.options_frame, text=f"多核并行分析 ({os.cpu_count() or 1} 核)", font=("Arial", 12),
+                        variable=self.var_parallel).pack(anchor="w", pady=2)
+
+        self.var_two_stage = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.options_frame, text="两阶段快速检测 (跳帧粗扫)", font=("Arial", 12),
+                        variable=self.var_two_stage).pack(anchor="w", pady=2)
+
+        self.var_fused = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.options_frame, text="多检测器融合 (一次解码)", font=("Arial", 12),
+                        variable=self.var_fused).pack(anchor="w", pady=2)
 
-        # 4. 核心操作按钮
+        self.var_library = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.options_frame, text="跳过重复片头片尾 (指纹库)", font=("Arial", 12),
+                        variable=self.var_library).pack(anchor="w", pady=2)
+
+        self.var_proxy = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.options_frame, text="分析时读取预览代理 (更快，略损精度)", font=("Arial", 12),
+                        variable=self.var_proxy).pack(anchor="w", pady=2)
+
+        ctk.CTkLabel(self.options_frame, text="解码后端", font=("Arial", 12), anchor="w").pack(anchor="w", pady=(4, 0))
+        self.backend_labels = {label: key for key, label in DECODE_BACKENDS.items()}
+        self.menu_backend = ctk.CTkOptionMenu(self.options_frame, values=list(self.backend_labels), height=24,
+                                              font=("Arial", 11))
+        self.menu_backend.set(DECODE_BACKENDS["opencv"])
+        self.menu_backend.pack(fill="x", pady=2)
+
+        ctk.CTkLabel(self.options_frame, text="检测引擎", font=("Arial", 12), anchor="w").pack(anchor="w", pady=(4, 0))
+        self.engine_labels = {label: key for key, label in ANALYSIS_ENGINES.items()}
+        self.menu_engine = ctk.CTkOptionMenu(self.options_frame, values=list(self.engine_labels), height=24,
+                                             font=("Arial", 11))
+        self.menu_engine.set(ANALYSIS_ENGINES["scenedetect"])
+        self.menu_engine.pack(fill="x", pady=2)
+
+        # 5. 核心操作按钮
         self.btn_start = ctk.CTkButton(self.sidebar_frame, text="Step 2: 开始分析", fg_color="green", state="disabled", command=self.start_analysis_thread)
-        self.btn_start.grid(row=9, column=0, padx=20, pady=20)
+        self.btn_start.grid(row=10, column=0, padx=20, pady=20)
         
         self.btn_stop = ctk.CTkButton(self.sidebar_frame, text="⏹ 停止任务", fg_color="#AA0000", hover_color="#880000", 
                                       state="disabled", command=self.request_stop)
-        self.btn_stop.grid(row=10, column=0, padx=20, pady=(0, 20), sticky="s")
+        self.btn_stop.grid(row=11, column=0, padx=20, pady=(0, 20), sticky="s")
 
-        # 5. 进度条 (确保这里只有一段代码！)
+        # 6. 进度条 (确保这里只有一段代码！)
         self.progress_bar = ctk.CTkProgressBar(self.sidebar_frame)
-        self.progress_bar.grid(row=11, column=0, padx=20, pady=(0, 10), sticky="s")
+        self.progress_bar.grid(row=12, column=0, padx=20, pady=(0, 10), sticky="s")
         self.progress_bar.set(0)
 
-        # 6. 状态文字
+        # 7. 状态文字
         self.lbl_status = ctk.CTkLabel(self.sidebar_frame, text="准备就绪", font=("Arial", 12), text_color="gray")
-        self.lbl_status.grid(row=12, column=0, padx=20, pady=(0, 20), sticky="s")
+        self.lbl_status.grid(row=13, column=0, padx=20, pady=(0, 2), sticky="s")
+
+        # 8. 性能统计 (解码速率 / 编码耗时 / 峰值内存，完整记录写入 telemetry.jsonl)
+        self.lbl_stats = ctk.CTkLabel(self.sidebar_frame, text="", font=("Arial", 10), text_color="gray",
+                                      wraplength=220, justify="left")
+        self.lbl_stats.grid(row=14, column=0, padx=20, pady=(0, 20), sticky="s")
         
     def setup_preview_area(self):
         self.video_display = ctk.CTkLabel(self.preview_frame, text="请导入视频", 
                                           fg_color="#1a1a1a", corner_radius=10)
         self.video_display.pack(expand=True, fill="both", padx=10, pady=(10, 10))
 
+        # 整集概览：逐帧分数 + 切点位置，点击跳到对应帧
+        self.timeline = ScoreTimeline(self.preview_frame, on_seek=self.show_frame, fg_color="transparent")
+        self.timeline.pack(fill="x", padx=10, pady=(0, 10))
+        self.timeline.set_threshold(round(self.slider_threshold.get(), 1))
+
         ctrl_frame = ctk.CTkFrame(self.preview_frame, fg_color="transparent")
         ctrl_frame.pack(fill="x", pady=(0, 10), padx=10)
 
@@ -167,11 +666,30 @@ class AutoCutApp(ctk.CTk):
                                             state="disabled", command=self.add_manual_point)
         self.btn_add_manual.pack(side="right", padx=10)
 
+        self.btn_rescan = ctk.CTkButton(ctrl_frame, text="↻ 重新分析本镜头", fg_color="#556B2F", hover_color="#3B4A20",
+                                        state="disabled", command=self.start_rescan_thread)
+        self.btn_rescan.pack(side="right", padx=(10, 0))
+
+        # 任务队列：审阅当前视频时，后面排队的视频在后台分析、前面的视频在后台导出
+        self.job_panel = JobPanel(self.preview_frame, on_add=self.add_videos_to_queue,
+                                  on_clear=self.clear_finished_jobs, on_cancel=lambda job: job.cancel(),
+                                  on_open=self.open_video)
+        self.job_panel.pack(fill="x", padx=10, pady=(0, 10))
+
     def setup_result_list(self):
         top_bar = ctk.CTkFrame(self.list_frame, fg_color="transparent")
         top_bar.pack(fill="x", pady=5)
         
         ctk.CTkLabel(top_bar, text="切点列表", font=ctk.CTkFont(weight="bold")).pack(side="left", padx=10)
+
+        # 融合分析后在各检测器的结果 (或并集) 之间切换
+        self.detector_labels = {label: key for key, label in FUSED_DETECTORS.items()}
+        self.detector_labels["并集"] = "union"
+        self.seg_detector = ctk.CTkSegmentedButton(top_bar, values=list(self.detector_labels), height=24,
+                                                   font=("Arial", 11), command=self.on_detector_switch)
+        self.seg_detector.set(FUSED_DETECTORS["adaptive"])
+        self.seg_detector.configure(state="disabled")
+        self.seg_detector.pack(side="right", padx=10)
         
         btn_frame = ctk.CTkFrame(self.list_frame, fg_color="transparent")
         btn_frame.pack(fill="x", pady=2)
@@ -180,24 +698,35 @@ class AutoCutApp(ctk.CTk):
         ctk.CTkButton(btn_frame, text="全选所有", width=80, height=24, font=("Arial", 11), 
                       command=self.toggle_select_all).pack(side="left", padx=(10, 5)) # 左边距大一点，中间小一点
         
-        ctk.CTkButton(btn_frame, text="全选本页", width=80, height=24, font=("Arial", 11), 
-                      command=self.toggle_select_page).pack(side="left", padx=5) # 挨着上面那个，但有间隙
+        ctk.CTkButton(btn_frame, text="全选可见", width=80, height=24, font=("Arial", 11), 
+                      command=self.toggle_select_visible).pack(side="left", padx=5) # 挨着上面那个，但有间隙
 
-        self.result_scroll = ctk.CTkScrollableFrame(self.list_frame, label_text="勾选以导出")
-        self.result_scroll.pack(fill="both", expand=True, padx=5, pady=5)
+        # 虚拟化列表：固定数量的行控件，滚动时重绑数据
+        self.cut_list = VirtualCutList(self.list_frame, on_toggle=self.on_check, on_preview=self.show_frame,
+                                       on_delete=self.delete_item, on_scroll=self.on_list_scroll)
+        self.cut_list.pack(fill="both", expand=True, padx=5, pady=5)
 
         page_ctrl = ctk.CTkFrame(self.list_frame, fg_color="transparent", height=30)
         page_ctrl.pack(fill="x", pady=2)
         
-        self.btn_page_prev = ctk.CTkButton(page_ctrl, text="<", width=30, command=lambda: self.change_page(-1))
+        self.btn_page_prev = ctk.CTkButton(page_ctrl, text="<", width=30, command=lambda: self.cut_list.scroll_pages(-1))
         self.btn_page_prev.pack(side="left", padx=10)
         
-        self.lbl_page_info = ctk.CTkLabel(page_ctrl, text="Page 1 / 1")
+        self.lbl_page_info = ctk.CTkLabel(page_ctrl, text="0 / 0")
         self.lbl_page_info.pack(side="left", expand=True)
         
-        self.btn_page_next = ctk.CTkButton(page_ctrl, text=">", width=30, command=lambda: self.change_page(1))
+        self.btn_page_next = ctk.CTkButton(page_ctrl, text=">", width=30, command=lambda: self.cut_list.scroll_pages(1))
         self.btn_page_next.pack(side="right", padx=10)
 
+        export_opt = ctk.CTkFrame(self.list_frame, fg_color="transparent")
+        export_opt.pack(fill="x", padx=10, pady=(4, 0))
+        ctk.CTkLabel(export_opt, text="导出模式", font=("Arial", 12)).pack(side="left")
+        self.export_mode_labels = {label: key for key, label in EXPORT_MODES.items()}
+        self.menu_export_mode = ctk.CTkOptionMenu(export_opt, values=list(self.export_mode_labels), height=24,
+                                                  font=("Arial", 11))
+        self.menu_export_mode.set(EXPORT_MODES["reencode"])
+        self.menu_export_mode.pack(side="right", fill="x", expand=True, padx=(10, 0))
+
         self.btn_export = ctk.CTkButton(self.list_frame, text="Step 3: 导出选中的片段", fg_color="#D35400", hover_color="#A04000",
                                         height=40, font=ctk.CTkFont(size=16, weight="bold"), command=self.start_export_thread)
         self.btn_export.pack(fill="x", padx=10, pady=10)
@@ -207,27 +736,160 @@ class AutoCutApp(ctk.CTk):
     def update_labels(self, value):
         self.lbl_threshold_val.configure(text=f"{round(self.slider_threshold.get(), 1)}")
         self.lbl_min_len_val.configure(text=f"{int(self.slider_min_len.get())}")
+        self.timeline.set_threshold(round(self.slider_threshold.get(), 1))
+        self.update_sweep_preview()
+
+    def update_sweep_preview(self):
+        """按当前滑块位置在切点数表里查表，画出固定最小镜头时各灵敏度的切点数"""
+        canvas = self.sweep_hist
+        canvas.delete("all")
+        if self.cut_sweep is None:
+            self.lbl_sweep.configure(text="")
+            return
+        curr_th = round(self.slider_threshold.get(), 1)
+        curr_min = int(self.slider_min_len.get())
+        self.lbl_sweep.configure(text=f"预计 {self.cut_sweep.count(curr_th, curr_min)} 个切点 (自适应)")
+        counts = self.cut_sweep.counts_for_min_len(curr_min).tolist()
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width <= 1:
+            width, height = int(canvas["width"]), int(canvas["height"])
+        peak = max(max(counts), 1)
+        bar = width / len(counts)
+        for i, (threshold, count) in enumerate(zip(THRESHOLD_STEPS, counts)):
+            top = height - max(1, round(count / peak * (height - 2)))
+            color = "#D35400" if threshold == curr_th else "#3B8ED0"
+            canvas.create_rectangle(i * bar, top, (i + 1) * bar, height, fill=color, outline="")
+
+    def load_cut_sweep(self, video_path, backend):
+        """没分析过、但有分数缓存的视频：在后台算切点数表，算完时还是当前视频才显示"""
+        def work():
+            from test_core import open_cut_count_sweep
+            sweep = open_cut_count_sweep(video_path, THRESHOLD_STEPS, MIN_LEN_STEPS, backend)
+
+            def apply():
+                if video_path == self.video_path and self.cut_sweep is None:
+                    self.cut_sweep = sweep
+                    self.update_sweep_preview()
+            self.after(0, apply)
+        threading.Thread(target=work, daemon=True).start()
+
+    def start_proxy(self, video_path):
+        """预览改读全帧内代理：已有时立即切换，否则在后台生成，生成完时还是当前视频才切换"""
+        from test_core import FFmpegProcessGroup, find_proxy, build_proxy
+        if self.proxy_group:
+            self.proxy_group.cancel()
+            self.proxy_group = None
+        proxy = find_proxy(video_path)
+        if proxy:
+            self.frame_cache.set_proxy(proxy)
+            return
+        group = self.proxy_group = FFmpegProcessGroup()
+
+        def work():
+            path = build_proxy(video_path, group, telemetry=self.make_telemetry(video_path))
+
+            def apply():
+                if group is self.proxy_group:
+                    self.proxy_group = None
+                if path and video_path == self.video_path:
+                    self.frame_cache.set_proxy(path)
+                    self.lbl_status.configure(text="预览代理已就绪")
+            self.after(0, apply)
+        threading.Thread(target=work, daemon=True).start()
 
     def load_video(self):
         file_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4 *.mkv *.avi")])
         if file_path:
-            self.video_path = file_path
-            self.title(f"AutoCut Ultimate - {file_path.split('/')[-1]}")
-            if self.cap: self.cap.release()
-            self.cap = cv2.VideoCapture(self.video_path)
-            self.show_frame(0)
-            self.btn_start.configure(state="normal")
-            self.btn_prev_frame.configure(state="normal")
-            self.btn_next_frame.configure(state="normal")
-            self.btn_add_manual.configure(state="normal")
+            self.open_video(file_path)
+
+    def open_video(self, file_path):
+        """切换到某个视频：先把当前视频的切点 (含手动编辑) 存进 sessions，再恢复目标视频的"""
+        if self.is_analyzing and not self.jobs.active(self.video_path, "analysis"):
+            # 局部重新分析进行中，结果要写回当前视频
+            messagebox.showinfo("提示", "正在重新分析本镜头，请等它结束后再切换视频")
+            return
+        self.save_session()
+        self.video_path = file_path
+        self.title(f"AutoCut Ultimate - {file_path.split('/')[-1]}")
+        from test_core import PreviewFrameCache, open_thumbnail_atlas, open_score_overview, CutList
+        if self.frame_cache: self.frame_cache.close()
+        self.frame_cache = PreviewFrameCache(self.video_path)
+        self.start_proxy(self.video_path)
+        session = self.sessions.get(file_path)
+        if session:
+            self.cuts, self.fps, self.fused = session["cuts"], session["fps"], session["fused"]
+        else:
+            # 还没分析过也可以手动添加切点
+            self.cuts = CutList()
+            self.fused = None
+        # 之前分析过的视频直接打开上次的缩略图图集，不解码 (分析读的是代理时图集记在代理名下)
+        backend = session["backend"] if session else self.backend_labels[self.menu_backend.get()]
+        self.analysis_source = session["source"] if session else self.video_path
+        self.thumb_atlas = open_thumbnail_atlas(self.analysis_source, backend)
+        self.score_overview = session["overview"] if session else open_score_overview(self.video_path, backend)
+        self.timeline.set_scores(self.score_overview, self.frame_cache.frame_count)
+        self.cut_sweep = session["sweep"] if session else None
+        if self.cut_sweep is None and self.score_overview is not None:
+            self.load_cut_sweep(self.video_path, backend)
+        self.update_sweep_preview()
+        self.seg_detector.configure(state="normal" if self.fused is not None else "disabled")
+        self.cut_list.top = 0
+        self.render_cut_list()
+        self.show_frame(0)
+
+        running = self.jobs.active(self.video_path, "analysis")
+        self.is_analyzing = bool(running)
+        if running:
+            self.btn_start.configure(state="disabled", text="分析中...")
+            self.progress_bar.set(running[0].progress)
+        else:
+            self.btn_start.configure(state="normal", text="重新分析" if session else "Step 2: 开始分析")
+            self.progress_bar.set(1 if session else 0)
+        self.lbl_status.configure(text=f"已切换到 {os.path.basename(file_path)}")
+        self.update_stop_button()
+        self.btn_prev_frame.configure(state="normal")
+        self.btn_next_frame.configure(state="normal")
+        self.btn_add_manual.configure(state="normal")
+        self.btn_rescan.configure(state="normal")
+
+    def save_session(self):
+        if not self.video_path or (not len(self.cuts) and self.fused is None):
+            return
+        self.sessions[self.video_path] = {"cuts": self.cuts, "fps": self.fps, "fused": self.fused,
+                                          "overview": self.score_overview, "sweep": self.cut_sweep,
+                                          "backend": self.backend_labels[self.menu_backend.get()],
+                                          "source": self.analysis_source}
+
+    def add_videos_to_queue(self):
+        """批量加入分析队列 (用当前侧栏设置)，没有打开视频时顺便打开第一个"""
+        paths = filedialog.askopenfilenames(filetypes=[("Video Files", "*.mp4 *.mkv *.avi")])
+        for path in paths:
+            if not self.jobs.active(path, "analysis"):
+                self.submit_analysis(path)
+        if paths and not self.video_path:
+            self.open_video(paths[0])
+
+    def clear_finished_jobs(self):
+        self.job_panel.remove_jobs(self.jobs.clear_finished())
+
+    def update_stop_button(self):
+        """停止按钮作用于当前视频的全部任务 (以及局部重新分析)"""
+        if self.jobs.active(self.video_path) or self.is_analyzing:
+            self.btn_stop.configure(state="normal", text="⏹ 停止任务")
+        else:
+            self.btn_stop.configure(state="disabled", text="⏹ 停止任务")
 
     def request_stop(self):
-        if self.is_exporting or self.is_analyzing:
+        jobs = self.jobs.active(self.video_path)
+        if jobs or self.is_analyzing:
+            for job in jobs:
+                job.cancel()
             self.stop_event.set()
             self.btn_stop.configure(text="正在停止...", state="disabled")
             print("用户请求停止...")
 
     def start_analysis_thread(self):
+        if self.jobs.active(self.video_path, "analysis"): return
         self.btn_start.configure(state="disabled", text="分析中...")
         self.btn_stop.configure(state="normal", text="⏹ 停止分析")
         
@@ -235,200 +897,334 @@ class AutoCutApp(ctk.CTk):
         self.progress_bar.set(0) 
         self.lbl_status.configure(text="正在初始化...") # 更新文字
         
-        self.scene_list = []
-        self.selected_indices = set()
-        self.stop_event.clear()
+        from test_core import CutList
+        self.cuts = CutList()
         self.is_analyzing = True
-        
-        thread = threading.Thread(target=self.run_analysis)
-        thread.start()
+
+        # 正在看的这一集插到分析队列最前面
+        self.submit_analysis(self.video_path, front=True)
+
+    def analysis_settings(self):
+        """侧栏当前的分析设置；控件只在主线程读取，提交任务时拍下快照"""
+        from test_core import COARSE_STEP
+        return {
+            "threshold": round(self.slider_threshold.get(), 1),
+            "min_len": int(self.slider_min_len.get()),
+            # 多核并行只用分给分析的那份核，其余留给同时进行的导出
+            "workers": self.cpu_budget[0] if self.var_parallel.get() else 1,
+            # 两阶段检测只精算候选区间，不与多核并行叠加
+            "coarse_step": COARSE_STEP if self.var_two_stage.get() else 0,
+            "decode_backend": self.backend_labels[self.menu_backend.get()],
+            "engine": self.engine_labels[self.menu_engine.get()],
+            "fused": self.var_fused.get(),
+            "library": self.var_library.get(),
+            "proxy": self.var_proxy.get(),
+            "detector": self.detector_labels[self.seg_detector.get()],
+        }
+
+    def submit_analysis(self, video_path, front=False):
+        settings = self.analysis_settings()
+        return self.jobs.submit("analysis", video_path, lambda job: self.run_analysis(job, settings),
+                                front=front)
+
+    def make_telemetry(self, video_path=None, **context):
+        """遥测事件写入日志文件，同时把摘要显示在状态栏下方 (工作线程里调用，UI 更新丢回主线程)"""
+        from telemetry import Telemetry, JsonLinesSink, TELEMETRY_LOG, format_stats_line
+
+        def show_stats(event):
+            line = format_stats_line(event)
+            if line:
+                self.after(0, lambda: self.lbl_stats.configure(text=line))
+
+        try:
+            sinks = [JsonLinesSink(TELEMETRY_LOG), show_stats]
+        except OSError as e:
+            print(f"[Debug] 无法写入遥测日志: {e}")
+            sinks = [show_stats]
+        return Telemetry(sinks, video=os.path.basename(video_path or self.video_path), **context)
 
     # app.py 中的 run_analysis 方法
     
-    def run_analysis(self):
-        try:
-            curr_th = round(self.slider_threshold.get(), 1)
-            curr_min = int(self.slider_min_len.get())
-            
-            # 【核心修改：线程安全的 UI 更新】
-            def update_progress(p):
-                # 不要直接调用 set/configure !
-                # 用 self.after(0, ...) 把任务扔回主线程
-                percent = int(p * 100)
-                self.after(0, lambda: self.progress_bar.set(p))
-                self.after(0, lambda: self.lbl_status.configure(text=f"分析进度: {percent}%"))
+    def run_analysis(self, job, settings):
+        """分析通道线程里执行：只做计算，不碰控件；结果由 on_job_change 在主线程里接收"""
+        from test_core import (find_scenes_optimized, find_scenes_fused, find_scenes_with_library, deselect_segments,
+                               open_score_overview, open_cut_count_sweep, find_proxy, scenes_from_cuts, CutList)
+
+        # 勾选时读已生成的预览代理 (帧号与原片一致)；指纹库按原片登记，不读代理
+        source = job.video_path
+        if settings["proxy"] and not settings["library"]:
+            source = find_proxy(job.video_path) or job.video_path
 
-            # 调用后端
+        # 调用后端 (进度和停止都走任务自己的 report / stop_event)
+        fused = None
+        if settings["fused"]:
+            # 一次解码记下全部检测器的逐帧指标，切点按提交时选中的检测器给出
+            fused = find_scenes_fused(
+                source,
+                progress_callback=job.report,
+                stop_event=job.stop_event,
+                workers=settings["workers"],
+                decode_backend=settings["decode_backend"],
+                engine=settings["engine"],
+                telemetry=self.make_telemetry(job.video_path)
+            )
+            fps = fused.fps
+            cuts = self.fused_cut_frames(settings["detector"], settings["threshold"], settings["min_len"], fused)
+            scenes = scenes_from_cuts(cuts, len(fused), fps)
+        elif settings["library"]:
+            # 与前面几集相同的片段 (片头片尾等) 沿用指纹库里的切点，只分析其余部分
+            scenes, fps, segments = find_scenes_with_library(
+                job.video_path,
+                settings["threshold"],
+                settings["min_len"],
+                progress_callback=job.report,
+                stop_event=job.stop_event,
+                workers=settings["workers"],
+                decode_backend=settings["decode_backend"],
+                engine=settings["engine"],
+                telemetry=self.make_telemetry(job.video_path),
+                coarse_step=settings["coarse_step"]
+            )
+        else:
             scenes, fps = find_scenes_optimized(
-                self.video_path, 
-                curr_th, 
-                curr_min,
-                progress_callback=update_progress,
-                stop_event=self.stop_event
+                source,
+                settings["threshold"], 
+                settings["min_len"],
+                progress_callback=job.report,
+                stop_event=job.stop_event,
+                workers=settings["workers"],
+                decode_backend=settings["decode_backend"],
+                engine=settings["engine"],
+                telemetry=self.make_telemetry(job.video_path),
+                coarse_step=settings["coarse_step"]
             )
 
-            # ================= 核心修复：强制补满进度条 =================
-            # 当上面那句代码跑完，说明分析肯定结束了。
-            # 无论刚才停在99%还是90%，这里强制设为 100%
-            self.after(0, lambda: self.progress_bar.set(1))
-            self.after(0, lambda: self.lbl_status.configure(text="分析完成 (100%)"))
-            # ==========================================================
+        # 默认全选；重复片段内的切点取消勾选，导出时跳过 (需要时可以再勾上)
+        cuts = CutList.from_scenes(scenes)
+        if settings["library"] and not settings["fused"]:
+            deselect_segments(cuts, segments)
+        # 时间轴概览的金字塔和滑块的切点数表都在这里 (后台线程) 算好；没有完整分数时为 None
+        overview = open_score_overview(source, settings["decode_backend"], fused)
+        sweep = open_cut_count_sweep(source, THRESHOLD_STEPS, MIN_LEN_STEPS, settings["decode_backend"],
+                                     fused)
+        return {"cuts": cuts, "fps": fps, "fused": fused, "overview": overview,
+                "sweep": sweep, "backend": settings["decode_backend"], "coarse_step": settings["coarse_step"],
+                "source": source}
 
-            self.scene_list = scenes
-            self.fps = fps
-            
-            # 默认全选
-            self.selected_indices = set(range(len(self.scene_list)))
-            
-            # 检查是否是中途停止
-            if self.stop_event.is_set():
-                msg = f"分析已手动停止！\n已识别到 {len(scenes)} 个片段。"
-                print(msg)
-                self.after(0, lambda: self.lbl_status.configure(text="已停止 (显示部分结果)"))
-                self.after(0, lambda: messagebox.showinfo("提示", msg))
-            
-            # 无论是否停止，都去渲染结果列表 (Update UI)
-            self.after(0, self.update_ui_after_analysis)
-                
-        except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc() # 在终端打印详细报错，方便调试
-            
-            err_msg = str(e)
-            self.after(0, lambda: messagebox.showerror("错误", err_msg))
-            self.after(0, lambda: self.btn_start.configure(state="normal", text="重试"))
-            self.after(0, lambda: self.lbl_status.configure(text="发生错误"))
-        finally:
-            self.is_analyzing = False
-            self.after(0, lambda: self.btn_stop.configure(state="disabled", text="⏹ 停止任务"))
+    def on_job_change(self, job):
+        """任务状态 / 进度变化 (主线程)：更新队列面板，当前视频的分析同步到侧栏进度条"""
+        self.job_panel.update_job(job)
+        if job.kind == "analysis" and job.video_path == self.video_path and not job.finished:
+            self.progress_bar.set(job.progress)
+            self.lbl_status.configure(text=f"分析进度: {int(job.progress * 100)}%")
+        if job.finished and job.id not in self._finished_jobs:
+            self._finished_jobs.add(job.id)
+            if job.kind == "analysis":
+                self.finish_analysis_job(job)
+            else:
+                self.finish_export_job(job)
+        self.update_stop_button()
+
+    def finish_analysis_job(self, job):
+        from test_core import open_thumbnail_atlas
+        current = job.video_path == self.video_path
+        if job.status == JOB_FAILED:
+            if current:
+                self.is_analyzing = False
+                messagebox.showerror("错误", f"{job.name}: {job.error}")
+                self.btn_start.configure(state="normal", text="重试")
+                self.lbl_status.configure(text="发生错误")
+            return
+        result = job.result
+        if result is None:
+            # 排队时就被取消，没有结果
+            if current:
+                self.is_analyzing = False
+                self.btn_start.configure(state="normal")
+            return
+        if not current:
+            # 后台分析完的视频：结果先存着，切换过去时再显示
+            self.sessions[job.video_path] = result
+            return
+
+        self.is_analyzing = False
+        # ================= 核心修复：强制补满进度条 =================
+        # 任务结束说明分析肯定结束了，无论刚才停在99%还是90%，这里强制设为 100%
+        self.progress_bar.set(1)
+        self.lbl_status.configure(text="分析完成 (100%)")
+        # ==========================================================
+        self.cuts = result["cuts"]
+        self.fps = result["fps"]
+        self.fused = result["fused"]
+        self.score_overview = result["overview"]
+        self.cut_sweep = result["sweep"]
+        self.analysis_source = result["source"]
+        self.thumb_atlas = open_thumbnail_atlas(self.analysis_source, result["backend"])
+
+        # 检查是否是中途停止
+        if job.status == JOB_CANCELLED:
+            msg = f"分析已手动停止！\n已识别到 {len(self.cuts)} 个片段。"
+            if not result["coarse_step"]:
+                # 逐帧分数已写成检查点 (两阶段检测不写)
+                msg += "\n进度已保存，再次分析同一文件时会从停止处继续。"
+            print(msg)
+            self.lbl_status.configure(text="已停止 (显示部分结果)")
+            messagebox.showinfo("提示", msg)
+
+        # 无论是否停止，都去渲染结果列表 (Update UI)
+        self.update_ui_after_analysis()
 
     def update_ui_after_analysis(self):
         self.progress_bar.set(1)
         self.btn_start.configure(text="重新分析", state="normal")
-        self.current_page = 0
-        self.render_pagination_list()
+        self.seg_detector.configure(state="normal" if self.fused is not None else "disabled")
+        if self.fused is not None and self.fused.completed:
+            self.show_detector_counts()
+        self.timeline.set_scores(self.score_overview, self.frame_cache.frame_count)
+        self.update_sweep_preview()
+        self.cut_list.top = 0
+        self.render_cut_list()
 
-    def render_pagination_list(self):
-        # 1. 清空当前列表
-        for widget in self.result_scroll.winfo_children():
-            widget.destroy()
+    def fused_cut_frames(self, detector, threshold, min_len, fused=None):
+        """融合结果中某个检测器 (或 "union") 的切点；自适应检测器用侧栏的灵敏度，其余用默认阈值"""
+        if fused is None:
+            fused = self.fused
+        thresholds = {"adaptive": threshold}
+        if detector == "union":
+            return fused.union(min_len, thresholds)
+        return fused.cuts(detector, min_len, thresholds.get(detector))
 
-        total_items = len(self.scene_list)
-        total_pages = (total_items + self.items_per_page - 1) // self.items_per_page
-        if total_pages == 0: total_pages = 1
-        
-        self.lbl_page_info.configure(text=f"Page {self.current_page + 1} / {total_pages}")
-        
-        start_idx = self.current_page * self.items_per_page
-        end_idx = min(start_idx + self.items_per_page, total_items)
-        
-        # 2. 渲染行 (使用 grid 布局实现完美对齐)
-        for i in range(start_idx, end_idx):
-            scene = self.scene_list[i]
-            start_frame = scene[0]
-            time_str = frames_to_timecode_premiere(start_frame, self.fps)
-            
-            row = ctk.CTkFrame(self.result_scroll, fg_color="transparent")
-            row.pack(fill="x", pady=2)
-            
-            # --- 关键：行内布局 ---
-            # Col 0: 复选框 (Sticky W 靠左)
-            # Col 1: 弹簧 (Weight 1, 把后面挤到右边)
-            # Col 2: 眼睛
-            # Col 3: 删除
-            row.grid_columnconfigure(1, weight=1) 
-            
-            chk_var = ctk.BooleanVar(value=(i in self.selected_indices))
-            chk = ctk.CTkCheckBox(row, text=f"[{i+1}] {time_str}", font=("Consolas", 12), width=100,
-                                  variable=chk_var, command=lambda idx=i, v=chk_var: self.on_check(idx, v))
-            chk.grid(row=0, column=0, sticky="w", padx=5)
-            
-            # 空 Label 占位，把后面推到右边
-            ctk.CTkLabel(row, text="").grid(row=0, column=1) 
-
-            # 眼睛 (固定尺寸)
-            ctk.CTkButton(row, text="👁", width=30, height=24, fg_color="#444", 
-                          command=lambda f=start_frame: self.show_frame(f)).grid(row=0, column=2, padx=2)
-
-            # 删除 (固定尺寸)
-            ctk.CTkButton(row, text="×", width=30, height=24, fg_color="#AA0000", hover_color="#FF0000",
-                          command=lambda idx=i: self.delete_item(idx)).grid(row=0, column=3, padx=5)
-
-    def change_page(self, delta):
-        total_items = len(self.scene_list)
-        total_pages = (total_items + self.items_per_page - 1) // self.items_per_page
-        new_page = self.current_page + delta
-        if 0 <= new_page < total_pages:
-            self.current_page = new_page
-            self.render_pagination_list()
-
-    def on_check(self, index, var):
-        if var.get():
-            self.selected_indices.add(index)
-        else:
-            self.selected_indices.discard(index)
+    def show_detector_counts(self):
+        curr_th = round(self.slider_threshold.get(), 1)
+        counts = self.fused.all_cuts(int(self.slider_min_len.get()), {"adaptive": curr_th})
+        self.lbl_status.configure(text=" · ".join(f"{FUSED_DETECTORS[name]} {len(cuts)}"
+                                                  for name, cuts in counts.items()))
+
+    def on_detector_switch(self, label):
+        """在融合结果之间切换：只在内存中的逐帧指标上重算，不解码"""
+        if self.fused is None or self.is_analyzing: return
+        from test_core import CutList
+        frames = self.fused_cut_frames(self.detector_labels[label], round(self.slider_threshold.get(), 1),
+                                       int(self.slider_min_len.get()))
+        self.cuts = CutList(frames)
+        self.cut_list.top = 0
+        self.render_cut_list()
+        self.show_detector_counts()
+
+    def render_cut_list(self):
+        """整体换数据 (新的分析结果)；只重绑可见的那几行"""
+        self.cut_list.set_data(self.cuts, self.thumb_atlas, self.fps,
+                               self.frame_cache.index if self.frame_cache else None)
+        self.timeline.set_cuts(self.cuts)
+        self.on_list_scroll()
+
+    def on_list_scroll(self):
+        first, last = self.cut_list.visible_range()
+        total = len(self.cuts)
+        self.lbl_page_info.configure(text=f"{first + 1 if total else 0}-{last} / {total}")
+        self.prefetch_preview()
+
+    def on_check(self, index, value):
+        self.cuts.set_selected(index, value)
 
     def toggle_select_all(self):
-        if len(self.selected_indices) == len(self.scene_list):
-            self.selected_indices.clear()
-        else:
-            self.selected_indices = set(range(len(self.scene_list)))
-        self.render_pagination_list()
-
-    def toggle_select_page(self):
-        total_items = len(self.scene_list)
-        start_idx = self.current_page * self.items_per_page
-        end_idx = min(start_idx + self.items_per_page, total_items)
-        page_indices = set(range(start_idx, end_idx))
-        if page_indices.issubset(self.selected_indices):
-            self.selected_indices -= page_indices
-        else:
-            self.selected_indices.update(page_indices)
-        self.render_pagination_list()
+        if not len(self.cuts): return
+        self.cuts.select_all(self.cuts.selected_count() != len(self.cuts))
+        self.cut_list.refresh()
+
+    def toggle_select_visible(self):
+        if not len(self.cuts): return
+        first, last = self.cut_list.visible_range()
+        self.cuts.select_range(first, last, not self.cuts.range_selected(first, last))
+        self.cut_list.refresh()
 
     def delete_item(self, index):
-        self.scene_list.pop(index)
-        new_selected = set()
-        for idx in self.selected_indices:
-            if idx < index:
-                new_selected.add(idx)
-            elif idx > index:
-                new_selected.add(idx - 1)
-        self.selected_indices = new_selected
-        self.render_pagination_list()
+        # 勾选位图随帧号一起平移，不用重新编号
+        self.cuts.remove(index)
+        self.cut_list.refresh(from_index=index)
+        self.timeline.redraw()
+        self.on_list_scroll()
 
     def add_manual_point(self):
         new_frame = self.current_frame_idx
-        existing_frames = [s[0] for s in self.scene_list]
-        if new_frame in existing_frames:
+        if new_frame in self.cuts:
             messagebox.showinfo("提示", "该帧已经是切点了")
             return
             
-        self.scene_list.append((new_frame, None))
-        self.scene_list.sort(key=lambda x: x[0])
+        new_index = self.cuts.insert(new_frame, selected=True)
         
-        new_index = [s[0] for s in self.scene_list].index(new_frame)
-        new_selected = set()
-        for idx in self.selected_indices:
-            if idx < new_index:
-                new_selected.add(idx)
-            else:
-                new_selected.add(idx + 1)
-        new_selected.add(new_index)
-        self.selected_indices = new_selected
-        
-        self.current_page = new_index // self.items_per_page
-        self.render_pagination_list()
+        self.cut_list.refresh(from_index=new_index)
+        self.cut_list.scroll_to(new_index)
+        self.timeline.redraw()
+        self.on_list_scroll()
         messagebox.showinfo("成功", f"已添加第 {new_frame} 帧为新切点")
 
+    def start_rescan_thread(self):
+        """用侧栏当前的灵敏度 / 最小镜头，只重新检测当前帧所在的镜头"""
+        if self.is_analyzing: return
+        start, end = self.cuts.scene_at(self.current_frame_idx, self.frame_cache.frame_count)
+        curr_th = round(self.slider_threshold.get(), 1)
+        curr_min = int(self.slider_min_len.get())
+        if not messagebox.askyesno("局部重新分析",
+                                   f"用 灵敏度 {curr_th} / 最小镜头 {curr_min} 帧重新检测第 {start}-{end} 帧？\n"
+                                   f"区间内原有的切点会被替换，区间外的切点和勾选不受影响。"):
+            return
+
+        self.btn_rescan.configure(state="disabled", text="分析中...")
+        self.btn_start.configure(state="disabled")
+        self.btn_stop.configure(state="normal", text="⏹ 停止分析")
+        self.progress_bar.set(0)
+        self.stop_event.clear()
+        self.is_analyzing = True
+        # 控件只在主线程读取；重新分析读的是整片分析时的那个文件 (原片或预览代理)，分数缓存也记在它名下
+        settings = {"source": self.analysis_source or self.video_path,
+                    "decode_backend": self.backend_labels[self.menu_backend.get()],
+                    "engine": self.engine_labels[self.menu_engine.get()]}
+        thread = threading.Thread(target=self.run_rescan, args=(start, end, curr_th, curr_min, settings))
+        thread.daemon = True
+        thread.start()
+
+    def run_rescan(self, start, end, threshold, min_len, settings):
+        from test_core import rescan_range
+        try:
+            def update_progress(p):
+                self.after(0, lambda: self.progress_bar.set(p))
+
+            new_cuts = rescan_range(settings["source"], start, end, threshold, min_len,
+                                    decode_backend=settings["decode_backend"],
+                                    engine=settings["engine"],
+                                    progress_callback=update_progress, stop_event=self.stop_event)
+            self.after(0, lambda: self.apply_rescan(start, end, new_cuts))
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            err_msg = str(e)
+            self.after(0, lambda: messagebox.showerror("错误", err_msg))
+        finally:
+            self.is_analyzing = False
+            self.after(0, lambda: self.btn_rescan.configure(state="normal", text="↻ 重新分析本镜头"))
+            self.after(0, lambda: self.btn_start.configure(state="normal"))
+            self.after(0, self.update_stop_button)
+
+    def apply_rescan(self, start, end, new_cuts):
+        if new_cuts is None:
+            self.lbl_status.configure(text="已停止 (切点未改动)")
+            return
+        self.progress_bar.set(1)
+        first = self.cuts.replace_range(start, end, new_cuts)
+        self.cut_list.refresh(from_index=first)
+        self.timeline.redraw()
+        self.on_list_scroll()
+        self.lbl_status.configure(text=f"第 {start}-{end} 帧: {len(new_cuts)} 个新切点")
+
     def show_frame(self, frame_num):
-        if not self.cap: return
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-        ret, frame = self.cap.read()
-        if ret:
+        if not self.frame_cache: return
+        frame_rgb = self.frame_cache.get(frame_num)
+        if frame_rgb is not None:
             self.current_frame_idx = frame_num
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            self.timeline.set_cursor(frame_num)
+            self.prefetch_preview()
+            from PIL import Image
             pil_image = Image.fromarray(frame_rgb)
             
             # --- 修复：防止 UI 挤压 ---
@@ -456,17 +1252,29 @@ class AutoCutApp(ctk.CTk):
             ctk_img = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(final_w, final_h))
             
             self.video_display.configure(image=ctk_img, text="")
-            time_str = frames_to_timecode_premiere(frame_num, self.fps)
+            index = self.frame_cache.index
+            time_str = frames_to_timecode_premiere(frame_num, self.fps, index)
+            if index is not self.cut_list.frame_index:
+                # 帧索引由预览缓存在后台读取，就绪后列表里的时间码也换成按真实时间戳换算
+                self.cut_list.frame_index = index
+                self.cut_list.refresh()
             self.lbl_curr_time.configure(text=f"{time_str}")
 
+    def prefetch_preview(self):
+        """后台预取：先当前帧附近，再列表中可见的各切点附近"""
+        if not self.frame_cache: return
+        first, last = self.cut_list.visible_range()
+        visible_cuts = self.cuts.frames[first:last].tolist()
+        self.frame_cache.prefetch([self.current_frame_idx] + visible_cuts)
+
     def seek_relative(self, delta):
-        if self.cap:
+        if self.frame_cache:
             new_frame = max(0, self.current_frame_idx + delta)
             self.show_frame(new_frame)
 
     def start_export_thread(self):
-        if not self.scene_list: return
-        if not self.selected_indices:
+        if not len(self.cuts): return
+        if not self.cuts.selected_count():
             messagebox.showwarning("提示", "请至少勾选一个片段！")
             return
             
@@ -482,60 +1290,59 @@ class AutoCutApp(ctk.CTk):
             if input_text and input_text.strip():
                 base_name = input_text.strip()
         
-        self.btn_export.configure(state="disabled", text="正在导出中...")
-        self.btn_stop.configure(state="normal", text="⏹ 停止导出")
-        self.stop_event.clear()
-        self.is_exporting = True
-        
-        thread = threading.Thread(target=self.run_export, args=(save_dir, base_name))
-        thread.start()
+        # 导出任务拿到的是切点的快照：提交后继续编辑 / 切换视频不影响正在导出的片段
+        items_to_export = self.cuts.export_ranges(self.frame_cache.frame_count)
+        export_mode = self.export_mode_labels[self.menu_export_mode.get()]
+        self.jobs.submit("export", self.video_path,
+                         lambda job: self.run_export(job, items_to_export, save_dir, base_name, export_mode),
+                         description=f"{len(items_to_export)} 个片段")
+        self.lbl_status.configure(text=f"已加入导出队列: {len(items_to_export)} 个片段")
 
     # app.py 中的 run_export 方法
-    def run_export(self, save_dir, base_name):
-        try:
-            # 1. 准备数据
-            all_points = [s[0] for s in self.scene_list]
-            total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            sorted_indices = sorted(list(self.selected_indices))
-            
-            items_to_export = []
-            for idx in sorted_indices:
-                start_frame = all_points[idx]
-                if idx < len(all_points) - 1:
-                    end_frame = all_points[idx + 1]
-                else:
-                    end_frame = total_frames
-                items_to_export.append((start_frame, end_frame))
-            
-            # 2. 定义导出进度回调
-            def update_export_progress(p):
-                # 更新按钮文字显示百分比
-                self.btn_export.configure(text=f"导出中 ({int(p*100)}%)...")
-
-            # 3. 【关键修改】调用后端新函数
-            success_count = export_video_clips(
-                self.video_path,
-                items_to_export,
-                save_dir,
-                base_name=base_name,
-                progress_callback=update_export_progress,
-                stop_event=self.stop_event
-            )
+    def run_export(self, job, items_to_export, save_dir, base_name, export_mode="reencode"):
+        """导出通道线程里执行，只用分给导出的那份 CPU"""
+        from test_core import export_video_clips
+        return export_video_clips(
+            job.video_path,
+            items_to_export,
+            save_dir,
+            base_name=base_name,
+            progress_callback=job.report,
+            stop_event=job.stop_event,
+            mode=export_mode,
+            telemetry=self.make_telemetry(job.video_path),
+            cpu_budget=self.cpu_budget[1]
+        )
 
-            if self.stop_event.is_set():
-                 self.after(0, lambda: messagebox.showinfo("已停止", f"导出已中断！\n成功导出: {success_count} 个文件"))
-            else:
-                 self.after(0, lambda: messagebox.showinfo("成功", f"导出完成！\n共导出 {success_count} 个片段"))
-            
-        except Exception as e:
-            err_msg = str(e)
-            print(err_msg)
-            self.after(0, lambda m=err_msg: messagebox.showerror("导出失败", str(m)))
-        finally:
-             self.is_exporting = False
-             self.after(0, lambda: self.btn_export.configure(state="normal", text="Step 3: 导出选中的片段"))
-             self.after(0, lambda: self.btn_stop.configure(state="disabled", text="⏹ 停止任务"))
+    def finish_export_job(self, job):
+        if job.status == JOB_FAILED:
+            messagebox.showerror("导出失败", f"{job.name}: {job.error}")
+            return
+        result = job.result
+        if result is None:
+            return  # 排队时就被取消
+        success_count = len(result["succeeded"])
+        failed = result["failed"]
+        summary = f"{job.name}\n成功导出: {success_count} 个片段"
+        if failed:
+            summary += f"\n失败: {len(failed)} 个"
+            for idx, path, error in failed[:5]:
+                summary += f"\n  · {os.path.basename(path)}: {error.splitlines()[-1] if error else ''}"
+            if len(failed) > 5:
+                summary += f"\n  ... 其余 {len(failed) - 5} 个见终端输出"
+
+        if result["cancelled"]:
+            messagebox.showinfo("已停止", f"导出已中断！\n{summary}")
+        elif failed:
+            messagebox.showwarning("部分失败", f"导出结束\n{summary}")
+        else:
+            messagebox.showinfo("成功", f"导出完成！\n{job.name}: 共导出 {success_count} 个片段")
 
 if __name__ == "__main__":
+    # 多核分析使用 spawn 子进程，打包成 exe 后必须先调用
+    multiprocessing.freeze_support()
     app = AutoCutApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    # 后台线程是 daemon，随进程退出；还在生成代理的 ffmpeg 子进程要显式结束
+    if app.proxy_group:
+        app.proxy_group.cancel()
\ No newline at end of file
@@ -0,0 +1,274 @@
+# autocut_cli.py —— 无界面批量处理 (不导入 customtkinter，可在无显示器的渲染机上运行)
+# 用法:
+#   python autocut_cli.py <目录|通配符|文件>... [-o 输出目录] [-j 进程数] [--export]
+# 例:
+#   python autocut_cli.py "D:/番剧/S01" -o out -j 4 --format both
+#   python autocut_cli.py "S01/*.mkv" --export --export-mode smart --skip-existing
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from telemetry import Telemetry, JsonLinesSink
+from test_core import (find_scenes_optimized, find_scenes_with_library, deselect_segments, frames_to_timecode_premiere,
+                       export_video_clips, CutList, get_frame_index, DECODE_BACKENDS, ANALYSIS_ENGINES, EXPORT_MODES)
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi")
+
+
+# ==================== 1. 收集输入文件 ====================
+def collect_videos(inputs, recursive=False):
+    """目录 / 通配符 / 单个文件 → 去重后按路径排序的视频列表"""
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(item):
+            candidates = glob.glob(item, recursive=True)
+        else:
+            candidates = [item]
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS):
+                found.append(os.path.abspath(path))
+    return sorted(set(found))
+
+
+def output_stems(videos):
+    """每个视频的输出文件名前缀；不同目录下的同名文件加序号区分"""
+    stems = {}
+    used = set()
+    for path in videos:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        candidate, n = stem, 2
+        while candidate in used:
+            candidate = f"{stem}_{n}"
+            n += 1
+        used.add(candidate)
+        stems[path] = candidate
+    return stems
+
+
+# ==================== 2. 切点列表输出 ====================
+def cut_rows(cuts, total_frames, fps, index=None):
+    rows = []
+    for i, (start, end) in enumerate(cuts.export_ranges(total_frames)):
+        rows.append({
+            "index": i + 1,
+            "start_frame": start,
+            "end_frame": end,
+            "start_timecode": frames_to_timecode_premiere(start, fps, index),
+            "end_timecode": frames_to_timecode_premiere(end, fps, index),
+        })
+    return rows
+
+
+def write_cut_list(base_path, video_path, rows, fps, total_frames, settings, formats):
+    """写出 <base_path>.cuts.json / .cuts.csv，返回写出的路径列表"""
+    written = []
+    if "json" in formats:
+        path = base_path + ".cuts.json"
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"video": video_path, "fps": fps, "total_frames": total_frames, "settings": settings,
+                       "cuts": rows}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        written.append(path)
+    if "csv" in formats:
+        path = base_path + ".cuts.csv"
+        tmp_path = path + ".tmp"
+        # utf-8-sig：Excel 直接打开不乱码
+        with open(tmp_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["index", "start_frame", "end_frame", "start_timecode",
+                                                   "end_timecode"])
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def export_marker_path(output_dir, stem):
+    """导出全部成功后才写的标记；切点列表先于导出写出，--skip-existing 不能只看切点列表"""
+    return os.path.join(output_dir, stem + ".export_done.json")
+
+
+# ==================== 3. 单集处理 (在子进程中运行) ====================
+def process_episode(video_path, stem, options):
+    """分析一集 (可选导出)，返回结果摘要；异常不向外抛，记录在摘要里"""
+    started = time.perf_counter()
+    result = {"video": video_path, "cuts": 0, "exported": 0, "failed": 0, "error": None}
+    try:
+        # 各进程追加写同一个日志文件，按 video 字段区分
+        sinks = [JsonLinesSink(options["telemetry"])] if options["telemetry"] else []
+        telemetry = Telemetry(sinks, video=os.path.basename(video_path))
+        analysis_options = dict(use_cache=options["use_cache"], decode_backend=options["backend"],
+                                engine=options["engine"], telemetry=telemetry, coarse_step=options["coarse_step"])
+        segments = []
+        if options["library"]:
+            # 片头片尾等重复片段沿用指纹库里前面几集的切点，只分析其余部分
+            scenes, fps, segments = find_scenes_with_library(video_path, options["threshold"], options["min_len"],
+                                                             **analysis_options)
+            result["recurring"] = [{"start_frame": seg.start, "end_frame": seg.end, "source": seg.source}
+                                   for seg in segments]
+        else:
+            scenes, fps = find_scenes_optimized(video_path, options["threshold"], options["min_len"],
+                                                **analysis_options)
+        # 分析时已在后台建好帧索引；容器里的帧数只是估计，有索引时以索引为准
+        index = get_frame_index(video_path)
+        if index is not None:
+            total_frames = index.frame_count
+        else:
+            cap = cv2.VideoCapture(video_path)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+
+        cuts = CutList.from_scenes(scenes)
+        if options["skip_recurring"]:
+            deselect_segments(cuts, segments)
+        rows = cut_rows(cuts, total_frames, fps, index)
+        settings = {key: options[key] for key in ("threshold", "min_len", "backend", "engine", "coarse_step")}
+        result["outputs"] = write_cut_list(os.path.join(options["output_dir"], stem), video_path, rows, fps,
+                                           total_frames, settings, options["formats"])
+        result["cuts"] = len(rows)
+
+        if options["export"]:
+            marker = export_marker_path(options["output_dir"], stem)
+            # 上一次的标记作废，本次导出全部成功后重新写
+            if os.path.exists(marker):
+                os.remove(marker)
+        if options["export"] and rows:
+            clip_dir = os.path.join(options["output_dir"], stem)
+            export = export_video_clips(video_path, cuts.export_ranges(total_frames), clip_dir, base_name=stem,
+                                        mode=options["export_mode"], workers=options["export_workers"],
+                                        telemetry=telemetry, cpu_budget=options["export_cpu_budget"])
+            result["exported"] = len(export["succeeded"])
+            result["failed"] = len(export["failed"])
+            if export["failed"]:
+                result["error"] = f"{len(export['failed'])} 个片段导出失败: {export['failed'][0][2]}"
+        if options["export"] and not result["error"]:
+            with open(marker, "w", encoding="utf-8") as f:
+                json.dump({"video": video_path, "clips": result["exported"], "mode": options["export_mode"]}, f,
+                          ensure_ascii=False)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = round(time.perf_counter() - started, 2)
+    return result
+
+
+# ==================== 4. 进程池调度 ====================
+def run_batch(videos, options, jobs):
+    stems = output_stems(videos)
+    pending = []
+    for path in videos:
+        if options["skip_existing"] and all(
+                os.path.exists(os.path.join(options["output_dir"], stems[path] + f".cuts.{fmt}"))
+                for fmt in options["formats"]) and (
+                not options["export"] or os.path.exists(export_marker_path(options["output_dir"], stems[path]))):
+            print(f"[跳过] {path} (切点列表已存在{'，片段已导出' if options['export'] else ''})")
+            continue
+        pending.append(path)
+
+    results = []
+    if not pending:
+        return results
+    print(f"共 {len(pending)} 个文件，{jobs} 个进程")
+
+    # 与 GUI 的多核分析一致，统一使用 spawn
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+        futures = {pool.submit(process_episode, path, stems[path], options): path for path in pending}
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                status = f"失败: {result['error']}" if result["error"] else f"{result['cuts']} 个切点"
+                if options["export"] and not result["error"]:
+                    status += f", 导出 {result['exported']} 个片段"
+                print(f"[{done}/{len(pending)}] {os.path.basename(result['video'])}  {status}  "
+                      f"({result['elapsed']:.1f}s)")
+        except KeyboardInterrupt:
+            print("\n已中断，等待正在处理的文件结束...")
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+
+# ==================== 5. 命令行入口 ====================
+def main():
+    parser = argparse.ArgumentParser(description="AutoCut Ultimate 批量处理 (无界面)")
+    parser.add_argument("inputs", nargs="+", help="视频文件、目录或通配符")
+    parser.add_argument("-o", "--output-dir", default="autocut_output", help="切点列表 / 导出片段的输出目录")
+    parser.add_argument("-j", "--jobs", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="同时处理的文件数 (进程数)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归扫描子目录")
+    parser.add_argument("--threshold", type=float, default=5.0)
+    parser.add_argument("--min-len", type=int, default=12)
+    parser.add_argument("--backend", choices=list(DECODE_BACKENDS), default="opencv")
+    parser.add_argument("--engine", choices=list(ANALYSIS_ENGINES), default="scenedetect")
+    parser.add_argument("--format", choices=["json", "csv", "both"], default="json", help="切点列表格式")
+    parser.add_argument("--export", action="store_true", help="分析后导出全部片段")
+    parser.add_argument("--export-mode", choices=list(EXPORT_MODES), default="reencode")
+    parser.add_argument("--coarse-step", type=int, default=0, metavar="N",
+                        help="两阶段检测：每 N 帧粗扫一次，只逐帧精算候选区间 (0 = 逐帧分析)")
+    parser.add_argument("--library", action="store_true",
+                        help="用片头片尾指纹库：与前面几集相同的片段沿用已有切点，不再解码分析 (建议 -j 1，按集顺序处理)")
+    parser.add_argument("--skip-recurring", action="store_true",
+                        help="重复片段不写入切点列表、不导出 (隐含 --library)")
+    parser.add_argument("--no-cache", action="store_true", help="不读写逐帧分数缓存")
+    parser.add_argument("--skip-existing", action="store_true", help="跳过已有切点列表的文件 (中断后续跑；带 --export 时还要求片段已全部导出)")
+    parser.add_argument("--telemetry", metavar="PATH", help="把各阶段耗时 / 速率 / 峰值内存以 JSON Lines 写入 PATH")
+    args = parser.parse_args()
+
+    videos = collect_videos(args.inputs, args.recursive)
+    if not videos:
+        print("没有找到视频文件")
+        sys.exit(1)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = max(1, min(args.jobs, len(videos)))
+    options = {
+        "threshold": args.threshold,
+        "min_len": args.min_len,
+        "backend": args.backend,
+        "engine": args.engine,
+        "coarse_step": args.coarse_step,
+        "library": args.library or args.skip_recurring,
+        "skip_recurring": args.skip_recurring,
+        "use_cache": not args.no_cache,
+        "output_dir": os.path.abspath(args.output_dir),
+        "formats": ("json", "csv") if args.format == "both" else (args.format,),
+        "export": args.export,
+        "export_mode": args.export_mode,
+        # 多个文件同时导出时平分 CPU，避免 ffmpeg 进程 / 线程数成倍超订：每个文件的并行片段数和
+        # 每个 ffmpeg 的线程数 (单次解码模式即整条命令的线程数) 都按这一份核数计算
+        "export_workers": max(1, (os.cpu_count() or 1) // jobs),
+        "export_cpu_budget": max(1, (os.cpu_count() or 1) // jobs),
+        "skip_existing": args.skip_existing,
+        "telemetry": os.path.abspath(args.telemetry) if args.telemetry else None,
+    }
+
+    started = time.perf_counter()
+    results = run_batch(videos, options, jobs)
+    failed = [r for r in results if r["error"]]
+
+    summary_path = os.path.join(args.output_dir, "batch_summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"options": options, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"\n完成 {len(results) - len(failed)}/{len(results)} 个文件，用时 {time.perf_counter() - started:.1f}s，"
+          f"摘要: {summary_path}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
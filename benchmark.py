@@ -0,0 +1,631 @@
+# benchmark.py —— 性能对比脚本 (不依赖 GUI)
+# 用法:
+#   python benchmark.py decode <视频路径>        对比各解码后端的吞吐量
+#   python benchmark.py agreement                用合成视频校验批量引擎与 PySceneDetect 逐切点一致
+#   python benchmark.py twostage [--step N]        校验两阶段检测与逐帧分析逐切点一致，并统计精算帧占比
+#   python benchmark.py seek                     NTSC 片源上分段定位算出的分数与整片一次分析逐位一致
+#   python benchmark.py timecode                 校验按帧索引换算的时间码逐帧递增、不重号
+#   python benchmark.py startup [--budget 秒]      界面模块的导入耗时，超出预算或提前导入重型依赖时失败
+#   python benchmark.py suite [--quick]           合成视频上的分析吞吐量 / 准确率和导出耗时 / 帧精度，结果存为 JSON
+#   python benchmark.py compare <旧.json> <新.json>  对比两次 suite 结果
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import cv2
+import numpy as np
+
+from test_core import (DECODE_BACKENDS, ANALYSIS_ENGINES, EXPORT_MODES, find_scenes_optimized, open_analysis_video,
+                       export_video_clips, find_scenes_two_stage, ANALYSIS_WIDTH, COARSE_STEP, FrameIndex,
+                       frames_to_timecode_premiere, CACHE_ROOT, score_frame_range, split_frame_ranges,
+                       get_frame_index)
+
+
+# ==================== 1. 解码吞吐量对比 ====================
+def bench_decode(video_path, backend, max_frames=None):
+    """只解码 (以及 OpenCV 路径下 SceneManager 会做的缩放)，返回 (帧数, 耗时秒)"""
+    video = open_analysis_video(video_path, backend)
+    frames = 0
+    start = time.perf_counter()
+    while max_frames is None or frames < max_frames:
+        frame = video.read()
+        if frame is False or frame is None:
+            break
+        if backend == "opencv":
+            # 与 SceneManager 自动缩放一致：缩到 ~256px 宽
+            h, w = frame.shape[:2]
+            if w > ANALYSIS_WIDTH:
+                factor = w / ANALYSIS_WIDTH
+                cv2.resize(frame, (round(w / factor), round(h / factor)), interpolation=cv2.INTER_LINEAR)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    if hasattr(video, "release"):
+        video.release()
+    return frames, elapsed
+
+
+def bench_analysis(video_path, backend):
+    """完整分析 (不走缓存)，返回 (帧数, 耗时秒, 切点数)"""
+    start = time.perf_counter()
+    scenes, _ = find_scenes_optimized(video_path, 5.0, 12, use_cache=False, decode_backend=backend)
+    elapsed = time.perf_counter() - start
+    frames = int(cv2.VideoCapture(video_path).get(cv2.CAP_PROP_FRAME_COUNT))
+    return frames, elapsed, len(scenes)
+
+
+def run_decode_comparison(video_path, max_frames=None, with_analysis=False):
+    print(f"\n=== 解码吞吐量: {video_path} ===")
+    print(f"{'后端':<20}{'帧数':>8}{'耗时(s)':>10}{'fps':>10}")
+    baseline = None
+    for backend, label in DECODE_BACKENDS.items():
+        frames, elapsed = bench_decode(video_path, backend, max_frames)
+        fps = frames / elapsed if elapsed > 0 else 0.0
+        if baseline is None:
+            baseline = fps
+        speedup = f"  x{fps / baseline:.2f}" if baseline else ""
+        print(f"{label:<20}{frames:>8}{elapsed:>10.2f}{fps:>10.1f}{speedup}")
+
+    if with_analysis:
+        print("\n=== 完整分析耗时 ===")
+        for backend, label in DECODE_BACKENDS.items():
+            frames, elapsed, cuts = bench_analysis(video_path, backend)
+            print(f"{label:<20}{frames:>8}{elapsed:>10.2f}{frames / elapsed:>10.1f}  切点: {cuts}")
+
+
+# ==================== 2. 合成测试视频 ====================
+BARCODE_BITS = 16
+BARCODE_HEIGHT = 8  # 底部条码的高度 (像素)
+
+
+def draw_frame_barcode(img, frame_idx):
+    """在画面底部画出帧号的二进制条码 (黑白方块)，导出后可逐帧读回源帧号"""
+    h, w = img.shape[:2]
+    block = w // BARCODE_BITS
+    for bit in range(BARCODE_BITS):
+        img[h - BARCODE_HEIGHT:, bit * block:(bit + 1) * block] = 255 if (frame_idx >> bit) & 1 else 0
+
+
+def read_frame_barcode(img):
+    """draw_frame_barcode 的逆过程，按方块中心采样，对缩放和有损压缩都足够稳健"""
+    h, w = img.shape[:2]
+    block = w // BARCODE_BITS
+    row = img[h - BARCODE_HEIGHT // 2]
+    value = 0
+    for bit in range(BARCODE_BITS):
+        if row[bit * block + block // 2].mean() > 127:
+            value |= 1 << bit
+    return value
+
+
+def make_synthetic_clip(path, n_frames=1200, seed=0, size=(480, 270), fps=24):
+    """生成带平移、闪烁、淡出和硬切的合成视频，返回真实切点帧号列表"""
+    w, h = size
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    cuts = []
+    frame_idx = 0
+    while frame_idx < n_frames:
+        if frame_idx > 0:
+            cuts.append(frame_idx)
+        shot_len = int(rng.integers(12, 90))
+        texture = cv2.resize(rng.integers(0, 255, (40, 80, 3), dtype=np.uint8), (w * 2, h),
+                             interpolation=cv2.INTER_CUBIC)
+        speed = int(rng.integers(0, 12))
+        kind = int(rng.integers(0, 4))  # 0 普通 / 1 闪烁 / 2 淡出 / 3 平移
+        for k in range(shot_len):
+            if frame_idx >= n_frames:
+                break
+            x = (k * (speed if kind == 3 else speed // 3)) % w
+            img = texture[:, x:x + w].astype(np.int16)
+            if kind == 1 and k % 7 == 3:
+                img += 120
+            elif kind == 2:
+                img = (img * (1 - k / shot_len)).astype(np.int16)
+            img += rng.integers(-8, 8, img.shape, dtype=np.int16)
+            writer.write(np.clip(img, 0, 255).astype(np.uint8))
+            frame_idx += 1
+    writer.release()
+    return cuts
+
+
+def make_benchmark_clip(path, n_frames=1200, seed=0, size=(480, 270), fps=24):
+    """准确率基准用的合成视频：每个镜头有自己的色调，带慢速平移、单帧闪光和淡入淡出，底部画帧号条码
+
+    make_synthetic_clip 的高速平移是给引擎一致性校验加压用的，分数与硬切相当，不适合衡量准确率。
+    返回 (真实切点帧号列表, {"flash": [...], "fade": [...]}) —— 闪光和淡变所在的帧都不应被判为切点。
+    """
+    w, h = size
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    cuts, events = [], {"flash": [], "fade": []}
+    frame_idx = 0
+    while frame_idx < n_frames:
+        if frame_idx > 0:
+            cuts.append(frame_idx)
+        shot_len = int(rng.integers(24, 120))
+        hsv = np.empty((h, w * 2, 3), dtype=np.uint8)
+        hsv[..., 0] = (int(rng.integers(0, 180)) + cv2.resize(rng.integers(0, 20, (6, 12), dtype=np.uint8),
+                                                               (w * 2, h))) % 180
+        hsv[..., 1] = int(rng.integers(60, 220))
+        hsv[..., 2] = cv2.resize(rng.integers(40, 230, (30, 60), dtype=np.uint8), (w * 2, h),
+                                 interpolation=cv2.INTER_CUBIC)
+        texture = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        speed = int(rng.integers(0, 4))
+        kind = int(rng.integers(0, 4))  # 0 普通 / 1 单帧闪光 / 2 淡出 / 3 淡入
+        fade = min(12, shot_len // 3)
+        flash_at = int(rng.integers(fade, shot_len - fade)) if kind == 1 else -1
+        for k in range(shot_len):
+            if frame_idx >= n_frames:
+                break
+            x = (k * speed) % w
+            img = texture[:, x:x + w].astype(np.float32)
+            if k == flash_at:
+                img = img * 0.3 + 255 * 0.7
+                events["flash"].append(frame_idx)
+            elif kind == 2 and k >= shot_len - fade:
+                img *= (shot_len - k) / (fade + 1)
+                events["fade"].append(frame_idx)
+            elif kind == 3 and k < fade:
+                img *= (k + 1) / (fade + 1)
+                events["fade"].append(frame_idx)
+            img += rng.normal(0, 2, img.shape)
+            img = np.clip(img, 0, 255).astype(np.uint8)
+            draw_frame_barcode(img, frame_idx)
+            writer.write(img)
+            frame_idx += 1
+    writer.release()
+    return cuts, events
+
+
+# ==================== 3. 批量引擎一致性校验 ====================
+AGREEMENT_SETTINGS = [(1.0, 5), (2.0, 8), (3.0, 15), (5.0, 12), (8.0, 30)]
+
+
+def run_agreement(seeds=(1, 2, 3), backends=("opencv",)):
+    """对比 PySceneDetect 与批量引擎的切点，完全一致返回 True"""
+    all_ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in seeds:
+            path = os.path.join(tmp, f"synthetic_{seed}.mp4")
+            make_synthetic_clip(path, seed=seed)
+            for backend in backends:
+                for threshold, min_len in AGREEMENT_SETTINGS:
+                    results = {}
+                    for engine in ANALYSIS_ENGINES:
+                        scenes, _ = find_scenes_optimized(path, threshold, min_len, use_cache=False,
+                                                          decode_backend=backend, engine=engine)
+                        results[engine] = [(start, end.get_frames()) for start, end in scenes]
+                    ok = results["scenedetect"] == results["batch"]
+                    all_ok &= ok
+                    print(f"seed={seed} {backend:<12} th={threshold:<4} min={min_len:<3} "
+                          f"切点={len(results['scenedetect']):<4} {'一致' if ok else '不一致!'}")
+    return all_ok
+
+
+def run_two_stage_agreement(seeds=(1, 2, 3), step=COARSE_STEP, backends=("opencv",), n_frames=1200):
+    """对比逐帧分析与两阶段检测的切点 (准确率基准用的视频)，完全一致返回 True"""
+    all_ok = True
+    refined = total = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in seeds:
+            path = os.path.join(tmp, f"benchmark_{seed}.mp4")
+            make_benchmark_clip(path, n_frames, seed=seed)
+            for backend in backends:
+                for threshold, min_len in AGREEMENT_SETTINGS:
+                    scenes, _ = find_scenes_optimized(path, threshold, min_len, use_cache=False,
+                                                      decode_backend=backend)
+                    fast, _, _, stats = find_scenes_two_stage(path, threshold, min_len, decode_backend=backend,
+                                                              step=step)
+                    ok = [start for start, _ in scenes] == [start for start, _ in fast]
+                    all_ok &= ok
+                    refined += stats["refined_frames"]
+                    total += stats["total_frames"]
+                    print(f"seed={seed} {backend:<12} th={threshold:<4} min={min_len:<3} 切点={len(scenes):<4} "
+                          f"精算 {stats['refined_frames']}/{stats['total_frames']} 帧 "
+                          f"({stats['windows']} 段) {'一致' if ok else '不一致!'}")
+    print(f"精算帧占比: {100.0 * refined / max(1, total):.1f}%")
+    return all_ok
+
+
+SEEK_CHECK_FPS = 24000 / 1001
+SEEK_CHECK_CHUNKS = 4
+
+
+def run_seek_agreement(seeds=(1, 2), backends=("ffmpeg", "ffmpeg_luma"), n_frames=2400):
+    """NTSC 帧率的 MKV (1ms 时间基) 上，分段定位算出的逐帧分数与不定位的整片一次分析逐位一致时返回 True
+
+    多核分段、局部重新分析、两阶段精算和检查点续跑都靠定位到某一帧开始解码；定位差一帧会让整段分数错位。
+    没有帧索引 (按 fps 推算中点) 和有帧索引 (按时间戳取中点) 两种定位方式各校验一次。
+    """
+    all_ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in seeds:
+            raw_path = os.path.join(tmp, f"synthetic_{seed}_mp4v.mp4")
+            path = os.path.join(tmp, f"synthetic_{seed}.mkv")
+            make_synthetic_clip(raw_path, n_frames, seed=seed, fps=SEEK_CHECK_FPS)
+            encode_h264(raw_path, path)
+            for with_index in (False, True):
+                if with_index:
+                    get_frame_index(path)
+                for backend in backends:
+                    whole = score_frame_range(path, 0, n_frames, backend, read_to_end=True)
+                    ranges = split_frame_ranges(len(whole), SEEK_CHECK_CHUNKS)
+                    chunked = []
+                    for i, (start, end) in enumerate(ranges):
+                        chunked.extend(score_frame_range(path, start, end, backend,
+                                                         read_to_end=i == len(ranges) - 1))
+                    ok = list(whole) == list(chunked)
+                    all_ok &= ok
+                    print(f"seed={seed} {backend:<12} {'帧索引' if with_index else '按 fps':<6} "
+                          f"{len(ranges)} 段 / {len(whole)} 帧 {'一致' if ok else '不一致!'}")
+    return all_ok
+
+
+# ==================== 4. 时间码校验 ====================
+TIMECODE_RATES = (24000 / 1001, 24, 25, 30000 / 1001, 30, 50, 60000 / 1001)
+TIMECODE_FRAMES = 200000
+
+
+def run_timecode_check(rates=TIMECODE_RATES, n_frames=TIMECODE_FRAMES):
+    """按帧索引换算的时间码逐帧严格递增 (不重号)；整数帧率时与按帧数换算的结果相同"""
+    all_ok = True
+    for fps in rates:
+        index = FrameIndex.constant_rate(fps, n_frames)
+        codes = [frames_to_timecode_premiere(f, fps, index) for f in range(n_frames)]
+        # 各字段都是两位数字，字符串比较即时间顺序
+        bad = sum(a >= b for a, b in zip(codes, codes[1:]))
+        ok = bad == 0
+        if float(fps).is_integer():
+            ok = ok and codes == [frames_to_timecode_premiere(f, fps) for f in range(n_frames)]
+        all_ok &= ok
+        print(f"{fps:>8.3f} fps  {n_frames} 帧  重号 / 倒退 {bad:<6} {'通过' if ok else '失败!'}")
+    return all_ok
+
+
+# ==================== 5. 启动耗时预算 ====================
+STARTUP_BUDGET = 0.5  # 秒，导入 app 模块 (不含 Python 解释器本身的启动)
+# 这些模块必须等到导入视频 / 分析 / 导出时才加载
+DEFERRED_MODULES = ("test_core", "scenedetect", "cv2", "numpy")
+
+
+def measure_startup(module="app"):
+    """在全新的解释器里导入 module，返回 (耗时秒, 它直接导入的模块按累计耗时排序, 被提前导入的重型模块)"""
+    probe = (f"import sys, {module}; "
+             f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True)
+    timings, children = [], []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        # 格式: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        seconds = int(cumulative) / 1e6
+        # 子模块先于父模块输出，缩进表示层级；收集到 module 那一行为止的直接子模块
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), seconds))
+        elif depth == 0:
+            if name.strip() == module:
+                total, timings = seconds, children
+            children = []
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return total, sorted(timings, key=lambda t: -t[1]), loaded
+
+
+def run_startup_check(budget=STARTUP_BUDGET, repeat=5):
+    """取多次中最快的一次，避免磁盘缓存冷启动的抖动；未超预算且没有提前导入重型依赖时返回 True"""
+    runs = [measure_startup() for _ in range(repeat)]
+    total, timings, loaded = min(runs, key=lambda r: r[0])
+    print(f"\n=== 启动导入耗时 (最快 {repeat} 次中的一次) ===")
+    for name, seconds in timings[:8]:
+        print(f"{name:<30}{seconds * 1000:>10.1f} ms")
+    print(f"{'app 合计':<28}{total * 1000:>10.1f} ms   预算 {budget * 1000:.0f} ms")
+    ok = total <= budget
+    if not ok:
+        print("超出启动预算!")
+    if loaded:
+        print(f"启动时不应导入: {', '.join(loaded)}")
+        ok = False
+    return ok
+
+
+# ==================== 6. 基准与准确率套件 ====================
+# 合成视频的切点已知：分析报告吞吐量 (帧/秒) 和 precision / recall，
+# 导出用条码逐帧读回源帧号，报告每个片段的耗时和首尾帧偏差。结果存为 JSON，便于不同版本之间对比。
+SUITE_RESULTS_DIR = os.path.join(CACHE_ROOT, "benchmark")  # 不写进源码目录，--output-dir 可改
+SUITE_SEEDS = (1, 2, 3)
+SUITE_FRAMES = 1200
+SUITE_EXPORT_CLIPS = 6
+CUT_TOLERANCE = 1  # 检测到的切点与真实切点相差不超过这么多帧算命中
+AUDIO_RATE = 48000
+CLICK_SECONDS = 0.01  # 每个镜头开头的 1 kHz 短音，导出后用它的起点测音画偏移
+
+
+def make_click_track(path, shot_starts, n_frames, fps=24, rate=AUDIO_RATE):
+    """单声道 wav：每个镜头的第一帧处一声短音，其余静音"""
+    samples = np.zeros(int(round(n_frames / fps * rate)), dtype=np.int16)
+    click = (0.8 * 32767 * np.sin(2 * np.pi * 1000 * np.arange(int(CLICK_SECONDS * rate)) / rate)).astype(np.int16)
+    for frame in shot_starts:
+        at = int(round(frame / fps * rate))
+        samples[at:at + len(click)] = click[:len(samples) - at]
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def encode_h264(src_path, dst_path, gop=48, audio_path=None):
+    """mp4v 转成 H.264 (智能渲染只接受 H.264 片源)，固定 GOP 让关键帧落在切点之间；可同时混入 AAC 音轨"""
+    cmd = ["ffmpeg", "-y", "-nostdin", "-v", "error", "-i", src_path]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a", "-c:a", "aac", "-b:a", "128k"]
+    cmd += ["-c:v", "libx264", "-crf", "16", "-preset", "veryfast", "-g", str(gop), "-keyint_min", str(gop),
+            "-sc_threshold", "0", "-pix_fmt", "yuv420p", dst_path]
+    subprocess.run(cmd, check=True)
+
+
+def match_cuts(detected, truth, tolerance=CUT_TOLERANCE):
+    """贪心一对一匹配，返回 (命中, 误检, 漏检)"""
+    truth = sorted(truth)
+    used = [False] * len(truth)
+    tp = 0
+    for frame in sorted(detected):
+        for i, t in enumerate(truth):
+            if not used[i] and abs(frame - t) <= tolerance:
+                used[i] = True
+                tp += 1
+                break
+    return tp, len(detected) - tp, len(truth) - tp
+
+
+def _ratio(a, b):
+    return round(a / b, 4) if b else 1.0
+
+
+def bench_accuracy(path, truth, events, threshold, min_len, backend, engine, workers=1):
+    started = time.perf_counter()
+    scenes, _ = find_scenes_optimized(path, threshold, min_len, use_cache=False, decode_backend=backend,
+                                      engine=engine, workers=workers)
+    seconds = time.perf_counter() - started
+    detected = [start for start, _ in scenes if start > 0]
+    frames = scenes[-1][1].get_frames() if scenes else 0
+    tp, fp, fn = match_cuts(detected, truth)
+    precision, recall = _ratio(tp, tp + fp), _ratio(tp, tp + fn)
+    # 误检里有多少落在闪光 / 淡变附近，区分 "被闪光骗了" 和其他误检
+    false_cuts = [f for f in detected if all(abs(f - t) > CUT_TOLERANCE for t in truth)]
+    near = {kind: sum(any(abs(f - e) <= CUT_TOLERANCE for e in marks) for f in false_cuts)
+            for kind, marks in events.items()}
+    return {"backend": backend, "engine": engine, "workers": workers, "frames": frames,
+            "seconds": round(seconds, 3), "fps": round(frames / seconds, 1), "tp": tp, "fp": fp, "fn": fn,
+            "fp_flash": near["flash"], "fp_fade": near["fade"],
+            "precision": precision, "recall": recall,
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0}
+
+
+def read_clip_barcodes(path):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ok, img = cap.read()
+        if not ok:
+            break
+        frames.append(read_frame_barcode(img))
+    cap.release()
+    return frames
+
+
+def audio_onset_ms(path, rate=AUDIO_RATE):
+    """片段音轨里第一声短音的起点 (毫秒，相对片段开头)；片段都从镜头开头切起，理想值为 0。没有音轨时返回 None"""
+    proc = subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-i", path, "-map", "0:a:0?", "-ac", "1",
+                           "-ar", str(rate), "-f", "s16le", "-"], capture_output=True)
+    samples = np.abs(np.frombuffer(proc.stdout, dtype=np.int16).astype(np.int32))
+    if proc.returncode != 0 or not len(samples) or samples.max() == 0:
+        return None
+    # AAC 的预回声在起点前有少量能量，取峰值的 30% 作为起点
+    return round(int(np.argmax(samples >= 0.3 * samples.max())) / rate * 1000, 2)
+
+
+def bench_export(path, clips, mode, out_dir):
+    """导出 clips，逐片段读回条码和音轨，返回 (汇总, 每个片段的明细)"""
+    started = time.perf_counter()
+    result = export_video_clips(path, clips, out_dir, base_name=mode, mode=mode)
+    seconds = time.perf_counter() - started
+    per_clip = []
+    for i, output_path in result["succeeded"]:
+        start, end = clips[i]
+        got = read_clip_barcodes(output_path)
+        per_clip.append({
+            "index": i, "start": start, "end": end, "frames_expected": end - start, "frames_out": len(got),
+            "first_error": got[0] - start if got else None,
+            "last_error": got[-1] - (end - 1) if got else None,
+            "exact": got == list(range(start, end)),
+            "audio_offset_ms": audio_onset_ms(output_path),
+        })
+    summary = {"mode": mode, "clips": len(clips), "succeeded": len(result["succeeded"]),
+               "failed": len(result["failed"]), "seconds": round(seconds, 3),
+               "exact_clips": sum(c["exact"] for c in per_clip),
+               "max_frame_error": max((max(abs(c["first_error"] or 0), abs(c["last_error"] or 0),
+                                           abs(c["frames_out"] - c["frames_expected"])) for c in per_clip),
+                                      default=None),
+               # 单次解码模式的音频在整条流里连续裁剪，误差会逐片段累积，看最后一个片段
+               "last_clip_av_drift_ms": per_clip[-1]["audio_offset_ms"] if per_clip else None}
+    return summary, per_clip
+
+
+def environment_info():
+    try:
+        ffmpeg = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    except OSError:
+        ffmpeg = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count(),
+            "python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__,
+            "ffmpeg": ffmpeg, "commit": commit}
+
+
+def run_suite(seeds=SUITE_SEEDS, n_frames=SUITE_FRAMES, threshold=5.0, min_len=12, backends=("opencv",),
+              export_clips=SUITE_EXPORT_CLIPS, export_modes=tuple(EXPORT_MODES), workers=1):
+    """跑完整套件，返回可直接存成 JSON 的结果"""
+    report = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "environment": environment_info(),
+              "settings": {"seeds": list(seeds), "frames": n_frames, "threshold": threshold, "min_len": min_len,
+                           "tolerance": CUT_TOLERANCE, "workers": workers},
+              "analysis": [], "export": [], "export_clips": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, seed in enumerate(seeds):
+            raw_path = os.path.join(tmp, f"synthetic_{seed}_mp4v.mp4")
+            audio_path = os.path.join(tmp, f"synthetic_{seed}.wav")
+            path = os.path.join(tmp, f"synthetic_{seed}.mp4")
+            truth, events = make_benchmark_clip(raw_path, n_frames, seed=seed)
+            make_click_track(audio_path, [0] + truth, n_frames)
+            encode_h264(raw_path, path, audio_path=audio_path)
+            print(f"\n=== seed={seed}: {n_frames} 帧, {len(truth)} 个真实切点 ===")
+            print(f"{'后端':<14}{'引擎':<14}{'fps':>9}{'precision':>11}{'recall':>9}{'误检':>6}{'漏检':>6}")
+            for backend in backends:
+                for engine in ANALYSIS_ENGINES:
+                    row = bench_accuracy(path, truth, events, threshold, min_len, backend, engine, workers)
+                    row["seed"] = seed
+                    report["analysis"].append(row)
+                    print(f"{backend:<14}{engine:<14}{row['fps']:>9.1f}{row['precision']:>11.3f}"
+                          f"{row['recall']:>9.3f}{row['fp']:>6}{row['fn']:>6}")
+
+            # 导出比分析慢得多，只在第一个种子上跑；片段取真实切点之间的区间
+            if n > 0 or not export_clips:
+                continue
+            bounds = [0] + truth + [n_frames]
+            clips = list(zip(bounds, bounds[1:]))[:export_clips]
+            print(f"\n{'导出模式':<14}{'片段':>6}{'耗时(s)':>10}{'逐帧一致':>10}{'最大偏差':>10}{'音画偏移(ms)':>14}")
+            for mode in export_modes:
+                summary, per_clip = bench_export(path, clips, mode, os.path.join(tmp, mode))
+                summary["seed"] = seed
+                report["export"].append(summary)
+                report["export_clips"].extend(dict(c, mode=mode) for c in per_clip)
+                print(f"{mode:<14}{summary['succeeded']:>6}{summary['seconds']:>10.2f}"
+                      f"{summary['exact_clips']:>7}/{summary['clips']:<3}{str(summary['max_frame_error']):>9}"
+                      f"{str(summary['last_clip_av_drift_ms']):>14}")
+    return report
+
+
+def save_report(report, output_dir=SUITE_RESULTS_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, time.strftime("suite_%Y%m%d_%H%M%S.json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _suite_metrics(report):
+    """把一次结果压成 {指标名: 数值}，同名指标在种子之间取平均"""
+    groups = {}
+    for row in report["analysis"]:
+        prefix = f"analysis/{row['backend']}/{row['engine']}"
+        for key in ("fps", "precision", "recall", "f1"):
+            groups.setdefault(f"{prefix}/{key}", []).append(row[key])
+    for row in report["export"]:
+        groups.setdefault(f"export/{row['mode']}/seconds", []).append(row["seconds"])
+        groups.setdefault(f"export/{row['mode']}/exact_clips", []).append(row["exact_clips"])
+        if row.get("last_clip_av_drift_ms") is not None:
+            groups.setdefault(f"export/{row['mode']}/av_drift_ms", []).append(abs(row["last_clip_av_drift_ms"]))
+    return {name: sum(values) / len(values) for name, values in groups.items()}
+
+
+def compare_reports(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = _suite_metrics(json.load(f))
+    with open(new_path, encoding="utf-8") as f:
+        new = _suite_metrics(json.load(f))
+    print(f"{'指标':<44}{'旧':>10}{'新':>10}{'变化':>10}")
+    for name in sorted(set(old) | set(new)):
+        a, b = old.get(name), new.get(name)
+        change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "-"
+        print(f"{name:<44}{'-' if a is None else f'{a:.3f}':>10}{'-' if b is None else f'{b:.3f}':>10}{change:>10}")
+
+
+# ==================== 7. 命令行入口 ====================
+def main():
+    parser = argparse.ArgumentParser(description="AutoCut Ultimate 性能对比")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_decode = sub.add_parser("decode", help="对比各解码后端的吞吐量")
+    p_decode.add_argument("video")
+    p_decode.add_argument("--max-frames", type=int, default=None)
+    p_decode.add_argument("--analysis", action="store_true", help="同时对比完整分析耗时")
+
+    p_agree = sub.add_parser("agreement", help="校验批量引擎与 PySceneDetect 逐切点一致")
+    p_agree.add_argument("--all-backends", action="store_true", help="对每种解码后端都做校验")
+
+    p_two = sub.add_parser("twostage", help="校验两阶段检测与逐帧分析逐切点一致")
+    p_two.add_argument("--step", type=int, default=COARSE_STEP, help="粗扫间隔帧数")
+    p_two.add_argument("--all-backends", action="store_true", help="对每种解码后端都做校验")
+
+    sub.add_parser("seek", help="校验 NTSC MKV 上分段定位的逐帧分数与整片一次分析一致")
+
+    sub.add_parser("timecode", help="校验 NTSC 等帧率下时间码逐帧递增、不重号")
+
+    p_startup = sub.add_parser("startup", help="检查界面启动的导入耗时预算")
+    p_startup.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="预算 (秒)")
+
+    p_suite = sub.add_parser("suite", help="合成视频上的吞吐量 / 准确率 / 导出帧精度基准")
+    p_suite.add_argument("--quick", action="store_true", help="只用一个种子、600 帧")
+    p_suite.add_argument("--all-backends", action="store_true", help="对每种解码后端都跑一遍分析")
+    p_suite.add_argument("--workers", type=int, default=1, help="分析进程数 (与界面的多核选项相同)")
+    p_suite.add_argument("--threshold", type=float, default=5.0)
+    p_suite.add_argument("--min-len", type=int, default=12)
+    p_suite.add_argument("--export-clips", type=int, default=SUITE_EXPORT_CLIPS, help="每种导出模式导出的片段数，0 跳过")
+    p_suite.add_argument("--output-dir", default=SUITE_RESULTS_DIR, help="结果 JSON 的保存目录")
+    p_suite.add_argument("--compare", metavar="旧.json", help="跑完后与这次结果对比")
+
+    p_compare = sub.add_parser("compare", help="对比两次 suite 结果")
+    p_compare.add_argument("old")
+    p_compare.add_argument("new")
+
+    args = parser.parse_args()
+    if args.command == "decode":
+        run_decode_comparison(args.video, args.max_frames, args.analysis)
+    elif args.command == "agreement":
+        backends = tuple(DECODE_BACKENDS) if args.all_backends else ("opencv",)
+        if not run_agreement(backends=backends):
+            sys.exit(1)
+    elif args.command == "twostage":
+        backends = tuple(DECODE_BACKENDS) if args.all_backends else ("opencv",)
+        if not run_two_stage_agreement(step=args.step, backends=backends):
+            sys.exit(1)
+    elif args.command == "seek":
+        if not run_seek_agreement():
+            sys.exit(1)
+    elif args.command == "timecode":
+        if not run_timecode_check():
+            sys.exit(1)
+    elif args.command == "startup":
+        if not run_startup_check(args.budget):
+            sys.exit(1)
+    elif args.command == "suite":
+        report = run_suite(seeds=SUITE_SEEDS[:1] if args.quick else SUITE_SEEDS,
+                           n_frames=600 if args.quick else SUITE_FRAMES,
+                           threshold=args.threshold, min_len=args.min_len,
+                           backends=tuple(DECODE_BACKENDS) if args.all_backends else ("opencv",),
+                           export_clips=args.export_clips, workers=args.workers)
+        path = save_report(report, args.output_dir)
+        print(f"\n结果已保存: {path}")
+        if args.compare:
+            print()
+            compare_reports(args.compare, path)
+    elif args.command == "compare":
+        compare_reports(args.old, args.new)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# core_options.py —— 不依赖 scenedetect / cv2 / numpy 的选项表和小工具
+# 界面启动时只导入这里，重型依赖 (test_core) 等到导入视频、分析或导出时才加载。
+# test_core 会重新导出这里的全部名字，其它脚本照旧从 test_core 导入即可。
+
+# 解码后端 (见 test_core 第 7 节)
+DECODE_BACKENDS = {
+    "opencv": "OpenCV (原始)",
+    "ffmpeg": "FFmpeg 低分辨率",
+    "ffmpeg_luma": "FFmpeg 仅亮度",
+}
+
+# 检测引擎 (见 test_core 第 8 节)
+ANALYSIS_ENGINES = {
+    "scenedetect": "PySceneDetect (逐帧)",
+    "batch": "批量向量化",
+}
+
+# 导出模式 (见 test_core 第 4 / 9 / 10 节)
+EXPORT_MODES = {
+    "reencode": "重新编码 (libx264)",
+    "smart": "智能渲染 (关键帧处直接复制)",
+    "single_pass": "单次解码 (一条命令导出全部)",
+}
+
+# 多检测器融合：一次解码后可切换的检测器 (见 test_core 第 15 节)
+FUSED_DETECTORS = {
+    "adaptive": "自适应",   # AdaptiveDetector：硬切
+    "content": "内容",      # ContentDetector：固定阈值，作第二意见
+    "threshold": "亮度",    # ThresholdDetector：淡入 / 淡出黑场
+}
+
+
+# 时间码转换 (Pr风格)
+def frames_to_timecode_premiere(frame_num, fps, index=None):
+    """index (test_core.FrameIndex) 给出时按每帧真实的显示时间换算，NTSC / 可变帧率片源越往后也不会偏"""
+    fps_int = int(round(fps))
+    frame_num = int(frame_num)
+    
+    if index is not None:
+        # 加 1 微秒吸收浮点误差 (整秒处的帧不会算成上一秒的最后一帧)；帧位向下取整：
+        # NTSC 的帧间隔略大于 1/fps_int，四舍五入会让相邻两帧同号、再跳过下一秒的 :00
+        seconds = index.capture_msec(frame_num) / 1000.0 + 1e-6
+        total_seconds = int(seconds)
+        ff = int((seconds - total_seconds) * fps_int)
+    else:
+        ff = frame_num % fps_int
+        total_seconds = frame_num // fps_int
+    
+    ss = total_seconds % 60
+    mm = (total_seconds // 60) % 60
+    hh = (total_seconds // 60) // 60
+    
+    return f"{hh:02d}:{mm:02d}:{ss:02d}:{ff:02d}"
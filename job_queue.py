@@ -0,0 +1,166 @@
+# job_queue.py —— 界面里的后台任务队列：审阅当前这一集的同时，分析下一集、导出上一集
+# 分析和导出各走一条通道 (各一个工作线程，按提交顺序执行)，两条通道同时运行、各自分到
+# 一部分 CPU；每个任务有自己的 stop_event 和进度，取消一个任务不影响其它任务。
+# 不依赖 numpy / cv2，界面启动时可以直接导入；真正的工作由提交任务时传入的函数完成。
+import itertools
+import os
+import threading
+from collections import deque
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+JOB_STATUS_LABELS = {
+    JOB_QUEUED: "排队中",
+    JOB_RUNNING: "进行中",
+    JOB_DONE: "完成",
+    JOB_FAILED: "失败",
+    JOB_CANCELLED: "已取消",
+}
+
+JOB_KINDS = {
+    "analysis": "分析",
+    "export": "导出",
+}
+
+# 两条通道同时满载时分析 (解码 + 检测) 占的 CPU 比例，其余留给 ffmpeg 编码
+ANALYSIS_CPU_SHARE = 0.5
+
+
+def split_cpu_budget(cpu_count=None, analysis_share=ANALYSIS_CPU_SHARE):
+    """把 CPU 核数分给分析和导出两条通道，返回 (分析核数, 导出核数)，两者都至少为 1"""
+    total = max(1, cpu_count or os.cpu_count() or 1)
+    if total == 1:
+        return 1, 1
+    analysis = max(1, min(total - 1, round(total * analysis_share)))
+    return analysis, total - analysis
+
+
+class Job:
+    """一个排队的分析 / 导出任务。run(job) 在通道线程里执行，返回值存入 result"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, video_path, run, description="", on_change=None):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.video_path = video_path
+        self.description = description
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.stop_event = threading.Event()
+        self._run = run
+        self._on_change = on_change
+
+    @property
+    def name(self):
+        return os.path.basename(self.video_path)
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+    def report(self, progress):
+        """任务函数里的进度回调 (0~1)"""
+        self.progress = min(max(progress, 0.0), 1.0)
+        self._changed()
+
+    def cancel(self):
+        self.stop_event.set()
+        if self.status == JOB_QUEUED:
+            # 还没开始的任务直接出队 (通道线程取到时会跳过)
+            self.status = JOB_CANCELLED
+            self._changed()
+
+    def _changed(self):
+        if self._on_change:
+            try:
+                self._on_change(self)
+            except Exception as e:
+                print(f"[Debug] 任务状态回调失败: {e}")
+
+
+class JobQueue:
+    """分析 / 导出两条通道的任务队列
+
+    on_change(job) 在任务状态或进度变化时调用 (可能来自通道线程，界面更新需自行丢回主线程)。
+    """
+
+    def __init__(self, on_change=None):
+        self.jobs = []  # 全部任务 (含已结束的)，按提交顺序
+        self._on_change = on_change
+        self._pending = {kind: deque() for kind in JOB_KINDS}
+        self._cond = threading.Condition()
+        self._workers = {}
+
+    def submit(self, kind, video_path, run, description="", front=False):
+        """提交任务；front=True 时插到该通道队首 (用户正在看的那一集优先)"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知的任务类型: {kind}")
+        job = Job(kind, video_path, run, description, self._on_change)
+        with self._cond:
+            self.jobs.append(job)
+            if front:
+                self._pending[kind].appendleft(job)
+            else:
+                self._pending[kind].append(job)
+            if kind not in self._workers:
+                # 通道线程常驻等待新任务；设为守护线程，关窗口时不会卡住退出
+                worker = threading.Thread(target=self._work, args=(kind,), daemon=True)
+                self._workers[kind] = worker
+                worker.start()
+            self._cond.notify_all()
+        job._changed()
+        return job
+
+    def active(self, video_path=None, kind=None):
+        """排队中 / 进行中的任务，可按视频和类型筛选"""
+        with self._cond:
+            return [job for job in self.jobs if not job.finished
+                    and (video_path is None or job.video_path == video_path)
+                    and (kind is None or job.kind == kind)]
+
+    def latest(self, video_path, kind, status=None):
+        """某个视频最近一次提交的某类任务 (可限定状态)，没有时返回 None"""
+        with self._cond:
+            for job in reversed(self.jobs):
+                if job.video_path == video_path and job.kind == kind and (status is None or job.status == status):
+                    return job
+        return None
+
+    def cancel_all(self, video_path=None):
+        for job in self.active(video_path):
+            job.cancel()
+
+    def clear_finished(self):
+        """从列表里移除已结束的任务，返回被移除的任务"""
+        with self._cond:
+            removed = [job for job in self.jobs if job.finished]
+            self.jobs = [job for job in self.jobs if not job.finished]
+        return removed
+
+    def _work(self, kind):
+        pending = self._pending[kind]
+        while True:
+            with self._cond:
+                while not pending:
+                    self._cond.wait()
+                job = pending.popleft()
+                if job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+            job._changed()
+            try:
+                job.result = job._run(job)
+                job.status = JOB_CANCELLED if job.stop_event.is_set() else JOB_DONE
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = JOB_FAILED
+            job._changed()
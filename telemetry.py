@@ -0,0 +1,163 @@
+# telemetry.py —— 分析 / 导出各阶段的结构化性能事件
+# 不依赖 numpy / cv2，界面启动时可以直接导入。
+# 用法:
+#   tel = Telemetry([JsonLinesSink(TELEMETRY_LOG)], video="ep01.mkv")
+#   with tel.stage("open"): ...
+#   tel.progress("decode", frames_done, total_frames)   # 按墙钟时间节流
+#   tel.event("analysis_done", frames=..., fps=...)
+import json
+import os
+import sys
+import threading
+import time
+
+TELEMETRY_LOG = os.path.join(os.path.expanduser("~"), ".autocut_ultimate", "telemetry.jsonl")
+TELEMETRY_LOG_MAX_BYTES = 16 * 1024 * 1024  # 超过后轮换为 .1，只保留一份旧日志
+PROGRESS_INTERVAL = 0.5  # 秒，progress 事件的最小间隔
+
+
+def peak_memory_mb(children=False):
+    """本进程 (或已结束的子进程中最大的那个) 的峰值常驻内存，拿不到时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+        # Linux 单位是 KB，macOS 是字节
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return round(usage.ru_maxrss / divisor, 1)
+    if sys.platform == "win32" and not children:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t), ("PagefileUsage", ctypes.c_size_t),
+                        ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+    return None
+
+
+class JsonLinesSink:
+    """每个事件一行 JSON，追加写入；多个进程写同一个文件时每行一次 write，不会交错"""
+
+    def __init__(self, path=TELEMETRY_LOG, max_bytes=TELEMETRY_LOG_MAX_BYTES):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if max_bytes and os.path.exists(path) and os.path.getsize(path) > max_bytes:
+            os.replace(path, path + ".1")
+
+    def __call__(self, event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class Telemetry:
+    """结构化事件的发送端。没有 sink 时所有调用都是空操作，调用方不用判断是否启用"""
+
+    def __init__(self, sinks=(), min_interval=PROGRESS_INTERVAL, **context):
+        self.sinks = list(sinks)
+        self.min_interval = min_interval
+        self.context = context
+        self._started = time.perf_counter()
+        self._last_progress = {}  # 名称 -> (时刻, 完成量)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    def event(self, name, **fields):
+        if not self.sinks:
+            return
+        event = {"ts": round(time.time(), 3), "elapsed": round(time.perf_counter() - self._started, 3),
+                 "event": name}
+        event.update(self.context)
+        event.update(fields)
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                # 遥测出错不能影响分析 / 导出本身
+                print(f"[Debug] 遥测输出失败: {e}")
+
+    def stage(self, name, **fields):
+        """计时上下文：结束时发出 stage 事件 (seconds 为该阶段耗时)"""
+        return _Stage(self, name, fields)
+
+    def progress(self, name, done, total=None, force=False, **fields):
+        """按墙钟时间节流的进度事件，附带与上一次之间的速率 (rate，单位/秒)"""
+        if not self.sinks:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            last = self._last_progress.get(name)
+            if last is not None and done < last[1]:
+                last = None  # 同名阶段重新开始 (例如下一次导出)
+            if last is not None and not force and now - last[0] < self.min_interval:
+                return
+            self._last_progress[name] = (now, done)
+        # 第一次上报时没有参照点，不给速率
+        rate = None if last is None else round((done - last[1]) / max(now - last[0], 1e-6), 1)
+        if total:
+            fields["percent"] = round(100.0 * done / total, 1)
+        self.event("progress", stage=name, done=done, total=total, rate=rate,
+                   peak_rss_mb=peak_memory_mb(), **fields)
+
+
+class _Stage:
+    def __init__(self, telemetry, name, fields):
+        self._telemetry = telemetry
+        self._name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._start
+        self._telemetry.event("stage", stage=self._name, seconds=round(self.seconds, 4),
+                              failed=exc_type is not None, **self.fields)
+        return False
+
+
+def format_stats_line(event):
+    """把事件压成状态栏里的一行，不值得显示的事件返回 None"""
+    name = event.get("event")
+    memory = f" · 内存 {event['peak_rss_mb']:.0f} MB" if event.get("peak_rss_mb") else ""
+    if name == "progress":
+        if event.get("stage") == "clips":
+            return f"导出: {event['done']}/{event['total']} 个片段{memory}"
+        rate = f" {event['rate']:.0f} 帧/秒" if event.get("rate") is not None else ""
+        percent = f" · {event['percent']:.0f}%" if event.get("percent") is not None else ""
+        return f"{event['stage']}:{rate}{percent}{memory}"
+    if name == "clip_done" and event.get("seconds"):
+        return f"片段 {event['index'] + 1}: {event['seconds']:.1f}s · {event.get('mb_per_s', 0):.1f} MB/s{memory}"
+    if name == "library_match" and event.get("segments"):
+        return f"指纹库: 识别出 {event['segments']} 段重复片段，跳过 {event['frames_skipped']} 帧"
+    if name == "analysis_done" and event.get("cache_hit"):
+        cuts = f"，{event['cuts']} 个切点" if event.get("cuts") is not None else ""
+        return f"分析: 命中分数缓存{cuts} ({event['seconds']:.2f}s)"
+    if name == "analysis_done" and event.get("refined_frames") is not None:
+        return (f"分析 (两阶段): {event['frames']} 帧 / {event['seconds']:.1f}s，"
+                f"精算 {event['refined_frames']} 帧 ({event['windows']} 段){memory}")
+    if name == "analysis_done":
+        return (f"分析: {event['frames']} 帧 / {event['seconds']:.1f}s = {event['fps']:.0f} 帧/秒 "
+                f"(解码 {event.get('decode_seconds', 0):.1f}s, 检测 {event.get('detect_seconds', 0):.1f}s){memory}")
+    if name == "export_done":
+        return f"导出: {event['clips']} 个片段 / {event['seconds']:.1f}s · {event.get('output_mb', 0):.0f} MB{memory}"
+    return None
@@ -1,26 +1,53 @@
-from scenedetect import open_video, SceneManager
-from scenedetect.detectors import AdaptiveDetector
+from scenedetect import open_video, SceneManager, FrameTimecode
+from scenedetect.detectors import AdaptiveDetector, ContentDetector
+from scenedetect.scene_manager import compute_downscale_factor
 import cv2  # 必须引入 cv2 来强制获取帧数
+import numpy as np
 import subprocess
+import hashlib
+import re
+import shutil
+import tempfile
+import multiprocessing
+import queue
 import os
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from telemetry import Telemetry, peak_memory_mb
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# AdaptiveDetector 的固定参数 (界面只调 threshold / min_len，这两项保持默认)
+ADAPTIVE_WINDOW_WIDTH = 2
+ADAPTIVE_MIN_CONTENT_VAL = 15.0
+
+# 所有磁盘缓存的根目录
+CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".autocut_ultimate")
+PROGRESS_CALLBACK_INTERVAL = 0.1  # 秒，进度回调按墙钟时间节流，与片源帧率无关
 
 # ==================== 1. 核心工具类：支持中断和进度的视频包装器 ====================
 class InterruptibleVideo:
-    def __init__(self, video, path, stop_event=None, progress_callback=None):
+    def __init__(self, video, path, stop_event=None, progress_callback=None, total_frames=None, telemetry=None):
         self._video = video
         self._path = path # 保存路径以便备用
         self._stop_event = stop_event
         self._callback = progress_callback
+        self._telemetry = telemetry or Telemetry()
+        self.decode_seconds = 0.0  # 累计花在 read() 上的时间
         
         # 属性转发
         self.frame_rate = video.frame_rate
         self.base_timecode = video.base_timecode
         
         # --- 核心修复：强力获取总帧数 ---
-        self._total_frames = 0
+        # 调用方已知帧数时 (例如并行分析的单个分段) 直接使用，省去一次额外打开文件
+        self._total_frames = total_frames or 0
         
         # 尝试方法 A: scenedetect 自带
-        if hasattr(video, "count_frames"):
+        if self._total_frames > 0:
+            pass
+        elif hasattr(video, "count_frames"):
             self._total_frames = video.count_frames()
         elif hasattr(video, "frame_count"):
             self._total_frames = video.frame_count
@@ -41,6 +68,11 @@ class InterruptibleVideo:
             self._total_frames = 1
             
         self._current_frame = 0
+        self._last_report = time.perf_counter()
+
+    @property
+    def frames_read(self):
+        return self._current_frame
 
     def read(self):
         # 1. 检查停止
@@ -48,14 +80,18 @@ class InterruptibleVideo:
             return False 
         
         # 2. 读取
+        t0 = time.perf_counter()
         frame = self._video.read()
+        now = time.perf_counter()
+        self.decode_seconds += now - t0
         
         # 3. 汇报进度
         if frame is not False and frame is not None:
             self._current_frame += 1
             
-            # 每 24 帧(约1秒)汇报一次
-            if self._current_frame % 24 == 0:
+            # 按墙钟时间节流 (以前固定每 24 帧一次，高帧率 / 快速后端时回调过于频繁)
+            if now - self._last_report >= PROGRESS_CALLBACK_INTERVAL:
+                self._last_report = now
                 # 无论是否有 callback，先在终端打印一下证明在跑
                 # print(f"\r[Debug] 分析中: {self._current_frame}/{self._total_frames}", end="")
                 
@@ -65,6 +101,8 @@ class InterruptibleVideo:
                     # 限制最大 1.0
                     if progress > 1.0: progress = 1.0
                     self._callback(progress)
+            # telemetry 自己按 min_interval 节流
+            self._telemetry.progress("decode", self._current_frame, self._total_frames)
         
         return frame
 
@@ -74,25 +112,136 @@ class InterruptibleVideo:
 
 # ==================== 2. 核心算法函数 ====================
 
-def find_scenes_optimized(video_path, threshold, min_len, progress_callback=None, stop_event=None):
+def _report_analysis_done(telemetry, started, frames, video_fps, cuts, **fields):
+    seconds = time.perf_counter() - started
+    telemetry.event("analysis_done", frames=frames, seconds=round(seconds, 3),
+                    fps=round(frames / seconds, 1) if seconds > 0 else None, video_fps=video_fps, cuts=cuts,
+                    peak_rss_mb=peak_memory_mb(), peak_children_rss_mb=peak_memory_mb(children=True), **fields)
+
+
+def find_scenes_optimized(video_path, threshold, min_len, progress_callback=None, stop_event=None, use_cache=True,
+                          workers=1, decode_backend="opencv", engine="scenedetect", telemetry=None, coarse_step=0):
+    """telemetry (telemetry.Telemetry) 接收各阶段耗时、解码速率、峰值内存等结构化事件
+
+    coarse_step > 1 时改用两阶段粗细检测 (见第 16 节)：每 coarse_step 帧粗扫一次，
+    只对候选区间逐帧精算；此时不使用多进程，也不写分数缓存 (分数不完整)。
+    """
     print(f"正在分析视频: {video_path} ...")
+    telemetry = telemetry or Telemetry()
+    started = time.perf_counter()
+    # 帧索引 (第 18 节) 只解复用，在后台与解码同时建立；已有时只是读一下
+    start_frame_index(video_path)
+    telemetry.event("analysis_start", path=video_path, threshold=threshold, min_len=min_len, workers=workers,
+                    backend=decode_backend, engine=engine, coarse_step=coarse_step)
+
+    # 先查分数缓存：只改了 threshold / min_len 时不需要重新解码
+    # (两种检测引擎算出的分数逐位相同，共用同一份缓存)
+    cache_key = None
+    if use_cache:
+        cache_key = score_cache_key(video_path, backend=decode_backend)
+        cached = load_cached_scores(cache_key)
+        if cached is not None:
+            scores, fps = cached
+            print(f"[Debug] 命中分数缓存 ({len(scores)} 帧)，直接重算切点")
+            if progress_callback:
+                progress_callback(1.0)
+            scenes = scenes_from_scores(scores, fps, threshold, min_len)
+            _report_analysis_done(telemetry, started, len(scores), fps, len(scenes), cache_hit=True)
+            return scenes, fps
+
+    # 两阶段模式：已有完整分数缓存时上面直接命中；否则只精算候选区间
+    if coarse_step and coarse_step > 1:
+        # 缩略图跟分数缓存一起保存，同一个缓存键；不走缓存时也不截图
+        thumbnails = ThumbnailWriter(thumbnail_temp_path(cache_key)) if cache_key else None
+        scenes, fps, completed, stats = find_scenes_two_stage(video_path, threshold, min_len, progress_callback,
+                                                              stop_event, decode_backend, engine, coarse_step,
+                                                              thumbnails=thumbnails, telemetry=telemetry)
+        if cache_key:
+            finish_thumbnail_atlas(cache_key, thumbnails, keep=completed)
+        _report_analysis_done(telemetry, started, stats["total_frames"], fps, len(scenes), completed=completed,
+                              **stats)
+        return scenes, fps
+
+    # 上次没跑完 (停止 / 崩溃) 时从检查点接着算，缩略图也接着检查点里的图集写
+    resumed = load_checkpoint(cache_key) if cache_key else None
+    thumbnails = None
+    if cache_key:
+        thumbnails = ThumbnailWriter(checkpoint_thumbnail_path(cache_key),
+                                     resume=resumed[3:] if resumed is not None else None)
+
+    if resumed is not None:
+        scores, brightness, fps, completed = resume_scores(video_path, cache_key, resumed, workers,
+                                                           progress_callback, stop_event, decode_backend,
+                                                           engine, thumbnails, telemetry)
+        print("\n[Debug] 续跑结束，正在整理切点...")
+        finish_checkpointed_analysis(cache_key, scores, brightness, fps, completed, thumbnails)
+        scenes = scenes_from_scores(scores, fps, threshold, min_len)
+        _report_analysis_done(telemetry, started, len(scores) - len(resumed[0]), fps, len(scenes),
+                              completed=completed, resumed_from=len(resumed[0]))
+        return scenes, fps
+
+    # 多核模式：分段并行算分，再在拼接后的整片分数上统一判定切点
+    # 平均亮度顺带记录进缓存，之后切换到多检测器融合时不用再解码
+    brightness = []
+    if workers and workers > 1:
+        scores, fps, completed = compute_scores_parallel(video_path, workers, progress_callback, stop_event,
+                                                         decode_backend=decode_backend, engine=engine,
+                                                         thumbnails=thumbnails, telemetry=telemetry,
+                                                         brightness=brightness)
+        print("\n[Debug] 并行分析结束，正在整理切点...")
+        # 并行模式只在停止时写检查点 (停止时保留的正是从片头开始连续的分数)
+        if cache_key:
+            finish_checkpointed_analysis(cache_key, scores, brightness, fps, completed, thumbnails)
+        scenes = scenes_from_scores(scores, fps, threshold, min_len)
+        _report_analysis_done(telemetry, started, len(scores), fps, len(scenes), completed=completed)
+        return scenes, fps
     
     # 打开视频
-    original_video = open_video(video_path)
+    with telemetry.stage("open", backend=decode_backend):
+        original_video = open_analysis_video(video_path, decode_backend)
     
-    # 包装视频 (传入 video_path 用于备用方案)
-    video = InterruptibleVideo(original_video, video_path, stop_event, progress_callback)
+    # 包装视频 (传入 video_path 用于备用方案)；构造时会统计总帧数
+    with telemetry.stage("count_frames"):
+        video = InterruptibleVideo(original_video, video_path, stop_event, progress_callback, telemetry=telemetry)
     
     fps = video.frame_rate
+    checkpoint = AnalysisCheckpoint(cache_key, fps, thumbnails=thumbnails) if cache_key else None
+
+    # 批量引擎：先算整片分数，再在数组上判定切点
+    if engine == "batch":
+        with telemetry.stage("decode_detect", engine=engine) as loop:
+            scores = score_video_stream(video, engine, decode_backend, thumbnails=thumbnails, brightness=brightness,
+                                        checkpoint=checkpoint)
+        print("\n[Debug] 批量分析结束，正在整理切点...")
+        if cache_key:
+            finish_checkpointed_analysis(cache_key, scores, brightness, fps,
+                                         not (stop_event and stop_event.is_set()), thumbnails)
+        scenes = scenes_from_scores(scores, fps, threshold, min_len)
+        # 批量引擎在同一线程里解码和检测，循环总时间减去解码即为检测
+        _report_analysis_done(telemetry, started, video.frames_read, fps, len(scenes),
+                              decode_seconds=round(video.decode_seconds, 3),
+                              detect_seconds=round(loop.seconds - video.decode_seconds, 3),
+                              completed=not (stop_event and stop_event.is_set()))
+        return scenes, fps
     
     scene_manager = SceneManager()
-    scene_manager.add_detector(
-        AdaptiveDetector(adaptive_threshold=threshold, min_scene_len=min_len)
-    )
+    detector = make_score_detector(threshold, min_len, decode_backend)
+    detector.thumbnails = thumbnails
+    detector.checkpoint = checkpoint
+    scene_manager.add_detector(detector)
+    if decode_backend != "opencv":
+        # ffmpeg 已经按分析分辨率输出，不再让 SceneManager 二次缩放
+        scene_manager.auto_downscale = False
     
-    # 开始检测
-    scene_manager.detect_scenes(video, show_progress=False)
+    # 开始检测 (SceneManager 在单独的线程里解码，解码和检测的时间分别统计)
+    with telemetry.stage("decode_detect", engine=engine):
+        scene_manager.detect_scenes(video, show_progress=False)
     print("\n[Debug] 分析循环结束，正在整理切点...")
+
+    # 完整跑完才写缓存，中途停止的部分分数只写成检查点，不能当成整片结果
+    if cache_key:
+        finish_checkpointed_analysis(cache_key, detector.frame_scores, detector.frame_brightness, fps,
+                                     not (stop_event and stop_event.is_set()), thumbnails)
     
     scene_list = scene_manager.get_scene_list()
     
@@ -107,66 +256,2687 @@ def find_scenes_optimized(video_path, threshold, min_len, progress_callback=None
             
         processed_scenes.append((start_frame, end_time))
         
+    _report_analysis_done(telemetry, started, video.frames_read, fps, len(processed_scenes),
+                          decode_seconds=round(video.decode_seconds, 3),
+                          detect_seconds=round(detector.detect_seconds, 3),
+                          completed=not (stop_event and stop_event.is_set()))
     return processed_scenes, fps
 
 
 # ==================== 3. 辅助函数：时间码转换 (Pr风格) ====================
-def frames_to_timecode_premiere(frame_num, fps):
-    fps_int = int(round(fps))
-    frame_num = int(frame_num)
-    
-    ff = frame_num % fps_int
-    total_seconds = frame_num // fps_int
-    
-    ss = total_seconds % 60
-    mm = (total_seconds // 60) % 60
-    hh = (total_seconds // 60) // 60
-    
-    return f"{hh:02d}:{mm:02d}:{ss:02d}:{ff:02d}"
+# 与各选项表一起放在 core_options (无重型依赖，界面启动时可以先导入)，这里重新导出
+from core_options import (frames_to_timecode_premiere, DECODE_BACKENDS, ANALYSIS_ENGINES, EXPORT_MODES,
+                          FUSED_DETECTORS)
 
 
 # ==================== 4. 导出函数 (支持选区导出) ====================
-def export_video_clips(video_path, clips, output_dir, base_name="clip", progress_callback=None, stop_event=None):
+FFMPEG_ERROR_TAIL = 800  # 失败时保留的 stderr 末尾字符数
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class FFmpegProcessGroup:
+    """记录正在运行的 ffmpeg 进程；取消时统一终止，之后不再启动新进程"""
+
+    def __init__(self):
+        self._procs = set()
+        self._lock = threading.Lock()
+        self.cancelled = False
+
+    def run(self, cmd):
+        with self._lock:
+            if self.cancelled:
+                raise ExportCancelled()
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True, errors="replace")
+            self._procs.add(proc)
+        try:
+            _, stderr = proc.communicate()
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+        if self.cancelled:
+            raise ExportCancelled()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg 失败 ({proc.returncode}): {stderr.strip()[-FFMPEG_ERROR_TAIL:]}")
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            for proc in self._procs:
+                proc.terminate()
+
+
+def _run_ffmpeg(cmd, group=None):
+    (group or FFmpegProcessGroup()).run(cmd)
+
+
+def _report_export_done(telemetry, started, result, mode):
+    paths = [path for _, path in result["succeeded"]]
+    output_mb = sum(os.path.getsize(p) for p in paths if os.path.isfile(p)) / (1024 * 1024)
+    seconds = time.perf_counter() - started
+    telemetry.event("export_done", mode=mode, clips=len(result["succeeded"]), failed=len(result["failed"]),
+                    cancelled=result["cancelled"], seconds=round(seconds, 3), output_mb=round(output_mb, 2),
+                    mb_per_s=round(output_mb / seconds, 2) if seconds > 0 else None,
+                    peak_rss_mb=peak_memory_mb(), peak_children_rss_mb=peak_memory_mb(children=True))
+
+
+def export_video_clips(video_path, clips, output_dir, base_name="clip", progress_callback=None, stop_event=None,
+                       mode="reencode", workers=None, telemetry=None, cpu_budget=None):
+    """并发导出片段，返回 {"succeeded": [(序号, 路径)], "failed": [(序号, 路径, 错误)], "cancelled": bool}
+
+    workers 默认等于 CPU 核数；每个 ffmpeg 分到 核数/workers 个线程，避免互相抢占。
+    cpu_budget 限定导出可用的核数 (默认全部)，与后台分析同时进行时各用各的一份。
+    telemetry 接收每个片段的编码耗时 / MB/s 和整体汇总事件。
+    """
+    telemetry = telemetry or Telemetry()
+    started = time.perf_counter()
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         
     cap = open_video(video_path)
     fps = cap.frame_rate
+    # 切点时间按帧索引里的真实时间戳换算 (见第 18 节)；建不出索引时退回 帧号 / fps
+    index = get_frame_index(video_path)
+    telemetry.event("export_start", path=video_path, mode=mode, clips=len(clips),
+                    frames=sum(end - start for start, end in clips))
+
+    if mode == "single_pass":
+        result = export_clips_single_pass(video_path, clips, output_dir, fps, base_name, progress_callback,
+                                          stop_event, telemetry=telemetry, threads=cpu_budget or 0, index=index)
+        _report_export_done(telemetry, started, result, mode)
+        return result
+
+    keyframes = pix_fmt = None
+    if mode == "smart":
+        if index is not None:
+            keyframes, codec = index.keyframes.tolist(), index.codec
+        else:
+            keyframes, codec = probe_keyframes(video_path, fps)
+        pix_fmt = probe_pix_fmt(video_path)
+        if codec not in SMART_RENDER_CODECS:
+            print(f"[Debug] 源视频编码为 {codec}，无法与 libx264 片段拼接，改用重新编码")
+            keyframes = None
+        elif pix_fmt not in SMART_RENDER_PIX_FMTS or not x264_supports_pix_fmt(pix_fmt):
+            # 重编码的两头必须与复制的部分位深 / 色度采样一致，混在一条流里很多解码器不认
+            print(f"[Debug] 源视频像素格式为 {pix_fmt}，libx264 无法编出相同格式，改用重新编码")
+            keyframes = None
     
     total_clips = len(clips)
-    success_count = 0
-    
-    for i, (start, end) in enumerate(clips):
-        if stop_event and stop_event.is_set():
-            break
-            
-        start_time = start / fps
-        duration = (end - start) / fps
-        
+    cpu_count = cpu_budget or os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, total_clips))
+    threads_per_job = max(1, cpu_count // workers)
+    group = FFmpegProcessGroup()
+    index = index or FrameIndex.constant_rate(fps)
+
+    def export_one(i, start, end):
         output_filename = f"{base_name}_{i+1:03d}.mp4"
         output_path = os.path.join(output_dir, output_filename)
-        
-        if progress_callback:
-            progress_callback((i + 1) / total_clips)
-        
+        if group.cancelled:
+            return i, output_path, ExportCancelled()
+
         print(f"Exporting {i+1}/{total_clips}: {output_filename}")
+        clip_started = time.perf_counter()
+        try:
+            if keyframes is not None:
+                export_clip_smart(video_path, start, end, index, keyframes, output_path,
+                                  group=group, threads=threads_per_job, pix_fmt=pix_fmt)
+            else:
+                start_time = index.seek_time(start)
+                duration = index.seek_time(end) - start_time
+                cmd = [
+                    "ffmpeg", "-y", "-nostdin", "-v", "error",
+                    "-ss", f"{start_time:.6f}",
+                    "-i", video_path,
+                    "-t", f"{duration:.6f}",
+                    "-c:v", "libx264", "-crf", "18", "-preset", "fast",
+                    "-threads", str(threads_per_job),
+                    "-c:a", "aac",
+                    output_path
+                ]
+                group.run(cmd)
+            seconds = time.perf_counter() - clip_started
+            size_mb = os.path.getsize(output_path) / (1024 * 1024)
+            telemetry.event("clip_done", index=i, frames=end - start, seconds=round(seconds, 3),
+                            fps=round((end - start) / seconds, 1), output_mb=round(size_mb, 3),
+                            mb_per_s=round(size_mb / seconds, 2), smart=keyframes is not None)
+            return i, output_path, None
+        except Exception as e:
+            # 失败或被终止的片段不留下残缺文件
+            if os.path.isfile(output_path):
+                os.remove(output_path)
+            return i, output_path, e
 
-        cmd = [
-            "ffmpeg", "-y",
-            "-ss", f"{start_time:.3f}",
-            "-i", video_path,
-            "-t", f"{duration:.3f}",
-            "-c:v", "libx264", "-crf", "18", "-preset", "fast",
-            "-c:a", "aac",
-            output_path
+    result = {"succeeded": [], "failed": [], "cancelled": False}
+    completed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(export_one, i, start, end) for i, (start, end) in enumerate(clips)}
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            if stop_event and stop_event.is_set() and not group.cancelled:
+                print("[Debug] 停止导出，终止正在运行的 ffmpeg 进程")
+                group.cancel()
+            for future in done:
+                i, output_path, error = future.result()
+                if error is None:
+                    result["succeeded"].append((i, output_path))
+                elif isinstance(error, ExportCancelled):
+                    result["cancelled"] = True
+                    continue
+                else:
+                    print(f"[Debug] 片段 {i+1} 导出失败: {error}")
+                    result["failed"].append((i, output_path, str(error)))
+                # 进度按 "已完成" 的片段计算，而不是 "已开始"
+                completed += 1
+                if progress_callback:
+                    progress_callback(completed / total_clips)
+                telemetry.progress("clips", completed, total_clips, force=completed == total_clips)
+
+    result["succeeded"].sort()
+    result["failed"].sort()
+    _report_export_done(telemetry, started, result, mode)
+    return result
+
+# ==================== 5. 逐帧分数缓存 ====================
+# AdaptiveDetector 的 content_val 只取决于画面本身，threshold / min_len 只参与后处理。
+# 所以把每帧分数存下来，改滑块重新分析时直接在分数数组上重算切点即可。
+
+SCORE_CACHE_DIR = os.path.join(CACHE_ROOT, "scores")
+SCORE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+SCORE_CACHE_VERSION = 1
+
+
+class ScoreRecordingDetector(AdaptiveDetector):
+    """在正常检测的同时，把每帧的 content_val 记录下来"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frame_scores = []
+        # 每帧平均亮度 (与 ThresholdDetector 的 frame_avg 相同)，多检测器融合时用来重放淡入淡出判定
+        self.frame_brightness = []
+        # 可选：同一解码过程中截取候选切点的缩略图 (见 ThumbnailWriter)
+        self.thumbnails = None
+        self.first_frame = 0
+        self.detect_seconds = 0.0
+        # 可选：定期写检查点 (见 AnalysisCheckpoint)
+        self.checkpoint = None
+
+    def process_frame(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        cuts = super().process_frame(*args, **kwargs)
+        self.detect_seconds += time.perf_counter() - t0
+        if self._frame_score is not None:
+            frame_img = args[1] if len(args) > 1 else kwargs["frame_img"]
+            self.frame_scores.append(self._frame_score)
+            self.frame_brightness.append(float(np.mean(frame_img)))
+            if self.thumbnails is not None:
+                self.thumbnails.offer(self.first_frame + len(self.frame_scores) - 1, frame_img, self._frame_score)
+            if self.checkpoint is not None:
+                self.checkpoint.update(self.frame_scores, self.frame_brightness)
+        return cuts
+
+
+def video_file_signature(video_path, sample_size=1024 * 1024):
+    """文件指纹：大小 + 修改时间 + 头/中/尾三段内容的哈希 (整片哈希对几个 G 的片源太慢)"""
+    st = os.stat(video_path)
+    h = hashlib.sha1()
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(video_path, "rb") as f:
+        for offset in (0, st.st_size // 2, max(0, st.st_size - sample_size)):
+            f.seek(offset)
+            h.update(f.read(sample_size))
+    return h.hexdigest()
+
+
+def score_cache_key(video_path, window_width=ADAPTIVE_WINDOW_WIDTH,
+                    weights=AdaptiveDetector.DEFAULT_COMPONENT_WEIGHTS, luma_only=False, backend="opencv"):
+    # threshold / min_len 不影响分数，不进入缓存键；解码后端的缩放方式不同，分数会略有差异
+    settings = (f"v{SCORE_CACHE_VERSION}|w={window_width}|weights={tuple(weights)}|luma={luma_only}"
+                f"|backend={backend}")
+    h = hashlib.sha1()
+    h.update(video_file_signature(video_path).encode())
+    h.update(settings.encode())
+    return h.hexdigest()
+
+
+def load_cached_scores(cache_key):
+    path = os.path.join(SCORE_CACHE_DIR, cache_key + ".npz")
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            scores = data["scores"]
+            fps = float(data["fps"])
+    except Exception as e:
+        print(f"[Debug] 分数缓存损坏，忽略: {e}")
+        return None
+    # 更新修改时间，淘汰时按最近使用排序
+    os.utime(path, None)
+    return scores, fps
+
+
+def load_cached_brightness(cache_key):
+    """逐帧平均亮度 (多检测器融合用)；旧版本写的缓存没有这一项，返回 None"""
+    path = os.path.join(SCORE_CACHE_DIR, cache_key + ".npz")
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            return data["brightness"] if "brightness" in data.files else None
+    except Exception as e:
+        print(f"[Debug] 分数缓存损坏，忽略: {e}")
+        return None
+
+
+def save_cached_scores(cache_key, scores, fps, brightness=None):
+    os.makedirs(SCORE_CACHE_DIR, exist_ok=True)
+    path = os.path.join(SCORE_CACHE_DIR, cache_key + ".npz")
+    tmp_path = path + ".tmp.npz"
+    arrays = {"scores": np.asarray(scores, dtype=np.float64), "fps": float(fps)}
+    if brightness is not None and len(brightness) == len(scores):
+        arrays["brightness"] = np.asarray(brightness, dtype=np.float64)
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    evict_score_cache()
+
+
+def evict_score_cache(max_bytes=SCORE_CACHE_MAX_BYTES, cache_dir=SCORE_CACHE_DIR):
+    """超出容量时按最近使用时间删除最旧的缓存条目 (同一缓存键的多个文件一起删除)"""
+    if not os.path.isdir(cache_dir):
+        return
+    entries = {}
+    for name in os.listdir(cache_dir):
+        if ".tmp" in name:
+            continue
+        path = os.path.join(cache_dir, name)
+        st = os.stat(path)
+        mtime, size, paths = entries.get(name.split(".")[0], (0.0, 0, []))
+        entries[name.split(".")[0]] = (max(mtime, st.st_mtime), size + st.st_size, paths + [path])
+    total = sum(size for _, size, _ in entries.values())
+    for _, size, paths in sorted(entries.values()):
+        if total <= max_bytes:
+            break
+        for path in paths:
+            os.remove(path)
+        total -= size
+
+
+def adaptive_ratios(scores, window_width=ADAPTIVE_WINDOW_WIDTH, min_content_val=ADAPTIVE_MIN_CONTENT_VAL):
+    """对整段分数数组计算 AdaptiveDetector 的 adaptive_ratio (与逐帧计算逐位一致)
+
+    返回长度与 scores 相同的数组，两端凑不满窗口的帧为 0。
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    ratios = np.zeros(n, dtype=np.float64)
+    if n < 2 * window_width + 1:
+        return ratios
+    targets = scores[window_width:n - window_width]
+    # 按 AdaptiveDetector 中 sum() 的顺序逐项累加，保证浮点结果一致
+    window_sum = np.zeros(len(targets), dtype=np.float64)
+    for offset in range(2 * window_width + 1):
+        if offset != window_width:
+            window_sum = window_sum + scores[offset:offset + len(targets)]
+    average = window_sum / (2.0 * window_width)
+    average_is_zero = np.abs(average) < 0.00001
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.minimum(targets / np.where(average_is_zero, 1.0, average), 255.0)
+    ratio = np.where(average_is_zero, np.where(targets >= min_content_val, 255.0, 0.0), ratio)
+    ratios[window_width:n - window_width] = ratio
+    return ratios
+
+
+def cuts_from_scores(scores, threshold, min_len, window_width=ADAPTIVE_WINDOW_WIDTH,
+                     min_content_val=ADAPTIVE_MIN_CONTENT_VAL, start_frame=0, last_cut=None,
+                     candidate_mask=None):
+    """在逐帧分数上重放 AdaptiveDetector 的判定逻辑，返回切点帧号列表
+
+    last_cut 是 min_len 判定的起点 (默认 start_frame)，局部重新分析时设为区间前面那个已有切点。
+    candidate_mask (与 scores 等长的布尔数组) 限定只有哪些帧可以成为切点，两阶段检测时
+    只有精算过的候选区间才可信。
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    ratios = adaptive_ratios(scores, window_width, min_content_val)
+    is_candidate = (ratios >= threshold) & (scores >= min_content_val)
+    if candidate_mask is not None:
+        is_candidate &= candidate_mask
+    candidates = np.flatnonzero(is_candidate)
+
+    cuts = []
+    last_cut = start_frame if last_cut is None else last_cut
+    for target in candidates.tolist():
+        # AdaptiveDetector 用的是 "当前帧" (目标帧之后 window_width 帧) 来判断最小长度
+        frame_num = start_frame + target + window_width
+        if frame_num - last_cut >= min_len:
+            last_cut = start_frame + target
+            cuts.append(last_cut)
+    return cuts
+
+
+def scenes_from_cuts(cuts, end_frame, fps):
+    """切点帧号 → 与 find_scenes_optimized 相同格式的 (start_frame, end) 列表，最后一段到 end_frame"""
+    bounds = list(cuts) + [end_frame]
+    return [(bounds[i], FrameTimecode(bounds[i + 1], fps)) for i in range(len(cuts))]
+
+
+def scenes_from_scores(scores, fps, threshold, min_len, start_frame=0):
+    """由分数直接生成与 find_scenes_optimized 相同格式的 (start_frame, end) 列表"""
+    cuts = cuts_from_scores(scores, threshold, min_len, start_frame=start_frame)
+    return scenes_from_cuts(cuts, start_frame + len(scores), fps)
+
+
+# ==================== 6. 多核并行分析 ====================
+# 每帧的 content_val 只依赖于它和前一帧，所以每段只需多解码 1 帧预热即可得到与单次
+# 顺序分析完全相同的分数；adaptive_ratio 的滑动窗口和 min_len 判定放到拼接后的整片分数上
+# 统一计算 (见 cuts_from_scores)，分段边界处的切点因此与单线程结果逐帧一致。
+
+MIN_FRAMES_PER_CHUNK = 500
+
+
+def split_frame_ranges(total_frames, chunks):
+    """把 [0, total_frames) 均分成若干段，返回 [(start, end), ...]"""
+    chunks = max(1, min(chunks, total_frames // MIN_FRAMES_PER_CHUNK))
+    bounds = [total_frames * i // chunks for i in range(chunks + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(chunks)]
+
+
+def score_frame_range(video_path, start, end, decode_backend="opencv", engine="scenedetect", stop_event=None,
+                      progress_callback=None, thumbnails=None, read_to_end=False, brightness=None, checkpoint=None):
+    """只解码 [start, end) (外加 1 帧预热) 并返回逐帧分数，与整片顺序分析的同一段逐位一致
+
+    read_to_end=True 时忽略 end 一直读到文件结尾 (容器里的帧数不准时也不会丢掉片尾)。
+    传入 brightness (列表) 时追加同一段的逐帧平均亮度。
+    checkpoint 的前缀须已包含 [0, start)：这里把预热帧之后的新分数交给它。
+    """
+    warmup = 1 if start > 0 else 0
+    original_video = open_analysis_video(video_path, decode_backend)
+    if start - warmup > 0:
+        original_video.seek(start - warmup)
+    video = InterruptibleVideo(original_video, video_path, stop_event, progress_callback,
+                               total_frames=end - start + warmup)
+    stream_brightness = [] if brightness is not None or checkpoint is not None else None
+    if checkpoint is not None and warmup:
+        checkpoint = _SkipWarmupCheckpoint(checkpoint, warmup)
+    scores = score_video_stream(video, engine, decode_backend, end_frame=None if read_to_end else end,
+                                thumbnails=thumbnails, brightness=stream_brightness, checkpoint=checkpoint)
+    if brightness is not None:
+        brightness.extend(stream_brightness[warmup:])
+    return scores[warmup:]
+
+
+class _SkipWarmupCheckpoint:
+    """把流里的预热帧从交给检查点的分数中去掉"""
+
+    def __init__(self, checkpoint, warmup):
+        self._checkpoint = checkpoint
+        self._warmup = warmup
+
+    def update(self, scores, brightness, force=False):
+        self._checkpoint.update(scores[self._warmup:], brightness[self._warmup:], force)
+
+
+STOP_POLL_INTERVAL = 0.1  # 秒，工作进程查询跨进程停止事件的最小间隔
+
+
+class _PolledEvent:
+    """Manager 事件的 is_set() 每次都是一次跨进程往返；逐帧查询时按墙钟时间节流，置位后不再查询"""
+
+    def __init__(self, event, interval=STOP_POLL_INTERVAL):
+        self._event = event
+        self._interval = interval
+        self._is_set = False
+        self._next_poll = 0.0
+
+    def is_set(self):
+        if not self._is_set:
+            now = time.perf_counter()
+            if now >= self._next_poll:
+                self._next_poll = now + self._interval
+                self._is_set = self._event.is_set()
+        return self._is_set
+
+
+def _score_range_worker(video_path, chunk_id, start, end, is_last, cancel_event, progress_queue,
+                        decode_backend="opencv", engine="scenedetect", thumbnail_path=None):
+    """进程池工作函数：计算 [start, end) 的逐帧分数；最后一段一直读到文件结尾"""
+    def report(p):
+        progress_queue.put((chunk_id, p))
+
+    thumbnails = ThumbnailWriter(thumbnail_path) if thumbnail_path else None
+    brightness = []
+    scores = score_frame_range(video_path, start, end, decode_backend, engine, _PolledEvent(cancel_event), report,
+                               thumbnails=thumbnails, read_to_end=is_last, brightness=brightness)
+    completed = not cancel_event.is_set()
+    if thumbnails is not None:
+        # 预热帧是流里的第一帧，分数为 0，不会被截图；只需把文件交回主进程拼接
+        thumbnails.close()
+        thumbnails = (thumbnails.frames, thumbnails.shape)
+    return chunk_id, scores, completed, thumbnails, brightness
+
+
+def compute_scores_parallel(video_path, workers, progress_callback=None, stop_event=None, decode_backend="opencv",
+                            engine="scenedetect", thumbnails=None, telemetry=None, brightness=None, start_frame=0):
+    """多进程分段计算整片逐帧分数
+
+    返回 (scores, fps, completed)。中途停止时只保留从片头开始连续的那部分分数。
+    start_frame > 0 时只算 [start_frame, 片尾) (从检查点续跑)，返回的分数也从 start_frame 开始。
+    传入 thumbnails (ThumbnailWriter) 时，各进程的缩略图按分段顺序拼接进去；
+    传入 brightness (列表) 时追加与分数对齐的逐帧平均亮度。
+    """
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if fps <= 0:
+        fps = open_video(video_path).frame_rate
+
+    ranges = [(start_frame + lo, start_frame + hi)
+              for lo, hi in split_frame_ranges(max(1, total_frames - start_frame), workers)]
+    print(f"[Debug] 并行分析: {len(ranges)} 段, {workers} 个进程")
+
+    # Windows / 打包环境下只能用 spawn，这里统一使用，行为一致
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        cancel_event = manager.Event()
+        progress_queue = manager.Queue()
+        chunk_progress = [0.0] * len(ranges)
+        chunk_lengths = [end - start for start, end in ranges]
+        total_len = max(1, sum(chunk_lengths))
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=ctx) as pool:
+            futures = [
+                pool.submit(_score_range_worker, video_path, i, start, end, i == len(ranges) - 1,
+                            cancel_event, progress_queue, decode_backend, engine,
+                            f"{thumbnails.path}.part{i}" if thumbnails else None)
+                for i, (start, end) in enumerate(ranges)
+            ]
+            # 主线程负责汇总各进程进度，并把 stop_event 转发给所有进程
+            while not all(f.done() for f in futures):
+                if stop_event and stop_event.is_set():
+                    cancel_event.set()
+                try:
+                    chunk_id, p = progress_queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                chunk_progress[chunk_id] = min(p, 1.0)
+                done = sum(cp * n for cp, n in zip(chunk_progress, chunk_lengths))
+                if progress_callback:
+                    progress_callback(min(done / total_len, 1.0))
+                if telemetry:
+                    telemetry.progress("analysis", int(done), total_len, workers=len(ranges))
+            results = [f.result() for f in futures]
+
+    scores = []
+    completed = True
+    for chunk_id, chunk_scores, chunk_completed, chunk_thumbs, chunk_brightness in results:
+        if completed:
+            scores.extend(chunk_scores)
+            if brightness is not None:
+                brightness.extend(chunk_brightness)
+            completed = chunk_completed
+            if thumbnails and chunk_thumbs:
+                thumbnails.append_part(f"{thumbnails.path}.part{chunk_id}", *chunk_thumbs)
+        if thumbnails and os.path.exists(f"{thumbnails.path}.part{chunk_id}"):
+            os.remove(f"{thumbnails.path}.part{chunk_id}")
+    return scores, fps, completed
+
+
+# ==================== 7. FFmpeg 管道解码后端 ====================
+# OpenCV 路径先解出整幅 BGR 帧，再由 SceneManager 缩小到 ~256px 宽，1080p/4K 片源的大部分时间
+# 都花在了用不到的像素上。这里让 ffmpeg 在解码器里直接完成缩放和像素格式转换，
+# 以 rawvideo 从管道读出，读入预分配的缓冲区，每帧不再分配内存。
+
+ANALYSIS_WIDTH = 256  # 与 SceneManager 自动缩放后的目标宽度一致
+
+
+class FFmpegPipeVideo:
+    """ffmpeg 子进程解码的视频流，接口与 scenedetect 的 VideoStream 保持一致，可直接交给
+    InterruptibleVideo / SceneManager 使用"""
+
+    BACKEND_NAME = "ffmpeg_pipe"
+    # SceneManager 的解码线程会预读若干帧放进队列，缓冲区数量必须大于队列长度 + 正在处理的帧
+    BUFFER_COUNT = 8
+
+    def __init__(self, path, width=ANALYSIS_WIDTH, luma_only=False, frame_step=1):
+        """frame_step > 1 时只输出每 frame_step 帧中的第一帧 (两阶段检测的粗扫，见第 16 节)"""
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"无法打开视频: {path}")
+        src_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        src_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        out_w = min(width, src_w)
+        out_w -= out_w % 2
+        out_h = max(2, int(round(src_h * out_w / src_w / 2)) * 2)
+
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.frame_size = (out_w, out_h)
+        self.frame_rate = fps
+        self.base_timecode = FrameTimecode(0, fps)
+        self.luma_only = luma_only
+        self.frame_step = max(1, int(frame_step))
+        self.is_seekable = True
+
+        shape = (out_h, out_w) if luma_only else (out_h, out_w, 3)
+        self._buffers = np.empty((self.BUFFER_COUNT,) + shape, dtype=np.uint8)
+        self._frame_bytes = self._buffers[0].nbytes
+        self._next_buffer = 0
+        self._frame_number = 0
+        self._proc = None
+        # 已建好的帧索引 (不在这里现场建立)：定位时按真实时间戳取中点
+        self._index = load_frame_index(path)
+        self._start(0)
+
+    def _start(self, start_frame):
+        self.release()
+        cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+        if start_frame > 0:
+            # 定位到目标帧与前一帧之间的中点：NTSC 片源放进 1ms 时间基的容器 (MKV) 后，帧的 pts 常常
+            # 略小于 n/fps，正好定位到 n/fps 时精确定位会把目标帧丢掉，整段晚一帧
+            if self._index is not None:
+                seek = self._index.seek_time(start_frame) - self._index.time_of(0)
+            else:
+                seek = (start_frame - 0.5) / self.frame_rate
+            cmd += ["-ss", f"{seek:.6f}"]
+        vf = f"scale={self.frame_size[0]}:{self.frame_size[1]}:flags=area"
+        if self.frame_step > 1:
+            # 跳过的帧在缩放和格式转换之前就丢掉；粗扫不要求画质，顺带跳过解码器的环路滤波
+            cmd += ["-skip_loop_filter", "all"]
+            vf = f"select=not(mod(n\\,{self.frame_step})),{vf}"
+        cmd += [
+            "-i", self.path,
+            "-map", "0:v:0", "-an", "-sn",
+            "-vf", vf,
+            "-pix_fmt", "gray" if self.luma_only else "bgr24",
+            "-vsync", "passthrough",
+            "-f", "rawvideo", "pipe:1",
         ]
-        
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        success_count += 1
-        
-    return success_count
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                      bufsize=self._frame_bytes * 2)
+        self._frame_number = start_frame
+
+    @property
+    def frame_number(self):
+        return self._frame_number
+
+    @property
+    def position(self):
+        return self.base_timecode + max(0, self._frame_number - 1)
+
+    @property
+    def duration(self):
+        return FrameTimecode(self.frame_count, self.frame_rate) if self.frame_count > 0 else None
+
+    @property
+    def aspect_ratio(self):
+        return 1.0
+
+    def read(self, decode=True, advance=True):
+        if self._proc is None:
+            return False
+        buf = self._buffers[self._next_buffer]
+        view = memoryview(buf.reshape(-1))
+        got = 0
+        while got < self._frame_bytes:
+            n = self._proc.stdout.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        self._next_buffer = (self._next_buffer + 1) % self.BUFFER_COUNT
+        self._frame_number += self.frame_step
+        return buf if decode else True
+
+    def seek(self, target):
+        if isinstance(target, FrameTimecode):
+            target = target.get_frames()
+        self._start(int(target))
+
+    def reset(self):
+        self._start(0)
+
+    def release(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.stdout.close()
+            self._proc.wait()
+            self._proc = None
+
+    def __del__(self):
+        self.release()
+
+
+class LumaScoreDetector(ScoreRecordingDetector):
+    """单通道 (Y) 帧的检测器：分数取 -pix_fmt gray 的 Y 平面逐像素差
+
+    只是 luma_only 权重的近似：PySceneDetect 的亮度分量是 HSV 的 V (max(R,G,B))，
+    Y 是 R/G/B 的加权和，同一画面的分数和合适的阈值都与 HSV 亮度不同。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._last_luma = None
+        self._diff = None
+
+    def _calculate_frame_score(self, *args, **kwargs):
+        frame_img = args[-1] if args else kwargs["frame_img"]
+        if frame_img.ndim == 3:
+            return super()._calculate_frame_score(*args, **kwargs)
+        if self._last_luma is None:
+            self._last_luma = frame_img.copy()
+            self._diff = np.empty_like(frame_img)
+            return 0.0
+        cv2.absdiff(frame_img, self._last_luma, dst=self._diff)
+        np.copyto(self._last_luma, frame_img)
+        return np.sum(self._diff, dtype=np.int64) / float(self._diff.size)
+
+
+def open_analysis_video(video_path, decode_backend="opencv"):
+    if decode_backend == "opencv":
+        return open_video(video_path)
+    if decode_backend in ("ffmpeg", "ffmpeg_luma"):
+        return FFmpegPipeVideo(video_path, luma_only=decode_backend == "ffmpeg_luma")
+    raise ValueError(f"未知的解码后端: {decode_backend}")
+
+
+def make_score_detector(threshold=3.0, min_len=15, decode_backend="opencv"):
+    detector_cls = LumaScoreDetector if decode_backend == "ffmpeg_luma" else ScoreRecordingDetector
+    return detector_cls(
+        adaptive_threshold=threshold, min_scene_len=min_len,
+        window_width=ADAPTIVE_WINDOW_WIDTH, min_content_val=ADAPTIVE_MIN_CONTENT_VAL
+    )
+
+
+# ==================== 8. 批量向量化检测引擎 ====================
+# PySceneDetect 逐帧调用 process_frame，每帧一次 Python 调用和若干次小数组运算。
+# 批量引擎把 BATCH_SIZE 帧缩放进预分配的批缓冲区，整批拼成一张"长图"一次转 HSV，
+# 再对整批做差分和求和；adaptive_ratio / min_len 判定在整片分数数组上完成 (cuts_from_scores)。
+# 差分求和全程用整数，分数与 ContentDetector 逐位相同，所以切点与原检测器完全一致。
+
+BATCH_SIZE = 64
+
+
+class BatchScoreEngine:
+    """按批计算 AdaptiveDetector 的逐帧 content_val"""
+
+    def __init__(self, batch_size=BATCH_SIZE, weights=ContentDetector.DEFAULT_COMPONENT_WEIGHTS,
+                 auto_downscale=True, thumbnails=None, first_frame=0):
+        self.batch_size = batch_size
+        self.scores = []
+        self.brightness = []  # 每帧平均亮度，与 ScoreRecordingDetector.frame_brightness 相同
+        self.thumbnails = thumbnails
+        self.first_frame = first_frame
+        self._weights = weights
+        self._weight_sum = sum(abs(w) for w in weights)
+        self._auto_downscale = auto_downscale
+        self._batch = None
+        self._count = 0
+        self._resize_to = None
+        self._prev = None
+        self._prev_edges = None
+        self._kernel = None
+
+    def _init_buffers(self, frame):
+        h, w = frame.shape[:2]
+        if self._auto_downscale:
+            # 与 SceneManager 的自动缩放逐像素一致
+            factor = compute_downscale_factor(max(w, h))
+            if factor > 1.0:
+                self._resize_to = (max(1, round(w / factor)), max(1, round(h / factor)))
+                w, h = self._resize_to
+        self._batch = np.empty((self.batch_size, h, w) + frame.shape[2:], dtype=np.uint8)
+
+    def push(self, frame):
+        if self._batch is None:
+            self._init_buffers(frame)
+        slot = self._batch[self._count]
+        if self._resize_to is not None:
+            cv2.resize(frame, self._resize_to, dst=slot, interpolation=cv2.INTER_LINEAR)
+        else:
+            np.copyto(slot, frame)
+        self._count += 1
+        if self._count == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        n = self._count
+        if n == 0:
+            return
+        self._count = 0
+        batch = self._batch[:n]
+        h, w = batch.shape[1:3]
+        num_pixels = float(h * w)
+        self.brightness.extend(batch.reshape(n, -1).mean(axis=1).tolist())
+
+        if batch.ndim == 4:
+            # 整批拼成 (n*h, w, 3) 的长图，一次 cvtColor 完成全部 HSV 转换
+            planes = cv2.cvtColor(batch.reshape(n * h, w, 3), cv2.COLOR_BGR2HSV).reshape(n, h, w, 3)
+        else:
+            # 单通道 (Y) 帧：只有亮度分量，与 LumaScoreDetector 相同
+            planes = batch.reshape(n, h, w, 1).copy()
+        channels = planes.shape[3]
+
+        if self._prev is None:
+            # 第一帧没有可比较的上一帧，分数为 0 (与 ContentDetector 一致)
+            self.scores.append(0.0)
+            current, previous = planes[1:], planes[:-1]
+        else:
+            current = planes
+            previous = np.concatenate([self._prev[None], planes[:-1]])
+
+        m = len(current)
+        if m > 0:
+            diff = cv2.absdiff(current.reshape(m * h, w, channels), previous.reshape(m * h, w, channels))
+            # 每帧一行，一次 reduce 得到整批每帧每通道的差值总和 (float64 累加整数，结果精确)
+            sums = cv2.reduce(diff.reshape(m, h * w, channels), 1, cv2.REDUCE_SUM, dtype=cv2.CV_64F)
+            components = sums.reshape(m, channels) / num_pixels
+
+            if channels == 1:
+                frame_scores = components[:, 0]
+            else:
+                delta_edges = np.zeros(m)
+                if self._weights.delta_edges > 0.0:
+                    delta_edges = self._edge_deltas(planes[..., 2], m)
+                # 与 ContentDetector 中 sum(component * weight) 的累加顺序一致
+                frame_scores = (components[:, 0] * self._weights.delta_hue
+                                + components[:, 1] * self._weights.delta_sat
+                                + components[:, 2] * self._weights.delta_lum
+                                + delta_edges * self._weights.delta_edges) / self._weight_sum
+            self.scores.extend(frame_scores.tolist())
+
+        if self.thumbnails is not None:
+            # 本批 n 帧对应分数列表的最后 n 项
+            batch_scores = self.scores[-n:]
+            base = self.first_frame + len(self.scores) - n
+            for k in np.flatnonzero(np.asarray(batch_scores) >= self.thumbnails.min_content_val).tolist():
+                self.thumbnails.offer(base + k, batch[k], batch_scores[k])
+
+        self._prev = planes[-1].copy()
+
+    def _edge_deltas(self, lum_planes, m):
+        """边缘分量依赖每帧各自的中值阈值，只能逐帧做 Canny"""
+        if self._kernel is None:
+            h, w = lum_planes.shape[1:3]
+            size = 4 + round(np.sqrt(w * h) / 192)
+            size += 1 - size % 2
+            self._kernel = np.ones((size, size), np.uint8)
+        edges = []
+        for lum in lum_planes:
+            median = np.median(lum)
+            low = int(max(0, (1.0 - 1.0 / 3.0) * median))
+            high = int(min(255, (1.0 + 1.0 / 3.0) * median))
+            edges.append(cv2.dilate(cv2.Canny(lum, low, high), self._kernel))
+        if self._prev_edges is not None:
+            edges.insert(0, self._prev_edges)
+        self._prev_edges = edges[-1]
+        num_pixels = float(edges[0].size)
+        return np.array([np.sum(cv2.absdiff(a, b), dtype=np.int64) / num_pixels
+                         for a, b in zip(edges[-m - 1:-1], edges[-m:])])
+
+
+def score_video_stream(video, engine="scenedetect", decode_backend="opencv", end_frame=None, thumbnails=None,
+                       brightness=None, checkpoint=None):
+    """从 video 当前位置开始逐帧打分，直到 end_frame (不含) 或文件结尾，返回分数列表
+
+    传入 brightness (列表) 时追加与分数对齐的逐帧平均亮度；
+    传入 checkpoint (AnalysisCheckpoint) 时定期把已算出的分数写成检查点。
+    """
+    first_frame = video.frame_number
+    if engine == "batch":
+        batch_engine = BatchScoreEngine(auto_downscale=decode_backend == "opencv", thumbnails=thumbnails,
+                                        first_frame=first_frame)
+        while end_frame is None or video.frame_number < end_frame:
+            frame = video.read()
+            if frame is False or frame is None:
+                break
+            batch_engine.push(frame)
+            if checkpoint is not None:
+                checkpoint.update(batch_engine.scores, batch_engine.brightness)
+        batch_engine.flush()
+        if brightness is not None:
+            brightness.extend(batch_engine.brightness)
+        return batch_engine.scores
+
+    scene_manager = SceneManager()
+    detector = make_score_detector(decode_backend=decode_backend)
+    detector.thumbnails = thumbnails
+    detector.first_frame = first_frame
+    detector.checkpoint = checkpoint
+    scene_manager.add_detector(detector)
+    if decode_backend != "opencv":
+        scene_manager.auto_downscale = False
+    scene_manager.detect_scenes(video, end_time=end_frame, show_progress=False)
+    if brightness is not None:
+        brightness.extend(detector.frame_brightness)
+    return detector.frame_scores
+
+
+# ==================== 9. 智能渲染导出 ====================
+# 片段内完整的 GOP 直接流复制，只有 "切点 → 下一个关键帧" 和 "最后一个关键帧 → 片段结尾" 这两小段
+# 用 libx264 重新编码，再拼接起来。所有子命令都按帧数 (-frames:v) 截取，保证与切点列表逐帧对齐；
+# 定位时间和关键帧都取自帧索引 (第 18 节)，可变帧率片源也能对准。
+# 关键帧需是闭合 GOP 的起点 (x264 默认如此)；open-gop 片源复制段开头的 B 帧可能花屏。
+# 只有 H.264 片源能和 libx264 的开头片段拼接，其它编码自动退回整段重新编码。
+# 重编码部分按源的像素格式编码 (10-bit / 4:2:2 的片源，libx264 随之选 High 10 / High 4:2:2 档次)；
+# libx264 编不出源的格式时同样退回整段重新编码。
+
+SMART_RENDER_CODECS = ("h264",)
+SMART_RENDER_PIX_FMTS = ("yuv420p", "yuvj420p", "yuv422p", "yuvj422p", "yuv444p", "yuvj444p",
+                         "yuv420p10le", "yuv422p10le", "yuv444p10le")
+_x264_pix_fmt_support = {}
+
+
+def probe_pix_fmt(video_path):
+    """视频流的像素格式 (例如 yuv420p10le)，解析不出时返回 None"""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostdin", "-i", video_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    # 形如 "Video: h264 (High 10) (avc1 / 0x31637661), yuv420p10le(tv, bt709, progressive), 1920x1080"
+    match = re.search(r"Stream #\d+:\d+.*?: Video: \w+[^,]*, (\w+)", result.stderr)
+    return match.group(1) if match else None
+
+
+def x264_supports_pix_fmt(pix_fmt):
+    """本机 libx264 能否编出 pix_fmt (只支持 8-bit 的构建编不了 10-bit)；结果按进程缓存"""
+    if pix_fmt not in _x264_pix_fmt_support:
+        result = subprocess.run(["ffmpeg", "-nostdin", "-v", "error", "-f", "lavfi", "-i", "color=s=64x64:d=0.1",
+                                 "-pix_fmt", pix_fmt, "-c:v", "libx264", "-f", "null", "-"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _x264_pix_fmt_support[pix_fmt] = result.returncode == 0
+    return _x264_pix_fmt_support[pix_fmt]
+
+
+def probe_keyframes(video_path, fps):
+    """返回 (关键帧帧号列表, 视频编码名)
+
+    不依赖 ffprobe (发行包只带 ffmpeg.exe)：-skip_frame nokey 让解码器只解关键帧，
+    showinfo 打印每个关键帧的 pts_time，整片扫描只需要几秒。
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostdin",
+        "-skip_frame", "nokey", "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", "showinfo", "-vsync", "passthrough",
+        "-f", "null", "-",
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    codec_match = re.search(r"Stream #\d+:\d+.*?: Video: (\w+)", result.stderr)
+    codec = codec_match.group(1) if codec_match else "unknown"
+    pts_times = [float(t) for t in re.findall(r"pts_time:\s*([-\d.]+)", result.stderr)]
+    if not pts_times:
+        return [0], codec
+    # 首个关键帧就是第 0 帧，其余按相对时间换算成帧号
+    first = pts_times[0]
+    keyframes = sorted({int(round((t - first) * fps)) for t in pts_times})
+    return keyframes, codec
+
+
+def _encode_video_part(video_path, start, frames, index, output_path, group=None, threads=0, pix_fmt="yuv420p"):
+    # 精确定位：解码后丢弃时间戳早于 -ss 的帧，取与前一帧之间的中点避免浮点误差漏掉第一帧
+    _run_ffmpeg([
+        "ffmpeg", "-y", "-nostdin", "-v", "error",
+        "-ss", f"{index.seek_time(start):.6f}", "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn",
+        "-frames:v", str(frames),
+        "-c:v", "libx264", "-crf", "18", "-preset", "fast",
+        "-threads", str(threads),
+        "-pix_fmt", pix_fmt,
+        "-f", "matroska", output_path,
+    ], group)
+
+
+def _copy_video_part(video_path, start, frames, index, output_path, group=None):
+    # 流复制从 -ss 之前最近的关键帧开始；取与后一帧之间的中点，保证落在 start 这个关键帧上
+    _run_ffmpeg([
+        "ffmpeg", "-y", "-nostdin", "-v", "error",
+        "-ss", f"{index.seek_time(start + 1):.6f}", "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn",
+        "-frames:v", str(frames),
+        "-c:v", "copy",
+        "-f", "matroska", output_path,
+    ], group)
+
+
+def export_clip_smart(video_path, start, end, index, keyframes, output_path, group=None, threads=0,
+                      pix_fmt="yuv420p"):
+    """智能渲染导出单个片段 [start, end)
+
+    只流复制完整的 GOP [K1, K2)：复制时 -frames:v 按解码顺序计数，只有在 GOP 边界上截断，
+    输出的帧才恰好是这段显示顺序里的帧 (否则有 B 帧时会混进后面的 P 帧)。
+    两头不足一个 GOP 的部分重新编码 (pix_fmt 与源相同)。index 为 FrameIndex (没有索引时用 FrameIndex.constant_rate)。
+    """
+    first_key_idx = bisect_left(keyframes, start)
+    first_key = keyframes[first_key_idx] if first_key_idx < len(keyframes) else None
+    last_key_idx = bisect_right(keyframes, end) - 1
+    last_key = keyframes[last_key_idx] if last_key_idx >= 0 else None
+
+    parts = []
+    if first_key is None or last_key is None or first_key >= last_key:
+        # 片段内没有完整的 GOP，可复制的部分为空
+        parts.append(("encode", start, end - start))
+    else:
+        if start < first_key:
+            parts.append(("encode", start, first_key - start))
+        parts.append(("copy", first_key, last_key - first_key))
+        if last_key < end:
+            parts.append(("encode", last_key, end - last_key))
+
+    tmp_dir = tempfile.mkdtemp(prefix="autocut_smart_")
+    try:
+        part_paths = []
+        for n, (kind, part_start, frames) in enumerate(parts):
+            part_path = os.path.join(tmp_dir, f"part_{n}.mkv")
+            if kind == "copy":
+                _copy_video_part(video_path, part_start, frames, index, part_path, group)
+            else:
+                _encode_video_part(video_path, part_start, frames, index, part_path, group, threads, pix_fmt)
+            part_paths.append(part_path)
+
+        list_path = os.path.join(tmp_dir, "parts.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        # 视频按片段拼接 (concat 分离器会给每个片段单独插入 SPS/PPS，开头重编码部分的参数集不会
+        # 影响后面复制的部分)；音频单独从源文件按时间截取并编码 (AAC 编码开销可以忽略)
+        _run_ffmpeg([
+            "ffmpeg", "-y", "-nostdin", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-ss", f"{index.seek_time(start):.6f}", "-t", f"{index.seek_time(end) - index.seek_time(start):.6f}",
+            "-i", video_path,
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c:v", "copy", "-c:a", "aac",
+            output_path,
+        ], group)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return parts
+
+
+# ==================== 10. 单次解码批量导出 ====================
+# 逐个片段导出时，每个 ffmpeg 都要重新定位、重新解码。这里把所有选中的区间写进一条 ffmpeg 命令：
+# select 滤镜只保留选中区间的帧 (未选中的空档直接丢弃、不编码)，在每个片段的边界强制关键帧，
+# 再由 segment 复用器在这些关键帧处切分成独立文件。整个源文件只解码一遍。
+
+
+def probe_has_audio(video_path):
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostdin", "-i", video_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors="replace")
+    return re.search(r"Stream #\d+:\d+.*?: Audio:", result.stderr) is not None
+
+
+def build_single_pass_filter(clips, fps, has_audio, index=None):
+    """生成只保留选中区间的滤镜图 (帧号选择视频，按时间裁剪音频；音频时间取自帧索引)
+
+    音频不用 aselect：它只能整帧取舍 (AAC 一帧约 21ms)，每个边界最多差一帧，几百个片段后音画明显不同步。
+    这里每个区间各自 atrim (按采样点裁剪) 后再 concat，边界误差不超过一个采样点。
+    """
+    index = index or FrameIndex.constant_rate(fps)
+    video_terms = "+".join(f"between(n,{start},{end - 1})" for start, end in clips)
+    graph = f"[0:v]select='{video_terms}',setpts=N/FRAME_RATE/TB[v]"
+    if has_audio:
+        graph += f";[0:a]asplit={len(clips)}" + "".join(f"[as{i}]" for i in range(len(clips)))
+        for i, (start, end) in enumerate(clips):
+            # 音频按帧的显示时间裁剪 (不取 seek_time 的半帧中点)，与视频逐帧对齐
+            graph += (f";[as{i}]atrim=start={index.time_of(start):.6f}:end={index.time_of(end):.6f},"
+                      f"asetpts=PTS-STARTPTS[at{i}]")
+        graph += ";" + "".join(f"[at{i}]" for i in range(len(clips))) + f"concat=n={len(clips)}:v=0:a=1[a]"
+    return graph
+
+
+def export_clips_single_pass(video_path, clips, output_dir, fps, base_name="clip", progress_callback=None,
+                             stop_event=None, telemetry=None, threads=0, index=None):
+    """一条 ffmpeg 命令导出全部片段，返回值格式与 export_video_clips 相同 (threads=0 表示由 ffmpeg 自定)"""
+    clips = sorted(clips)
+    lengths = [end - start for start, end in clips]
+    total_frames = sum(lengths)
+    # 每个片段在输出流中的起始帧 (第一个片段从 0 开始，不需要切分)
+    boundaries = np.cumsum(lengths)[:-1].tolist()
+    has_audio = probe_has_audio(video_path)
+
+    tmp_dir = tempfile.mkdtemp(prefix="autocut_single_")
+    filter_path = os.path.join(tmp_dir, "filter.txt")
+    with open(filter_path, "w", encoding="utf-8") as f:
+        # 数百个区间的表达式会超出 Windows 命令行长度限制，滤镜图放进脚本文件
+        f.write(build_single_pass_filter(clips, fps, has_audio, index))
+
+    cmd = [
+        "ffmpeg", "-y", "-nostdin", "-v", "error",
+        "-i", video_path,
+        "-filter_complex_script", filter_path,
+        "-map", "[v]",
+    ]
+    if has_audio:
+        cmd += ["-map", "[a]", "-c:a", "aac"]
+    cmd += [
+        "-vsync", "passthrough",
+        "-c:v", "libx264", "-crf", "18", "-preset", "fast",
+        "-threads", str(threads),
+    ]
+    if boundaries:
+        # 输出已按 setpts 重排成恒定帧率，仍按 fps 换算；取边界帧前半帧的时间点，保证关键帧恰好落在边界帧上
+        cmd += ["-force_key_frames", ",".join(f"{(b - 0.5) / fps:.6f}" for b in boundaries),
+                "-segment_frames", ",".join(str(b) for b in boundaries)]
+    cmd += [
+        # mp4 分段复用器在有 B 帧时会吞掉首帧，先写 mkv 分段，完成后再无损转封装为 mp4
+        "-f", "segment", "-reset_timestamps", "1", "-segment_start_number", "1",
+        "-progress", "pipe:1",
+        os.path.join(tmp_dir, "segment_%03d.mkv"),
+    ]
+
+    print(f"[Debug] 单次解码导出 {len(clips)} 个片段 ({total_frames} 帧)")
+    result = {"succeeded": [], "failed": [], "cancelled": False}
+    frames_done = 0
+    try:
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, text=True, errors="replace")
+            try:
+                # -progress 每 0.5 秒输出一组 key=value，顺便在这里检查停止
+                for line in proc.stdout:
+                    if stop_event and stop_event.is_set():
+                        result["cancelled"] = True
+                        proc.terminate()
+                        break
+                    if line.startswith("frame="):
+                        frames_done = int(line.split("=", 1)[1] or 0)
+                        if progress_callback and total_frames:
+                            progress_callback(min(frames_done / total_frames, 1.0))
+                        if telemetry:
+                            telemetry.progress("export", frames_done, total_frames)
+            finally:
+                proc.wait()
+            stderr_file.seek(0)
+            stderr_tail = stderr_file.read().decode("utf-8", errors="replace").strip()[-FFMPEG_ERROR_TAIL:]
+
+        ok = proc.returncode == 0 and not result["cancelled"]
+        clip_end = 0
+        for i, length in enumerate(lengths):
+            clip_end += length
+            segment_path = os.path.join(tmp_dir, f"segment_{i+1:03d}.mkv")
+            output_path = os.path.join(output_dir, f"{base_name}_{i+1:03d}.mp4")
+            # 中断或失败时，最后一个正在写的分段是不完整的
+            if not os.path.isfile(segment_path) or not (ok or clip_end <= frames_done):
+                if not result["cancelled"]:
+                    result["failed"].append((i, output_path, f"ffmpeg 失败 ({proc.returncode}): {stderr_tail}"))
+                continue
+            try:
+                _run_ffmpeg(["ffmpeg", "-y", "-nostdin", "-v", "error", "-i", segment_path,
+                             "-c", "copy", "-movflags", "+faststart", output_path])
+                result["succeeded"].append((i, output_path))
+                if telemetry:
+                    # 所有片段在同一条命令里编码，没有单独的耗时
+                    telemetry.event("clip_done", index=i, frames=length, seconds=None,
+                                    output_mb=round(os.path.getsize(output_path) / (1024 * 1024), 3))
+            except Exception as e:
+                result["failed"].append((i, output_path, str(e)))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return result
+
+
+# ==================== 11. 预览帧缓存 ====================
+# 预览区每次点击都 cap.set(POS_FRAMES) 会触发一次关键帧定位 + 解码到目标帧，长 GOP 片源上逐帧步进很卡。
+# 这里用有界 LRU 缓存解码好的预览帧，后台线程在当前帧和当前页切点附近预取；
+# 向后走一帧时直接顺序 read()，不再定位。有帧索引 (第 18 节) 时按关键帧和时间戳定位：目标和当前位置
+# 在同一个 GOP 里就顺序 grab 过去，否则直接定位到目标之前的关键帧，可变帧率片源也能对准。
+# 全帧内代理 (第 22 节) 就绪后改读代理，每帧都能按帧号直接定位。
+
+PREVIEW_MAX_WIDTH = 1280  # 缓存帧的最大宽度 (预览区不会比这更大)
+PREVIEW_CACHE_MAX_BYTES = 384 * 1024 * 1024
+PREFETCH_BEFORE = 4   # 每个预取中心往前取的帧数
+PREFETCH_AFTER = 24   # 每个预取中心往后取的帧数 (向后步进更常见)
+
+
+class PreviewFrameCache:
+    """解码后的预览帧 LRU 缓存 (RGB，宽度不超过 PREVIEW_MAX_WIDTH)，带后台邻域预取"""
+
+    def __init__(self, video_path, max_bytes=PREVIEW_CACHE_MAX_BYTES):
+        self.video_path = video_path
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # 前台和后台各用一个 VideoCapture，cv2 的读取器不是线程安全的
+        self._cap = cv2.VideoCapture(video_path)
+        self._next_pos = 0  # 前台读取器下一次 read() 会得到的帧号
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        # 代理路径；前台 / 后台读取器各自在下一次读取时发现变化，重新打开代理
+        self.proxy_path = None
+        self._cap_proxy = None
+        # 帧索引由后台线程读取 / 建立，就绪前按帧号定位；就绪后帧数以索引为准 (容器里的帧数只是估计)
+        self.index = None
+
+        self._wanted = []
+        self._generation = 0
+        self._wake = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._prefetch_loop, daemon=True)
+        self._worker.start()
+
+    # ---------- LRU ----------
+    def _lookup(self, frame_num):
+        with self._lock:
+            frame = self._frames.get(frame_num)
+            if frame is not None:
+                self._frames.move_to_end(frame_num)
+            return frame
+
+    def _store(self, frame_num, frame):
+        with self._lock:
+            if frame_num in self._frames:
+                return
+            self._frames[frame_num] = frame
+            self._bytes += frame.nbytes
+            while self._bytes > self.max_bytes and len(self._frames) > 1:
+                _, old = self._frames.popitem(last=False)
+                self._bytes -= old.nbytes
+
+    def __contains__(self, frame_num):
+        with self._lock:
+            return frame_num in self._frames
+
+    @staticmethod
+    def _to_preview(frame):
+        h, w = frame.shape[:2]
+        if w > PREVIEW_MAX_WIDTH:
+            frame = cv2.resize(frame, (PREVIEW_MAX_WIDTH, round(h * PREVIEW_MAX_WIDTH / w)),
+                               interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    # ---------- 前台读取 ----------
+    def get(self, frame_num):
+        """返回 RGB 预览帧，读取失败返回 None"""
+        frame = self._lookup(frame_num)
+        if frame is not None:
+            return frame
+        if self._cap_proxy != self.proxy_path:
+            self._cap.release()
+            self._cap = cv2.VideoCapture(self.proxy_path)
+            self._cap_proxy = self.proxy_path
+            self._next_pos = 0
+        raw = self._read_frame(self._cap, frame_num, self._next_pos, intra=self._cap_proxy is not None)
+        if raw is None:
+            self._next_pos = -1  # 位置未知，下次强制定位
+            return None
+        self._next_pos = frame_num + 1
+        frame = self._to_preview(raw)
+        self._store(frame_num, frame)
+        return frame
+
+    def set_proxy(self, proxy_path):
+        """改读全帧内代理 (已缓存的原片帧保留)"""
+        self.proxy_path = proxy_path
+
+    def _read_frame(self, cap, frame_num, next_pos, intra=False):
+        """从 cap 读出第 frame_num 帧 (BGR)，next_pos 是 cap 下一次 read() 会得到的帧号 (-1 为未知)；失败返回 None
+
+        intra=True 表示 cap 是全帧内代理：按帧号直接定位，不需要帧索引。
+        """
+        index = self.index
+        if index is None or intra:
+            if frame_num != next_pos:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+            ret, raw = cap.read()
+            return raw if ret else None
+        key = index.keyframe_before(frame_num)
+        if not 0 <= key <= next_pos <= frame_num:
+            # 跨 GOP：按时间戳定位到关键帧，读一帧确认落在哪一帧上；落过头了就换更早的关键帧
+            while True:
+                cap.set(cv2.CAP_PROP_POS_MSEC, index.capture_msec(key))
+                if not cap.grab():
+                    return None
+                msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+                landed = index.frame_at_capture_msec(msec)
+                # 取不到时间戳时 OpenCV 返回 0，同样当作落点不可靠
+                if key == 0 or (msec > 0 and landed <= frame_num):
+                    break
+                key = index.keyframe_before(key - 1)
+            if landed == frame_num:
+                ret, raw = cap.retrieve()
+                return raw if ret else None
+            if landed > frame_num:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+                ret, raw = cap.read()
+                return raw if ret else None
+            next_pos = landed + 1
+        # 同一个 GOP 内：只解码不转换，顺序走到目标帧
+        while next_pos < frame_num:
+            if not cap.grab():
+                return None
+            next_pos += 1
+        ret, raw = cap.read()
+        return raw if ret else None
+
+    # ---------- 后台预取 ----------
+    def prefetch(self, centers):
+        """替换预取目标：按顺序在每个中心帧附近填充缓存，新请求会打断旧请求"""
+        with self._wake:
+            self._wanted = list(centers)
+            self._generation += 1
+            self._wake.notify()
+
+    def _prefetch_loop(self):
+        cap = cv2.VideoCapture(self.video_path)
+        self._prefetch_pos = 0
+        self._prefetch_proxy = None
+        try:
+            index = get_frame_index(self.video_path)
+            if index is not None:
+                self.frame_count = index.frame_count
+                self.index = index
+            while True:
+                with self._wake:
+                    while not self._wanted and not self._closed:
+                        self._wake.wait()
+                    if self._closed:
+                        return
+                    centers, self._wanted = self._wanted, []
+                    generation = self._generation
+                if self._prefetch_proxy != self.proxy_path:
+                    cap.release()
+                    cap = cv2.VideoCapture(self.proxy_path)
+                    self._prefetch_proxy = self.proxy_path
+                    self._prefetch_pos = 0
+                for center in centers:
+                    if not self._fill_window(cap, center, generation):
+                        break
+        finally:
+            cap.release()
+
+    def _fill_window(self, cap, center, generation):
+        """顺序解码 [center-BEFORE, center+AFTER)，被新请求打断时返回 False"""
+        start = max(0, center - PREFETCH_BEFORE)
+        end = min(self.frame_count, center + PREFETCH_AFTER) if self.frame_count else center + PREFETCH_AFTER
+        missing = [n for n in range(start, end) if n not in self]
+        if not missing:
+            return True
+        # 一次定位到第一个缺失帧，之后全部顺序读取
+        for n in range(missing[0], missing[-1] + 1):
+            if self._generation != generation or self._closed:
+                return False
+            raw = self._read_frame(cap, n, self._prefetch_pos, intra=self._prefetch_proxy is not None)
+            if raw is None:
+                self._prefetch_pos = -1
+                break
+            self._prefetch_pos = n + 1
+            if n not in self:
+                self._store(n, self._to_preview(raw))
+        return True
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        self._worker.join(timeout=1.0)
+        self._cap.release()
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+
+# ==================== 12. 切点缩略图图集 ====================
+# 切点一定满足 content_val >= min_content_val，与 threshold / min_len 无关。分析解码时把所有满足
+# 这个条件的帧缩成小图，顺序追加写进磁盘文件；分析结束后按分数缓存的键保存成图集，
+# 列表直接从内存映射的图集里取图，之后打开同一视频也不用再解码。
+# 图集是当前分析分辨率下的帧缩小而来 (ffmpeg_luma 后端为灰度)。
+
+THUMB_CACHE_DIR = os.path.join(CACHE_ROOT, "thumbs")
+THUMB_CACHE_MAX_BYTES = 512 * 1024 * 1024
+THUMB_WIDTH = 80
+
+
+def thumbnail_temp_path(cache_key):
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+    return os.path.join(THUMB_CACHE_DIR, f"{cache_key}.{os.getpid()}.tmp")
+
+
+class ThumbnailWriter:
+    """分析时截取候选切点帧的缩略图 (RGB)，逐张追加写入原始图集文件"""
+
+    def __init__(self, path, min_content_val=ADAPTIVE_MIN_CONTENT_VAL, resume=None):
+        """resume=(frames, shape) 时接着检查点里的图集往后写 (见第 17 节)，文件截断到检查点时的长度"""
+        self.path = path
+        self.min_content_val = min_content_val
+        self.frames = []
+        self.shape = None  # (高, 宽)
+        if resume and resume[1] is not None and os.path.exists(path):
+            frames, shape = resume
+            size = len(frames) * shape[0] * shape[1] * 3
+            if os.path.getsize(path) >= size:
+                self._file = open(path, "r+b")
+                self._file.truncate(size)
+                self._file.seek(size)
+                self.frames = list(frames)
+                self.shape = tuple(shape)
+                return
+        self._file = open(path, "wb")
+
+    def offer(self, frame_num, frame, score):
+        if score < self.min_content_val:
+            return
+        if self.shape is None:
+            h, w = frame.shape[:2]
+            self.shape = (max(1, round(h * THUMB_WIDTH / w)), THUMB_WIDTH)
+        thumb = cv2.resize(frame, (self.shape[1], self.shape[0]), interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_GRAY2RGB if thumb.ndim == 2 else cv2.COLOR_BGR2RGB)
+        self._file.write(thumb.tobytes())
+        self.frames.append(frame_num)
+
+    def append_part(self, part_path, frames, shape):
+        """拼接其它进程写好的分段图集 (必须按帧号顺序调用)"""
+        if not frames:
+            return
+        self.shape = self.shape or shape
+        with open(part_path, "rb") as f:
+            shutil.copyfileobj(f, self._file)
+        self.frames.extend(frames)
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def _thumbnail_paths(cache_key):
+    base = os.path.join(THUMB_CACHE_DIR, cache_key)
+    return base + ".thumbs", base + ".index.npz"
+
+
+def finish_thumbnail_atlas(cache_key, writer, keep=True):
+    """分析完整结束时把临时文件转正为图集，否则丢弃"""
+    writer.close()
+    if not keep or writer.shape is None:
+        os.remove(writer.path)
+        return
+    atlas_path, index_path = _thumbnail_paths(cache_key)
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+    os.replace(writer.path, atlas_path)
+    # 索引最后写入：索引存在即代表图集完整
+    tmp_path = index_path + ".tmp.npz"
+    np.savez(tmp_path, frames=np.asarray(writer.frames, dtype=np.int64), shape=np.asarray(writer.shape))
+    os.replace(tmp_path, index_path)
+    evict_score_cache(THUMB_CACHE_MAX_BYTES, THUMB_CACHE_DIR)
+
+
+class ThumbnailAtlas:
+    """内存映射的缩略图图集，按帧号取图"""
+
+    def __init__(self, atlas_path, frames, shape):
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.shape = tuple(int(x) for x in shape)
+        self._images = np.memmap(atlas_path, dtype=np.uint8, mode="r",
+                                 shape=(len(self.frames),) + self.shape + (3,))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def get(self, frame_num):
+        """返回该帧的 RGB 缩略图；不是候选切点 (例如手动添加的切点) 时返回 None"""
+        i = int(np.searchsorted(self.frames, frame_num))
+        if i < len(self.frames) and self.frames[i] == frame_num:
+            return np.asarray(self._images[i])
+        return None
+
+
+def load_thumbnail_atlas(cache_key):
+    atlas_path, index_path = _thumbnail_paths(cache_key)
+    if not os.path.exists(index_path) or not os.path.exists(atlas_path):
+        return None
+    try:
+        with np.load(index_path) as data:
+            frames = data["frames"]
+            shape = data["shape"]
+        atlas = ThumbnailAtlas(atlas_path, frames, shape)
+    except Exception as e:
+        print(f"[Debug] 缩略图图集损坏，忽略: {e}")
+        return None
+    for path in (atlas_path, index_path):
+        os.utime(path, None)
+    return atlas
+
+
+def open_thumbnail_atlas(video_path, decode_backend="opencv"):
+    """按视频文件找到上次分析留下的图集 (只读文件指纹，不解码)"""
+    return load_thumbnail_atlas(score_cache_key(video_path, backend=decode_backend))
+
+
+# ==================== 13. 切点列表 ====================
+# 界面和导出共用的切点数据结构。帧号放在有序 int64 数组里，按二分查找定位插入 / 删除位置；
+# 勾选状态是与之逐项对齐的布尔位图，增删切点时和帧号一起平移，不需要重新编号下标。
+# 全选、导出区间等批量操作直接在数组上完成。
+
+
+class CutList:
+    """按帧号排序、不含重复的切点列表，附带逐项对齐的勾选位图"""
+
+    def __init__(self, frames=(), selected=True):
+        self._frames = np.unique(np.asarray(frames, dtype=np.int64))
+        self._selected = np.full(len(self._frames), bool(selected))
+
+    @classmethod
+    def from_scenes(cls, scenes, selected=True):
+        """由 find_scenes_optimized 返回的 [(start_frame, end), ...] 构造"""
+        return cls([start for start, _ in scenes], selected)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, frame):
+        i = bisect_left(self._frames, frame)
+        return i < len(self._frames) and self._frames[i] == frame
+
+    @property
+    def frames(self):
+        """只读的帧号数组视图"""
+        view = self._frames.view()
+        view.flags.writeable = False
+        return view
+
+    def frame(self, index):
+        return int(self._frames[index])
+
+    def index_of(self, frame):
+        """帧号对应的下标，不存在时返回 -1"""
+        i = bisect_left(self._frames, frame)
+        return i if i < len(self._frames) and self._frames[i] == frame else -1
+
+    # ---------- 增删 ----------
+    def insert(self, frame, selected=True):
+        """插入一个切点并返回它的下标；已存在时抛出 ValueError"""
+        i = bisect_left(self._frames, frame)
+        if i < len(self._frames) and self._frames[i] == frame:
+            raise ValueError(f"第 {frame} 帧已经是切点")
+        self._frames = np.insert(self._frames, i, frame)
+        self._selected = np.insert(self._selected, i, bool(selected))
+        return i
+
+    def update(self, frames, selected=True):
+        """批量并入切点 (已存在的保留原勾选)，一次归并，不逐个 insert
+
+        返回第一个新切点的下标 (列表从这里开始需要重绘)；没有新切点时返回 len(self)。
+        """
+        new = np.setdiff1d(np.asarray(frames, dtype=np.int64), self._frames)
+        if not len(new):
+            return len(self._frames)
+        positions = np.searchsorted(self._frames, new)
+        self._frames = np.insert(self._frames, positions, new)
+        self._selected = np.insert(self._selected, positions, bool(selected))
+        return int(positions[0])
+
+    def remove(self, index):
+        self._frames = np.delete(self._frames, index)
+        self._selected = np.delete(self._selected, index)
+
+    def replace_range(self, start, end, frames, selected=True):
+        """把开区间 (start, end) 内的切点换成 frames 中落在该区间的帧；区间外的切点和勾选不变
+
+        返回第一个被替换位置的下标 (列表从这里开始需要重绘)。
+        """
+        lo = bisect_right(self._frames, start)
+        hi = bisect_left(self._frames, end)
+        self._frames = np.concatenate([self._frames[:lo], self._frames[hi:]])
+        self._selected = np.concatenate([self._selected[:lo], self._selected[hi:]])
+        new = np.asarray(frames, dtype=np.int64)
+        self.update(new[(new > start) & (new < end)], selected)
+        return lo
+
+    def scene_at(self, frame, total_frames):
+        """包含 frame 的镜头 [start, end)：前一个切点 (或片头) 到下一个切点 (或片尾)"""
+        i = bisect_right(self._frames, frame)
+        start = int(self._frames[i - 1]) if i else 0
+        end = int(self._frames[i]) if i < len(self._frames) else total_frames
+        return start, end
+
+    # ---------- 勾选 ----------
+    def is_selected(self, index):
+        return bool(self._selected[index])
+
+    def set_selected(self, index, value):
+        self._selected[index] = bool(value)
+
+    def select_range(self, first, last, value=True):
+        self._selected[first:last] = bool(value)
+
+    def select_all(self, value=True):
+        self._selected[:] = bool(value)
+
+    def range_selected(self, first, last):
+        """[first, last) 是否全部勾选 (空区间为 True)"""
+        return bool(self._selected[first:last].all())
+
+    def selected_count(self):
+        return int(np.count_nonzero(self._selected))
+
+    # ---------- 导出 ----------
+    def export_ranges(self, total_frames):
+        """勾选的切点到下一个切点 (最后一个到片尾) 的 [(start, end), ...]"""
+        ends = np.append(self._frames[1:], np.int64(total_frames))
+        return list(zip(self._frames[self._selected].tolist(), ends[self._selected].tolist()))
+
+
+# ==================== 14. 局部重新分析 ====================
+# 某个镜头误检 (闪光、打斗快切) 时，只用单独的 threshold / min_len 重新检测这一段，
+# 不整片重跑、不丢手动编辑。有整片分数缓存时直接切片，完全不解码；否则只解码区间两侧各
+# 加 ADAPTIVE_WINDOW_WIDTH 帧的窗口 (adaptive_ratio 需要前后邻居) 外加 1 帧预热。
+
+def rescan_range(video_path, start, end, threshold, min_len, decode_backend="opencv", engine="scenedetect",
+                 use_cache=True, progress_callback=None, stop_event=None):
+    """重新检测 [start, end) 内部的切点，返回新切点帧号列表 (不含 start 本身)；中途停止时返回 None
+
+    start / end 视为已有切点 (或片头 / 片尾)，新切点与两端的距离同样受 min_len 约束，
+    判定规则与整片分析相同。结果用 CutList.replace_range 合并。
+    """
+    window = ADAPTIVE_WINDOW_WIDTH
+    scores = None
+    if use_cache:
+        cached = load_cached_scores(score_cache_key(video_path, backend=decode_backend))
+        if cached is not None and end <= len(cached[0]):
+            scores, _ = cached
+            total_frames = len(scores)
+            lo, hi = max(0, start - window), min(total_frames, end + window)
+            scores = scores[lo:hi]
+            print(f"[Debug] 局部重新分析 {start}-{end}: 使用分数缓存")
+    if scores is None:
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        lo, hi = max(0, start - window), min(total_frames, end + window)
+        print(f"[Debug] 局部重新分析 {start}-{end}: 解码 {lo}-{hi}")
+        scores = score_frame_range(video_path, lo, hi, decode_backend, engine, stop_event, progress_callback)
+        if stop_event and stop_event.is_set():
+            return None
+
+    cuts = cuts_from_scores(scores, threshold, min_len, start_frame=lo, last_cut=start)
+    cuts = [c for c in cuts if start < c < end]
+    if end < total_frames:
+        # end 处的已有切点按同样的规则要求与前一个切点相距 min_len (见 cuts_from_scores)
+        cuts = [c for c in cuts if end + window - c >= min_len]
+    return cuts
+
+
+# ==================== 15. 多检测器融合 ====================
+# AdaptiveDetector 和 ContentDetector 用的是同一个逐帧 content_val，ThresholdDetector 只需要每帧的平均亮度。
+# 所以一次解码同时记下这两个数组 (和分数缓存存在一起)，三个检测器的切点都在数组上重放各自的判定逻辑得到，
+# 与单独跑对应检测器逐帧一致；界面上切换检测器或取并集都不需要再解码。
+
+DETECTOR_DEFAULT_THRESHOLDS = {"adaptive": 3.0, "content": 27.0, "threshold": 12}
+UNION_MERGE_WINDOW = 2  # 并集时，不同检测器对同一次切换的判定相差不超过这么多帧的只保留最早的
+
+
+def content_cuts_from_scores(scores, threshold, min_len, start_frame=0):
+    """重放 ContentDetector (FlashFilter 合并模式) 的判定，返回切点帧号列表"""
+    above = np.asarray(scores, dtype=np.float64) >= threshold
+    if min_len <= 0:
+        return (np.flatnonzero(above) + start_frame).tolist()
+    cuts = []
+    last_above = start_frame
+    merge_enabled = merge_triggered = False
+    merge_start = None
+    for i, is_above in enumerate(above.tolist()):
+        frame_num = start_frame + i
+        min_length_met = frame_num - last_above >= min_len
+        if is_above:
+            last_above = frame_num
+        if merge_triggered:
+            # 合并中：低于阈值的帧攒够 min_len 后，在最后一个高于阈值的帧处切
+            if min_length_met and not is_above and last_above - merge_start >= min_len:
+                merge_triggered = False
+                cuts.append(last_above)
+            continue
+        if not is_above:
+            continue
+        if min_length_met:
+            merge_enabled = True
+            cuts.append(frame_num)
+        elif merge_enabled:
+            merge_triggered = True
+            merge_start = frame_num
+    return cuts
+
+
+def fade_cuts_from_brightness(brightness, threshold=12, min_len=15, fade_bias=0.0, start_frame=0):
+    """重放 ThresholdDetector (FLOOR 模式) 的判定：淡出到黑场再淡入时，在两者之间切一刀"""
+    brightness = np.asarray(brightness, dtype=np.float64)
+    if not len(brightness):
+        return []
+    below = brightness < int(threshold)
+    # 状态只在 "是否低于阈值" 翻转的帧上变化，只需遍历这些帧
+    changes = np.flatnonzero(below[1:] != below[:-1]) + 1
+    cuts = []
+    last_cut = start_frame
+    fade_frame = start_frame
+    for i in changes.tolist():
+        frame_num = start_frame + i
+        if below[i]:
+            fade_frame = frame_num  # 淡出
+            continue
+        if frame_num - last_cut >= min_len:
+            cuts.append(int((frame_num + fade_frame + int(fade_bias * (frame_num - fade_frame))) / 2))
+            last_cut = frame_num
+        fade_frame = frame_num  # 淡入
+    return cuts
+
+
+def union_cuts(cut_lists, merge_window=UNION_MERGE_WINDOW):
+    """多个切点列表的并集，相距不超过 merge_window 帧的切点视为同一次切换"""
+    merged = []
+    for frame in sorted(set().union(*cut_lists)):
+        if not merged or frame - merged[-1] > merge_window:
+            merged.append(frame)
+    return merged
+
+
+class FusedAnalysis:
+    """一次解码得到的逐帧 content_val 和平均亮度；各检测器的切点随时在数组上重算"""
+
+    def __init__(self, scores, brightness, fps, completed=True):
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.brightness = np.asarray(brightness, dtype=np.float64)
+        self.fps = fps
+        self.completed = completed
+
+    def __len__(self):
+        return len(self.scores)
+
+    def detector_scores(self, detector):
+        """各检测器与阈值比较的那个逐帧指标"""
+        if detector == "adaptive":
+            return adaptive_ratios(self.scores)
+        if detector == "content":
+            return self.scores
+        if detector == "threshold":
+            return self.brightness
+        raise ValueError(f"未知的检测器: {detector}")
+
+    def cuts(self, detector, min_len, threshold=None):
+        if threshold is None:
+            threshold = DETECTOR_DEFAULT_THRESHOLDS[detector]
+        if detector == "adaptive":
+            return cuts_from_scores(self.scores, threshold, min_len)
+        if detector == "content":
+            return content_cuts_from_scores(self.scores, threshold, min_len)
+        if detector == "threshold":
+            return fade_cuts_from_brightness(self.brightness, threshold, min_len)
+        raise ValueError(f"未知的检测器: {detector}")
+
+    def all_cuts(self, min_len, thresholds=None):
+        """{检测器: 切点列表}；thresholds 中没给的检测器用默认阈值"""
+        thresholds = thresholds or {}
+        return {name: self.cuts(name, min_len, thresholds.get(name)) for name in FUSED_DETECTORS}
+
+    def union(self, min_len, thresholds=None, detectors=tuple(FUSED_DETECTORS)):
+        all_cuts = self.all_cuts(min_len, thresholds)
+        return union_cuts([all_cuts[name] for name in detectors])
+
+
+def find_scenes_fused(video_path, progress_callback=None, stop_event=None, use_cache=True, workers=1,
+                      decode_backend="opencv", engine="scenedetect", telemetry=None):
+    """一次解码为全部检测器记下逐帧指标，返回 FusedAnalysis (中途停止时 completed 为 False)
+
+    普通分析写入的分数缓存里也带有平均亮度，命中缓存时完全不解码。
+    """
+    print(f"正在融合分析视频: {video_path} ...")
+    telemetry = telemetry or Telemetry()
+    started = time.perf_counter()
+    # 帧索引 (第 18 节) 只解复用，在后台与解码同时建立；已有时只是读一下
+    start_frame_index(video_path)
+    telemetry.event("analysis_start", path=video_path, workers=workers, backend=decode_backend, engine=engine,
+                    fused=True)
+
+    cache_key = score_cache_key(video_path, backend=decode_backend) if use_cache else None
+    if cache_key:
+        cached = load_cached_scores(cache_key)
+        brightness = load_cached_brightness(cache_key)
+        if cached is not None and brightness is not None:
+            scores, fps = cached
+            print(f"[Debug] 命中分数缓存 ({len(scores)} 帧)，直接重算各检测器切点")
+            if progress_callback:
+                progress_callback(1.0)
+            _report_analysis_done(telemetry, started, len(scores), fps, None, cache_hit=True, fused=True)
+            return FusedAnalysis(scores, brightness, fps)
+
+    # 与普通分析共用检查点 (检查点里带有亮度)
+    resumed = load_checkpoint(cache_key) if cache_key else None
+    thumbnails = None
+    if cache_key:
+        thumbnails = ThumbnailWriter(checkpoint_thumbnail_path(cache_key),
+                                     resume=resumed[3:] if resumed is not None else None)
+    brightness = []
+    if resumed is not None:
+        scores, brightness, fps, completed = resume_scores(video_path, cache_key, resumed, workers,
+                                                           progress_callback, stop_event, decode_backend,
+                                                           engine, thumbnails, telemetry)
+        brightness = brightness if brightness is not None else []
+    elif workers and workers > 1:
+        scores, fps, completed = compute_scores_parallel(video_path, workers, progress_callback, stop_event,
+                                                         decode_backend=decode_backend, engine=engine,
+                                                         thumbnails=thumbnails, telemetry=telemetry,
+                                                         brightness=brightness)
+    else:
+        with telemetry.stage("open", backend=decode_backend):
+            original_video = open_analysis_video(video_path, decode_backend)
+        with telemetry.stage("count_frames"):
+            video = InterruptibleVideo(original_video, video_path, stop_event, progress_callback,
+                                       telemetry=telemetry)
+        fps = video.frame_rate
+        checkpoint = AnalysisCheckpoint(cache_key, fps, thumbnails=thumbnails) if cache_key else None
+        with telemetry.stage("decode_detect", engine=engine, fused=True):
+            scores = score_video_stream(video, engine, decode_backend, thumbnails=thumbnails, brightness=brightness,
+                                        checkpoint=checkpoint)
+        completed = not (stop_event and stop_event.is_set())
+    print("\n[Debug] 融合分析结束")
+
+    if cache_key:
+        finish_checkpointed_analysis(cache_key, scores, brightness, fps, completed, thumbnails)
+    _report_analysis_done(telemetry, started, len(scores), fps, None, completed=completed, fused=True)
+    return FusedAnalysis(scores, brightness, fps, completed)
+
+
+# ==================== 16. 两阶段粗细检测 ====================
+# 长片源里绝大部分帧都在镜头内部，逐帧精算的分数几乎都是 0 附近。第一阶段让 ffmpeg 每
+# COARSE_STEP 帧只输出一张 COARSE_WIDTH 宽的小图 (其余帧在缩放 / 格式转换之前就丢掉)，
+# 相邻两张采样图的差值过了 COARSE_THRESHOLD 才说明中间可能有切换；第二阶段只对这些候选
+# 区间 (两侧各加 adaptive_ratio 需要的邻居) 逐帧精算，其余帧的分数记为 0。
+# 候选帧只在候选区间内判定，区间内每帧的前后邻居都是精确分数，所以只要真实切点都落在
+# 候选区间里，结果与逐帧分析逐帧一致。注意：帧间预测决定了编码器仍要解出每一帧，
+# 省下的是缩放、格式转换、管道传输和逐帧打分。
+
+COARSE_STEP = 6
+COARSE_WIDTH = 128
+# 采样图之间的 HSV 平均差。要低于 ADAPTIVE_MIN_CONTENT_VAL 留足余量：
+# 采样图更小、相隔几帧的运动也会叠加进来，宁可多精算几段也不能漏切点
+COARSE_THRESHOLD = 8.0
+COARSE_MERGE_GAP = 48  # 两段候选区间相隔不到这么多帧就合并，少开几次解码器
+
+
+def coarse_candidate_ranges(video_path, step=COARSE_STEP, threshold=COARSE_THRESHOLD, stop_event=None,
+                            progress_callback=None):
+    """第一阶段：跳帧粗扫，返回 (候选区间 [(lo, hi), ...], 总帧数, fps, 采样帧数)
+
+    区间为半开区间，其中的帧都可能是切点。片尾最后一个采样之后的帧总是算作候选。
+    """
+    video = FFmpegPipeVideo(video_path, width=COARSE_WIDTH, frame_step=step)
+    total_frames = max(1, video.frame_count)
+    samples = []
+    diffs = []
+    prev = None
+    last_report = time.perf_counter()
+    try:
+        while not (stop_event and stop_event.is_set()):
+            frame = video.read()
+            if frame is False:
+                break
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+            if prev is not None:
+                # 与 ContentDetector 默认权重相同：H / S / V 三通道平均差再取平均
+                diffs.append(float(np.mean(cv2.absdiff(hsv, prev))))
+            prev = hsv
+            samples.append(video.frame_number - step)
+            now = time.perf_counter()
+            if progress_callback and now - last_report >= PROGRESS_CALLBACK_INTERVAL:
+                last_report = now
+                progress_callback(min(samples[-1] / total_frames, 1.0))
+    finally:
+        video.release()
+
+    # 容器帧数不准时以实际读到的为准
+    total_frames = max(total_frames, samples[-1] + 1) if samples else total_frames
+    ranges = [(samples[i] + 1, samples[i + 1] + 1) for i, d in enumerate(diffs) if d >= threshold]
+    if samples and samples[-1] + 1 < total_frames:
+        ranges.append((samples[-1] + 1, total_frames))
+
+    merged = []
+    for lo, hi in ranges:
+        if merged and lo - merged[-1][1] < COARSE_MERGE_GAP:
+            merged[-1] = (merged[-1][0], hi)
+        else:
+            merged.append((lo, hi))
+    return merged, total_frames, video.frame_rate, len(samples)
+
+
+def find_scenes_two_stage(video_path, threshold, min_len, progress_callback=None, stop_event=None,
+                          decode_backend="opencv", engine="scenedetect", step=COARSE_STEP, thumbnails=None,
+                          telemetry=None):
+    """两阶段检测，返回 (scenes, fps, completed, stats)，scenes 格式与 find_scenes_optimized 相同
+
+    stats 记录粗扫采样帧数、精算帧数和候选区间数，用来核对省下了多少逐帧打分。
+    """
+    telemetry = telemetry or Telemetry()
+    window = ADAPTIVE_WINDOW_WIDTH
+
+    def coarse_progress(p):
+        if progress_callback:
+            progress_callback(0.5 * p)
+
+    with telemetry.stage("coarse_scan", step=step):
+        cores, total_frames, fps, sampled = coarse_candidate_ranges(video_path, step, stop_event=stop_event,
+                                                                    progress_callback=coarse_progress)
+
+    scores = np.zeros(total_frames, dtype=np.float64)
+    candidate_mask = np.zeros(total_frames, dtype=bool)
+    windows = [(max(0, lo - window), min(total_frames, hi + window)) for lo, hi in cores]
+    window_frames = max(1, sum(hi - lo for lo, hi in windows))
+    done = 0
+    with telemetry.stage("refine", windows=len(windows)):
+        for (lo, hi), (core_lo, core_hi) in zip(windows, cores):
+            if stop_event and stop_event.is_set():
+                break
+
+            def refine_progress(p, base=done, length=hi - lo):
+                if progress_callback:
+                    progress_callback(0.5 + 0.5 * min(base + p * length, window_frames) / window_frames)
+
+            window_scores = score_frame_range(video_path, lo, hi, decode_backend, engine, stop_event,
+                                              refine_progress, thumbnails=thumbnails)
+            window_scores = window_scores[:total_frames - lo]
+            scores[lo:lo + len(window_scores)] = window_scores
+            candidate_mask[core_lo:core_hi] = True
+            done += hi - lo
+            telemetry.progress("refine", done, window_frames)
+
+    completed = not (stop_event and stop_event.is_set())
+    cuts = cuts_from_scores(scores, threshold, min_len, candidate_mask=candidate_mask)
+    bounds = cuts + [total_frames]
+    scenes = [(bounds[i], FrameTimecode(bounds[i + 1], fps)) for i in range(len(cuts))]
+    stats = {"coarse_frames": sampled, "refined_frames": done, "windows": len(windows),
+             "total_frames": total_frames}
+    print(f"[Debug] 两阶段检测: 粗扫 {sampled} 帧，精算 {done}/{total_frames} 帧 "
+          f"({100.0 * done / max(1, total_frames):.1f}%)，{len(windows)} 个候选区间")
+    return scenes, fps, completed, stats
+
+
+# ==================== 17. 断点续跑 ====================
+# 两小时的电影在共享机器上分析，中途停止、崩溃或关掉程序后不必从第 0 帧重来。
+# 切点完全由逐帧分数决定 (见 cuts_from_scores)，AdaptiveDetector 的滑动窗口状态也只是
+# 最近几帧的分数，所以检查点只需保存已算出的分数 / 亮度前缀和缩略图图集的进度；续跑时
+# 从检查点位置 (外加 1 帧预热) 接着解码，拼接后的分数与一次跑完逐位一致。
+# 检查点按分数缓存键保存：换了 threshold / min_len 也能续跑，换了解码后端则不能。
+
+CHECKPOINT_DIR = os.path.join(CACHE_ROOT, "checkpoints")
+CHECKPOINT_MAX_BYTES = 256 * 1024 * 1024
+CHECKPOINT_INTERVAL = 10.0  # 秒，两次写检查点的最小间隔
+
+
+def _checkpoint_paths(cache_key):
+    base = os.path.join(CHECKPOINT_DIR, cache_key)
+    return base + ".npz", base + ".thumbs"
+
+
+def checkpoint_thumbnail_path(cache_key):
+    """开启检查点时缩略图写在这里 (不带进程号)，续跑的进程才能接着写"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    return _checkpoint_paths(cache_key)[1]
+
+
+def load_checkpoint(cache_key):
+    """返回 (scores, brightness, fps, thumb_frames, thumb_shape)；没有检查点或已损坏时返回 None"""
+    path = _checkpoint_paths(cache_key)[0]
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if int(data["version"]) != SCORE_CACHE_VERSION:
+                return None
+            scores = data["scores"]
+            brightness = data["brightness"] if "brightness" in data.files else None
+            fps = float(data["fps"])
+            thumb_frames = data["thumb_frames"].tolist()
+            thumb_shape = tuple(data["thumb_shape"].tolist()) if "thumb_shape" in data.files else None
+    except Exception as e:
+        print(f"[Debug] 检查点损坏，忽略: {e}")
+        return None
+    if len(scores) == 0:
+        return None
+    return scores, brightness, fps, thumb_frames, thumb_shape
+
+
+def save_checkpoint(cache_key, scores, brightness, fps, thumbnails=None):
+    if len(scores) == 0:
+        return
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = _checkpoint_paths(cache_key)[0]
+    arrays = {"version": SCORE_CACHE_VERSION, "scores": np.asarray(scores, dtype=np.float64), "fps": float(fps),
+              "thumb_frames": np.asarray([], dtype=np.int64)}
+    if brightness is not None and len(brightness) == len(scores):
+        arrays["brightness"] = np.asarray(brightness, dtype=np.float64)
+    if thumbnails is not None and thumbnails.shape is not None:
+        # 先把图集写到磁盘，索引再指向它
+        thumbnails.flush()
+        arrays["thumb_frames"] = np.asarray(thumbnails.frames, dtype=np.int64)
+        arrays["thumb_shape"] = np.asarray(thumbnails.shape)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    evict_score_cache(CHECKPOINT_MAX_BYTES, CHECKPOINT_DIR)
+
+
+def clear_checkpoint(cache_key):
+    """分析完整结束后删除检查点 (缩略图文件此时已被 finish_thumbnail_atlas 转正)"""
+    for path in _checkpoint_paths(cache_key):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class AnalysisCheckpoint:
+    """分析循环里定期调用 update：距上次保存超过 interval 秒才真正写盘
+
+    base_scores / base_brightness 是续跑前已有的前缀，update 传入的是本次新算出的部分。
+    """
+
+    def __init__(self, cache_key, fps, base_scores=(), base_brightness=(), thumbnails=None,
+                 interval=CHECKPOINT_INTERVAL):
+        self.cache_key = cache_key
+        self.fps = fps
+        self.base_scores = list(base_scores)
+        self.base_brightness = list(base_brightness) if base_brightness is not None else []
+        self.thumbnails = thumbnails
+        self.interval = interval
+        self._last_save = time.perf_counter()
+
+    def update(self, scores, brightness, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_save < self.interval:
+            return
+        self._last_save = now
+        save_checkpoint(self.cache_key, self.base_scores + list(scores), self.base_brightness + list(brightness),
+                        self.fps, self.thumbnails)
+
+
+def resume_scores(video_path, cache_key, resumed, workers=1, progress_callback=None, stop_event=None,
+                  decode_backend="opencv", engine="scenedetect", thumbnails=None, telemetry=None):
+    """从检查点位置接着算到片尾，返回 (scores, brightness, fps, completed)，均包含检查点里的前缀"""
+    base_scores, base_brightness, fps = resumed[:3]
+    start = len(base_scores)
+    cap = cv2.VideoCapture(video_path)
+    total_frames = max(start + 1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+    cap.release()
+    print(f"[Debug] 从检查点续跑: 已完成 {start}/{total_frames} 帧")
+
+    def resume_progress(p):
+        if progress_callback:
+            progress_callback(min((start + p * (total_frames - start)) / total_frames, 1.0))
+
+    brightness = []
+    if workers and workers > 1:
+        scores, _, completed = compute_scores_parallel(video_path, workers, resume_progress, stop_event,
+                                                       decode_backend=decode_backend, engine=engine,
+                                                       thumbnails=thumbnails, telemetry=telemetry,
+                                                       brightness=brightness, start_frame=start)
+    else:
+        checkpoint = AnalysisCheckpoint(cache_key, fps, base_scores, base_brightness, thumbnails)
+        with telemetry.stage("decode_detect", engine=engine, resumed_from=start):
+            scores = score_frame_range(video_path, start, total_frames, decode_backend, engine, stop_event,
+                                       resume_progress, thumbnails=thumbnails, read_to_end=True,
+                                       brightness=brightness, checkpoint=checkpoint)
+        completed = not (stop_event and stop_event.is_set())
+
+    scores = list(base_scores) + list(scores)
+    # 旧的检查点没有亮度时，拼出来的亮度对不齐，直接不要
+    if base_brightness is not None and len(base_brightness) == start:
+        brightness = list(base_brightness) + brightness
+    else:
+        brightness = None
+    return scores, brightness, fps, completed
+
+
+def finish_checkpointed_analysis(cache_key, scores, brightness, fps, completed, thumbnails):
+    """分析结束 (或中途停止) 时的收尾：完整跑完写分数缓存、转正图集、删检查点；
+    停止时写最后一次检查点，缩略图文件留给续跑"""
+    if completed:
+        finish_thumbnail_atlas(cache_key, thumbnails, keep=True)
+        save_cached_scores(cache_key, scores, fps, brightness)
+        clear_checkpoint(cache_key)
+    else:
+        save_checkpoint(cache_key, scores, brightness, fps, thumbnails)
+        thumbnails.close()
+        print(f"[Debug] 已保存检查点: {len(scores)} 帧，下次分析同一文件时从这里继续")
+
+
+# ==================== 18. 帧时间戳索引 ====================
+# 到处按 帧号 / fps 换算时间：可变帧率 (VFR) 片源越往后偏得越多，导出的 -ss / -t 和预览定位都跟着偏；
+# OpenCV 按帧号定位时还要自己往回退、反复试探。这里给每个视频建一次索引：每帧的显示时间戳 (PTS)
+# 和关键帧帧号，存成紧凑的二进制旁路文件。只解复用、不解码 (ffmpeg -c copy -f framecrc)，
+# 整集只要零点几秒，分析开始时在后台线程里与解码同时建立，之后预览和导出直接读取。
+
+FRAME_INDEX_DIR = os.path.join(CACHE_ROOT, "index")
+FRAME_INDEX_MAX_BYTES = 64 * 1024 * 1024
+FRAME_INDEX_VERSION = 1
+_AV_NOPTS_VALUE = -(1 << 63)
+_AV_PKT_FLAG_KEY = 0x1
+_AV_PKT_FLAG_DISCARD = 0x4  # 编辑列表裁掉的包，解码后不输出
+_FRAMECRC_LINE = re.compile(r"^0,\s*(-?\d+),\s*(-?\d+),\s*\d+,\s*(\d+),\s*0x[0-9a-fA-F]+(?:,\s*F=0x([0-9a-fA-F]+))?")
+_frame_index_lock = threading.Lock()
+
+
+class FrameIndex:
+    """每帧的显示时间 (秒，相对文件起点，与 ffmpeg -ss 的时间轴一致) 和关键帧帧号 (均按显示顺序)"""
+
+    def __init__(self, times, keyframes, codec="unknown", pts=None, time_base=None):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)
+        self.codec = codec
+        # 原始整数时间戳只用于保存 (按流时间基存储，不丢精度)
+        self._pts = pts
+        self._time_base = time_base
+        diffs = np.diff(self.times)
+        self.frame_duration = float(np.median(diffs)) if len(diffs) else 1.0 / 24.0
+
+    @classmethod
+    def constant_rate(cls, fps, frame_count=1, keyframes=(0,)):
+        """没有索引时的退路：按固定帧率推算 (与以前的 帧号 / fps 相同)"""
+        index = cls(np.arange(max(1, frame_count)) / fps, keyframes)
+        index.frame_duration = 1.0 / fps
+        return index
+
+    @property
+    def frame_count(self):
+        return len(self.times)
+
+    def time_of(self, frame):
+        """第 frame 帧的显示时间；超出末尾时按帧间隔外推 (frame_count 即最后一帧结束的时间)"""
+        frame = max(0, int(frame))
+        if frame < len(self.times):
+            return float(self.times[frame])
+        return float(self.times[-1] + (frame - len(self.times) + 1) * self.frame_duration)
+
+    def seek_time(self, frame):
+        """给 ffmpeg -ss / -t 用的时间点：第 frame 帧与前一帧之间的中点，浮点误差不会多取或漏掉一帧"""
+        if frame <= 0:
+            return max(0.0, self.time_of(0) - self.frame_duration / 2)
+        return (self.time_of(frame - 1) + self.time_of(frame)) / 2
+
+    def frame_at(self, seconds):
+        """显示时间落在 seconds 上 (或之前最近) 的帧号"""
+        return max(0, int(np.searchsorted(self.times, seconds + 1e-6, side="right")) - 1)
+
+    def keyframe_before(self, frame):
+        """frame 之前 (含) 最近的关键帧帧号"""
+        i = int(np.searchsorted(self.keyframes, frame, side="right")) - 1
+        return int(self.keyframes[i]) if i >= 0 else 0
+
+    # OpenCV 的 CAP_PROP_POS_MSEC 相对视频流自己的起点，不是文件起点
+    def capture_msec(self, frame):
+        return (self.time_of(frame) - self.time_of(0)) * 1000.0
+
+    def frame_at_capture_msec(self, msec):
+        return self.frame_at(msec / 1000.0 + self.time_of(0))
+
+
+def frame_index_key(video_path):
+    h = hashlib.sha1()
+    h.update(video_file_signature(video_path).encode())
+    h.update(f"index-v{FRAME_INDEX_VERSION}".encode())
+    return h.hexdigest()
+
+
+def build_frame_index(video_path):
+    """解复用一遍视频流，返回 FrameIndex；ffmpeg 读不出时间戳时返回 None
+
+    framecrc 按解码顺序每包一行 (dts, pts, 时长, 大小, 校验和, 非关键帧时带 F=标志)，
+    表头里有流的时间基和编码名。按 pts 排序即显示顺序，第 n 个就是第 n 帧。
+    """
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-i", video_path,
+           "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace")
+    time_base = None
+    codec = "unknown"
+    pts, keys = [], []
+    for line in result.stdout.splitlines():
+        if line.startswith("#"):
+            if line.startswith("#tb 0:"):
+                num, den = line.split(":", 1)[1].strip().split("/")
+                time_base = (int(num), int(den))
+            elif line.startswith("#codec_id 0:"):
+                codec = line.split(":", 1)[1].strip()
+            continue
+        m = _FRAMECRC_LINE.match(line)
+        if not m:
+            continue
+        dts, pkt_pts, size, flags = int(m.group(1)), int(m.group(2)), int(m.group(3)), m.group(4)
+        flags = int(flags, 16) if flags is not None else _AV_PKT_FLAG_KEY
+        if size == 0 or flags & _AV_PKT_FLAG_DISCARD:
+            continue
+        # 没有 pts 的容器 (部分 AVI) 按 dts 排
+        pts.append(pkt_pts if pkt_pts != _AV_NOPTS_VALUE else dts)
+        keys.append(bool(flags & _AV_PKT_FLAG_KEY))
+    if time_base is None or not pts:
+        print(f"[Debug] 无法建立帧索引: {result.stderr.strip()[-FFMPEG_ERROR_TAIL:]}")
+        return None
+    pts = np.asarray(pts, dtype=np.int64)
+    order = np.argsort(pts, kind="stable")
+    pts = pts[order]
+    keyframes = np.flatnonzero(np.asarray(keys, dtype=bool)[order])
+    times = pts * (time_base[0] / time_base[1])
+    return FrameIndex(times, keyframes, codec, pts=pts, time_base=time_base)
+
+
+def load_frame_index(video_path):
+    """读取已建好的索引，没有或损坏时返回 None (不建立)"""
+    path = os.path.join(FRAME_INDEX_DIR, frame_index_key(video_path) + ".npz")
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            pts = data["pts"]
+            num, den = (int(v) for v in data["time_base"])
+            index = FrameIndex(pts * (num / den), data["keyframes"], str(data["codec"]), pts=pts,
+                               time_base=(num, den))
+    except Exception as e:
+        print(f"[Debug] 帧索引损坏，忽略: {e}")
+        return None
+    os.utime(path, None)
+    return index
+
+
+def save_frame_index(video_path, index):
+    os.makedirs(FRAME_INDEX_DIR, exist_ok=True)
+    path = os.path.join(FRAME_INDEX_DIR, frame_index_key(video_path) + ".npz")
+    tmp_path = path + ".tmp.npz"
+    # 时间戳按流时间基的整数保存；相邻帧差值规律，压缩后每帧不到一个字节
+    np.savez_compressed(tmp_path, pts=index._pts, time_base=np.asarray(index._time_base, dtype=np.int64),
+                        keyframes=index.keyframes.astype(np.int32), codec=index.codec)
+    os.replace(tmp_path, path)
+    evict_score_cache(FRAME_INDEX_MAX_BYTES, FRAME_INDEX_DIR)
+
+
+def get_frame_index(video_path):
+    """读取索引，没有时现场建立并保存；失败返回 None (调用方退回按 fps 推算)"""
+    with _frame_index_lock:
+        index = load_frame_index(video_path)
+        if index is not None:
+            return index
+        try:
+            index = build_frame_index(video_path)
+            if index is not None:
+                save_frame_index(video_path, index)
+                print(f"[Debug] 已建立帧索引: {index.frame_count} 帧 / {len(index.keyframes)} 个关键帧")
+        except Exception as e:
+            print(f"[Debug] 建立帧索引失败: {e}")
+            index = None
+        return index
+
+
+def start_frame_index(video_path):
+    """在后台线程里建立索引 (已有时只是读一下)，分析开始时调用，与解码同时进行"""
+    thread = threading.Thread(target=get_frame_index, args=(video_path,), daemon=True)
+    thread.start()
+    return thread
+
+
+# ==================== 19. 分数概览金字塔 ====================
+# 预览区下方的时间轴画出整片的逐帧自适应分数。20 万帧的电影不能每次重绘都扫一遍全部分数：
+# 预先逐级两两合并出每一级的 (最小值, 最大值)，重绘时挑每像素约含一个桶的那一级，
+# 只在这一级上按屏幕列归并，任何缩放下的开销都只和屏幕宽度成正比。
+
+
+class ScorePyramid:
+    """逐帧分数的 min/max 降采样金字塔；第 k 级的每个桶覆盖 2**k 帧"""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float32)
+        self.frame_count = len(values)
+        self.levels = [(values, values)]
+        mins, maxs = values, values
+        while len(mins) > 1:
+            if len(mins) % 2:
+                # 奇数个桶：最后一个桶单独成对，不影响 min / max
+                mins = np.append(mins, mins[-1])
+                maxs = np.append(maxs, maxs[-1])
+            mins = np.minimum(mins[0::2], mins[1::2])
+            maxs = np.maximum(maxs[0::2], maxs[1::2])
+            self.levels.append((mins, maxs))
+
+    def __len__(self):
+        return self.frame_count
+
+    def envelope(self, start, end, width):
+        """[start, end) 帧按 width 列归并，返回每列的 (最小值, 最大值) 数组
+
+        放大到每列不足一帧时返回逐帧的值 (列数 = end - start)，由调用方按比例摊开。
+        """
+        start = max(0, int(start))
+        end = min(self.frame_count, int(end))
+        if end <= start or width <= 0:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty
+        span = end - start
+        if span <= width:
+            values = self.levels[0][0][start:end]
+            return values, values
+        # 每列覆盖 span / width 帧，取桶不超过一列的最高一级
+        level = min(int(np.log2(span / width)), len(self.levels) - 1)
+        mins, maxs = self.levels[level]
+        bounds = start + np.arange(width + 1) * span // width
+        first = bounds[:-1] >> level
+        last = (bounds[1:] - 1) >> level
+        # reduceat 到下一列的首桶为止；本列的末桶可能跨到下一列，再单独并进来，保证整列的帧都被覆盖
+        col_min = np.minimum(np.minimum.reduceat(mins[:last[-1] + 1], first), mins[last])
+        col_max = np.maximum(np.maximum.reduceat(maxs[:last[-1] + 1], first), maxs[last])
+        return col_min, col_max
+
+
+def _full_scores(video_path, decode_backend="opencv", fused=None):
+    """整片的逐帧 content_val：优先用内存里的融合结果，否则读分数缓存；都没有时返回 None"""
+    if fused is not None:
+        scores = fused.scores
+    else:
+        cached = load_cached_scores(score_cache_key(video_path, backend=decode_backend))
+        if cached is None:
+            return None
+        scores = cached[0]
+    return scores if len(scores) else None
+
+
+def open_score_overview(video_path, decode_backend="opencv", fused=None):
+    """时间轴用的自适应分数金字塔；没有完整分数时返回 None"""
+    scores = _full_scores(video_path, decode_backend, fused)
+    if scores is None:
+        return None
+    return ScorePyramid(adaptive_ratios(scores))
+
+
+# ==================== 20. 灵敏度 / 最小镜头扫描 ====================
+# 拖动滑块时想知道这组参数会切出多少个镜头，不能每次都重放一遍 cuts_from_scores。
+# 分析结束后在整片分数上一次算出滑块所有取值组合的切点数，拖动时只是查表。
+# min_len 的贪心判定本身是串行的 (每个切点取决于上一个)：对每个灵敏度，先把 "接受这个候选后
+# 下一个能接受的候选" 对所有 min_len 一起用 searchsorted 算出来，再用指针倍增 (list ranking)
+# 在 log(候选数) 轮向量运算里数出每条链的长度，结果与 cuts_from_scores 逐个一致。
+
+
+class CutCountSweep:
+    """counts[i, j] 是 thresholds[i] / min_lens[j] 下的切点数"""
+
+    def __init__(self, thresholds, min_lens, counts):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.min_lens = np.asarray(min_lens, dtype=np.int64)
+        self.counts = counts
+
+    def _nearest(self, axis, value):
+        return int(np.abs(axis - value).argmin())
+
+    def count(self, threshold, min_len):
+        return int(self.counts[self._nearest(self.thresholds, threshold), self._nearest(self.min_lens, min_len)])
+
+    def counts_for_min_len(self, min_len):
+        """固定 min_len 时各灵敏度下的切点数 (滑块旁的小直方图)"""
+        return self.counts[:, self._nearest(self.min_lens, min_len)]
+
+
+def sweep_cut_counts(scores, thresholds, min_lens, window_width=ADAPTIVE_WINDOW_WIDTH,
+                     min_content_val=ADAPTIVE_MIN_CONTENT_VAL):
+    """整片分数上每组 (threshold, min_len) 的切点数，返回 CutCountSweep"""
+    scores = np.asarray(scores, dtype=np.float64)
+    ratios = adaptive_ratios(scores, window_width, min_content_val)
+    ratios[scores < min_content_val] = -1.0  # 分数太低的帧在任何灵敏度下都不是候选
+    min_lens = np.asarray(min_lens, dtype=np.int64)
+    m = len(min_lens)
+    # 接受候选 c 之后，下一个候选要满足 target >= c + min_len - window_width (至少是下一帧)
+    gaps = np.maximum(min_lens - window_width, 1)[:, None]
+    firsts = np.maximum(min_lens - window_width, 0)
+    counts = np.zeros((len(thresholds), m), dtype=np.int64)
+    for i, threshold in enumerate(thresholds):
+        candidates = np.flatnonzero(ratios >= threshold)
+        k = len(candidates)
+        if k == 0:
+            continue
+        # 每个 min_len 一行，行内第 c 个元素指向接受第 c 个候选后下一个被接受的候选，第 k 个是链尾哨兵；
+        # 展平成一维，指针用全局下标，倍增时直接 take
+        row_starts = np.arange(m) * (k + 1)
+        ptr = np.empty((m, k + 1), dtype=np.int64)
+        ptr[:, :k] = np.searchsorted(candidates, candidates[None, :] + gaps)
+        ptr[:, k] = k
+        ptr = (ptr + row_starts[:, None]).ravel()
+        rank = np.ones((m, k + 1), dtype=np.int32)
+        rank[:, k] = 0
+        rank = rank.ravel()
+        # 链长不超过候选数，也不超过 跨度 / 最小间隔；倍增这么多轮后所有指针都到了哨兵
+        longest = min(k, int(candidates[-1] - candidates[0]) // int(gaps.min()) + 1)
+        for _ in range(longest.bit_length()):
+            rank = rank + rank.take(ptr)
+            ptr = ptr.take(ptr)
+        counts[i] = rank[row_starts + np.searchsorted(candidates, firsts)]
+    return CutCountSweep(thresholds, min_lens, counts)
+
+
+def open_cut_count_sweep(video_path, thresholds, min_lens, decode_backend="opencv", fused=None):
+    """滑块用的切点数表；没有完整分数时返回 None"""
+    scores = _full_scores(video_path, decode_backend, fused)
+    if scores is None:
+        return None
+    return sweep_cut_counts(scores, thresholds, min_lens)
+
+
+# ==================== 21. 片头片尾指纹库 ====================
+# 同一季每集都有相同的片头 (OP)、片尾 (ED) 和眼罩画面，每集都从头分析、导出一遍。
+# 这里给每集存一份紧凑的指纹：每个关键帧缩成 9x8 灰度图算 64 位 dHash (只解码关键帧，
+# -skip_frame nokey，整集几秒)，连同这集最终的切点列表放进库里。x264 在镜头切换处放关键帧，
+# 同一段画面在不同集里的关键帧指纹相同、相对位置相同。分析新一集时先算它的关键帧指纹，
+# 按 16 位分段的倒排索引找出汉明距离足够近的库中关键帧，再按 "新帧号 - 库帧号" 的偏移聚类：
+# 同一偏移下连续命中足够多、跨度足够长的就是重复片段。片段内直接沿用库里那一集的切点
+# (按偏移平移)，只解码分析片段之间的部分；片段内的切点还可以取消勾选，不再导出。
+# 切点取决于灵敏度 / 最小长度 / 解码后端 / 检测引擎，库里每集按这组设置分别存放，只沿用设置完全相同的切点。
+
+SEGMENT_LIBRARY_DIR = os.path.join(CACHE_ROOT, "library")
+SEGMENT_LIBRARY_MAX_BYTES = 32 * 1024 * 1024
+FINGERPRINT_SIZE = (9, 8)  # dHash 缩略图 (宽, 高)：每行 8 个相邻像素比较，共 64 位
+FINGERPRINT_FLAT_STD = 3.0  # 缩略图灰度标准差低于此值 (黑场 / 纯色) 不参与匹配
+FINGERPRINT_MAX_HAMMING = 6
+SEGMENT_OFFSET_TOLERANCE = 2  # 同一片段内各命中的偏移允许相差的帧数
+SEGMENT_MIN_MATCHES = 5
+SEGMENT_MIN_SECONDS = 20.0
+SEGMENT_MAX_GAP_SECONDS = 20.0  # 同一片段内相邻两次命中的最大间隔
+
+
+def keyframe_fingerprints(video_path, index):
+    """只解码关键帧，返回 (指纹 uint64 数组, 是否可用于匹配的布尔数组)，与 index.keyframes 逐个对应
+
+    解码出的关键帧数与索引对不上时 (索引里的关键帧标志和解码器不一致) 返回 None。
+    """
+    w, h = FINGERPRINT_SIZE
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-skip_frame", "nokey", "-i", video_path,
+           "-map", "0:v:0", "-an", "-sn", "-vf", f"scale={w}:{h}:flags=area,format=gray",
+           "-vsync", "passthrough", "-f", "rawvideo", "-"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    pixels = np.frombuffer(result.stdout, dtype=np.uint8)
+    if len(pixels) % (w * h) or len(pixels) // (w * h) != len(index.keyframes):
+        print(f"[Debug] 关键帧指纹数与帧索引不一致 ({len(pixels) // (w * h)} / {len(index.keyframes)})，不使用指纹库")
+        return None
+    pixels = pixels.reshape(-1, h, w).astype(np.int16)
+    bits = (pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(len(pixels), 64)
+    fingerprints = np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+    valid = pixels.reshape(len(pixels), -1).std(axis=1) >= FINGERPRINT_FLAT_STD
+    return fingerprints, valid
+
+
+def library_settings(threshold, min_len, decode_backend, engine):
+    """产生切点的那组设置；指纹库只在设置完全相同时沿用切点"""
+    return f"th={float(threshold):g}|min={int(min_len)}|{decode_backend}|{engine}"
+
+
+def _hamming(a, b):
+    return bin(int(a) ^ int(b)).count("1")
+
+
+class RecurringSegment:
+    """新一集里与库中某集相同的片段 [start, end]，cuts 是沿用过来的切点 (已换算成本集帧号)"""
+
+    def __init__(self, start, end, source, offset, cuts, matches):
+        self.start = start
+        self.end = end
+        self.source = source  # 库中那一集的文件名
+        self.offset = offset  # 本集帧号 - 库中那一集的帧号
+        self.cuts = cuts
+        self.matches = matches
+
+    def __repr__(self):
+        return f"RecurringSegment({self.start}-{self.end}, {self.source}, {len(self.cuts)} 个切点)"
+
+
+class FingerprintLibrary:
+    """已分析各集的关键帧指纹和切点，带 16 位分段的倒排索引 (任一段相同即为候选，再核对汉明距离)"""
+
+    def __init__(self, directory=SEGMENT_LIBRARY_DIR):
+        self.directory = directory
+        self.episodes = []  # [(视频 key, 文件名, 关键帧帧号, 指纹, 切点, 设置)]
+        self._index = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".npz"):
+                    self._load(os.path.join(directory, name))
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def _load(self, path):
+        try:
+            with np.load(path) as data:
+                # 旧版库文件没有记录设置，切点来历不明，不参与匹配
+                settings = str(data["settings"]) if "settings" in data.files else None
+                episode = (os.path.basename(path)[:-4].split("_")[0], str(data["name"]), data["keyframes"],
+                           data["fingerprints"], data["cuts"], data["valid"], settings)
+        except Exception as e:
+            print(f"[Debug] 指纹库文件损坏，忽略: {e}")
+            return
+        self._add(*episode)
+
+    def _add(self, key, name, keyframes, fingerprints, cuts, valid, settings):
+        number = len(self.episodes)
+        self.episodes.append((key, name, np.asarray(keyframes, dtype=np.int64),
+                              np.asarray(fingerprints, dtype=np.uint64), np.asarray(cuts, dtype=np.int64),
+                              settings))
+        for i in np.flatnonzero(valid).tolist():
+            fp = int(fingerprints[i])
+            for band in range(4):
+                self._index.setdefault((band, (fp >> (16 * band)) & 0xFFFF), []).append((number, i))
+
+    def add_episode(self, video_path, keyframes, fingerprints, valid, cuts, settings):
+        """把一集的关键帧指纹和最终切点存进库，settings 为 library_settings() (同一文件同一设置重复分析时覆盖)"""
+        key = frame_index_key(video_path)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{key}_{hashlib.sha1(settings.encode()).hexdigest()[:12]}.npz")
+        # 批量模式下各进程同时写库，临时文件按进程区分
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, name=os.path.basename(video_path), keyframes=np.asarray(keyframes, np.int32),
+                            fingerprints=np.asarray(fingerprints, np.uint64), valid=np.asarray(valid, bool),
+                            cuts=np.asarray(cuts, np.int32), settings=settings)
+        os.replace(tmp_path, path)
+        evict_score_cache(SEGMENT_LIBRARY_MAX_BYTES, self.directory)
+        if all(episode[0] != key or episode[5] != settings for episode in self.episodes):
+            self._add(key, os.path.basename(video_path), keyframes, fingerprints, cuts, valid, settings)
+
+    def match(self, video_path, keyframes, fingerprints, valid, frame_duration, settings):
+        """在库中其它各集 (设置与 settings 相同的) 里找与本集相同的片段，返回互不重叠、按起点排序的 [RecurringSegment]"""
+        key = frame_index_key(video_path)
+        votes = {}  # 库中集号 -> [(偏移, 本集帧号)]
+        for i in np.flatnonzero(valid).tolist():
+            fp = int(fingerprints[i])
+            seen = set()
+            for band in range(4):
+                for number, j in self._index.get((band, (fp >> (16 * band)) & 0xFFFF), ()):
+                    episode = self.episodes[number]
+                    if (number, j) in seen or episode[0] == key or episode[5] != settings:
+                        continue
+                    seen.add((number, j))
+                    if _hamming(fp, episode[3][j]) <= FINGERPRINT_MAX_HAMMING:
+                        position = int(keyframes[i])
+                        votes.setdefault(number, []).append((position - int(episode[2][j]), position))
+
+        min_span = SEGMENT_MIN_SECONDS / frame_duration
+        max_gap = SEGMENT_MAX_GAP_SECONDS / frame_duration
+        found = []
+        for number, hits in votes.items():
+            hits.sort()
+            # 偏移相近的命中归为一组，组内按本集帧号切成连续的片段
+            groups, group = [], [hits[0]]
+            for hit in hits[1:]:
+                if hit[0] - group[-1][0] <= SEGMENT_OFFSET_TOLERANCE:
+                    group.append(hit)
+                else:
+                    groups.append(group)
+                    group = [hit]
+            groups.append(group)
+            for group in groups:
+                positions = sorted({position for _, position in group})
+                offset = int(np.median([offset for offset, _ in group]))
+                run = [positions[0]]
+                for position in positions[1:] + [None]:
+                    if position is not None and position - run[-1] <= max_gap:
+                        run.append(position)
+                        continue
+                    if len(run) >= SEGMENT_MIN_MATCHES and run[-1] - run[0] >= min_span:
+                        found.append((len(run), run[0], run[-1], number, offset))
+                    if position is not None:
+                        run = [position]
+
+        # 多集都能匹配上同一段时取命中最多的，片段之间互不重叠
+        segments = []
+        for matches, start, end, number, offset in sorted(found, reverse=True):
+            if any(start <= seg.end and seg.start <= end for seg in segments):
+                continue
+            _, name, _, _, cuts, _ = self.episodes[number]
+            shifted = cuts + offset
+            segment_cuts = shifted[(shifted >= start) & (shifted <= end)].tolist()
+            segments.append(RecurringSegment(start, end, name, offset, segment_cuts, matches))
+        return sorted(segments, key=lambda seg: seg.start)
+
+
+def find_scenes_with_library(video_path, threshold, min_len, progress_callback=None, stop_event=None,
+                             use_cache=True, workers=1, decode_backend="opencv", engine="scenedetect",
+                             telemetry=None, coarse_step=0, library=None):
+    """先在指纹库里找本集的重复片段，片段内沿用库里的切点，只分析片段之间的部分
+
+    返回 (scenes, fps, segments)；scenes 格式同 find_scenes_optimized。没有找到重复片段 (或建不出
+    指纹) 时就是一次普通的 find_scenes_optimized。完整跑完的一集会连同切点加入库中。
+
+    找到重复片段时的限制：片段之间的区间由 rescan_range 在本进程逐帧检测，workers 和 coarse_step 不起作用；
+    这些区间的分数不写入分数缓存，也不截取缩略图图集，所以这一集没有时间轴概览、滑块预估和切点缩略图
+    (之前完整分析过、留有分数缓存的除外)。
+    """
+    telemetry = telemetry or Telemetry()
+    started = time.perf_counter()
+    library = library if library is not None else FingerprintLibrary()
+    settings = library_settings(threshold, min_len, decode_backend, engine)
+    index = get_frame_index(video_path)
+    prints = None
+    with telemetry.stage("fingerprint"):
+        if index is not None:
+            prints = keyframe_fingerprints(video_path, index)
+    segments = []
+    if prints is not None and len(library):
+        segments = library.match(video_path, index.keyframes, prints[0], prints[1], index.frame_duration, settings)
+    telemetry.event("library_match", episodes=len(library), segments=len(segments),
+                    frames_skipped=sum(seg.end - seg.start for seg in segments))
+
+    if not segments:
+        scenes, fps = find_scenes_optimized(video_path, threshold, min_len, progress_callback, stop_event, use_cache,
+                                            workers, decode_backend, engine, telemetry, coarse_step)
+        cuts = [scene[0] for scene in scenes]
+    else:
+        for seg in segments:
+            print(f"[Debug] 第 {seg.start}-{seg.end} 帧与 {seg.source} 相同，沿用 {len(seg.cuts)} 个切点")
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+        # 片段之间 (以及片头前、片尾后) 的区间照常检测，区间两端视为已有切点
+        bounds = [0] + [frame for seg in segments for frame in (seg.start, seg.end)] + [index.frame_count]
+        gaps = [(bounds[i], bounds[i + 1]) for i in range(0, len(bounds), 2) if bounds[i + 1] > bounds[i]]
+        total = sum(end - start for start, end in gaps) or 1
+        merged = CutList([cut for seg in segments for cut in seg.cuts])
+        done = 0
+        for start, end in gaps:
+            def report(p, start=start, end=end):
+                if progress_callback:
+                    progress_callback((done + p * (end - start)) / total)
+            with telemetry.stage("decode_detect", engine=engine, start=start, end=end):
+                gap_cuts = rescan_range(video_path, start, end, threshold, min_len, decode_backend, engine,
+                                        use_cache, report, stop_event)
+            if gap_cuts is None:
+                break  # 停止：只保留已检测完的区间
+            merged.update(gap_cuts)
+            done += end - start
+        cuts = [cut for cut in merged.frames.tolist() if cut != 0]
+        # 与 scenes_from_scores 相同：每个切点到下一个切点 (最后一个到片尾)
+        bounds = cuts + [index.frame_count]
+        scenes = [(bounds[i], FrameTimecode(bounds[i + 1], fps)) for i in range(len(cuts))]
+        _report_analysis_done(telemetry, started, done, fps, len(cuts), segments=len(segments),
+                              completed=not (stop_event and stop_event.is_set()))
+
+    if prints is not None and not (stop_event and stop_event.is_set()):
+        library.add_episode(video_path, index.keyframes, prints[0], prints[1], cuts, settings)
+    return scenes, fps, segments
+
+
+def deselect_segments(cuts, segments):
+    """取消勾选重复片段内的切点 (CutList)，导出时就跳过这些片段"""
+    frames = cuts.frames
+    for seg in segments:
+        first = int(np.searchsorted(frames, seg.start, side="left"))
+        last = int(np.searchsorted(frames, seg.end, side="right"))
+        cuts.select_range(first, last, False)
+
+
+# ==================== 22. 预览代理 ====================
+# 原片多是长 GOP 的 H.264 / HEVC，预览区每次跳转都要从关键帧解码一整个 GOP 的全分辨率画面。
+# 导入视频后在后台转一份小尺寸的全帧内 (每帧都是关键帧) 代理：任何一帧都能单独解码，
+# 画面也小，之后的缩放和颜色转换都便宜。代理的第 n 帧就是原片 (显示顺序) 的第 n 帧，
+# 时间戳按帧号重排成恒定帧率，按帧号定位即可。代理生成好之前预览照常读原片。
+
+PROXY_DIR = os.path.join(CACHE_ROOT, "proxy")
+PROXY_MAX_BYTES = 4 * 1024 * 1024 * 1024
+PROXY_WIDTH = 640
+PROXY_THREADS = 2  # 只在后台慢慢转，不跟分析 / 导出抢核
+PROXY_VERSION = 1
+
+
+def proxy_path_for(video_path):
+    h = hashlib.sha1()
+    h.update(video_file_signature(video_path).encode())
+    h.update(f"proxy-v{PROXY_VERSION}|w={PROXY_WIDTH}".encode())
+    return os.path.join(PROXY_DIR, h.hexdigest() + ".mp4")
+
+
+def find_proxy(video_path):
+    """已生成的代理路径，没有时返回 None"""
+    path = proxy_path_for(video_path)
+    if not os.path.exists(path):
+        return None
+    os.utime(path, None)
+    return path
+
+
+def build_proxy(video_path, group=None, threads=PROXY_THREADS, telemetry=None):
+    """生成全帧内代理并返回路径 (已有时直接返回)；失败或被 group.cancel() 取消时返回 None"""
+    path = find_proxy(video_path)
+    if path is not None:
+        return path
+    telemetry = telemetry or Telemetry()
+    path = proxy_path_for(video_path)
+    os.makedirs(PROXY_DIR, exist_ok=True)
+    tmp_path = path + ".tmp.mp4"
+    cmd = [
+        "ffmpeg", "-y", "-nostdin", "-v", "error",
+        "-i", video_path,
+        "-map", "0:v:0", "-an", "-sn",
+        # 不放大小于 PROXY_WIDTH 的片源；时间戳按帧号重排，代理的帧号与原片一一对应
+        "-vf", f"scale='min({PROXY_WIDTH},iw)':-2,setpts=N/FRAME_RATE/TB", "-vsync", "passthrough",
+        # 全部 I 帧；fastdecode 关掉 CABAC 和去块滤波，单帧解码更快
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode", "-g", "1", "-bf", "0", "-crf", "26",
+        "-pix_fmt", "yuv420p", "-threads", str(threads),
+        tmp_path,
+    ]
+    try:
+        with telemetry.stage("proxy", width=PROXY_WIDTH):
+            _run_ffmpeg(cmd, group)
+        # 帧数对不上 (片源有解码不出的帧等) 时代理的帧号不可信，宁可不用
+        index = get_frame_index(video_path)
+        cap = cv2.VideoCapture(tmp_path)
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if index is not None and frames != index.frame_count:
+            print(f"[Debug] 预览代理帧数 {frames} 与原片 {index.frame_count} 不一致，不使用代理")
+            return None
+        os.replace(tmp_path, path)
+    except ExportCancelled:
+        return None
+    except Exception as e:
+        print(f"[Debug] 生成预览代理失败: {e}")
+        return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict_score_cache(PROXY_MAX_BYTES, PROXY_DIR)
+    print(f"[Debug] 预览代理已生成: {path}")
+    return path
+
 
-# ==================== 5. 独立测试入口 ====================
+# ==================== 23. 独立测试入口 ====================
 if __name__ == "__main__":
     print(">>> 独立测试模式 <<<")
     # 这里你可以填死一个路径来快速测试，不用每次输入